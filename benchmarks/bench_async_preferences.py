@@ -0,0 +1,131 @@
+"""
+Preference tool I/O under concurrency: sync calls on the event loop vs the async path.
+
+--tasks coroutines each run --ops preference operations (a save, then a
+get, alternating) against the same MemoryManager backend:
+  sync_on_loop   memory_manager.save/get_user_preferences called directly
+                 from the coroutine, what the tools' _run did when crew tasks
+                 ran async; every round trip blocks the event loop
+  async          asave/aget_user_preferences, what the tools' _arun use:
+                 pymongo's AsyncMongoClient for mongo, a worker thread for file
+A heartbeat coroutine ticks every millisecond alongside them; its lag is
+how long the loop was unable to run anything else. The preference cache is
+off so every operation reaches the backend.
+
+The mongo backend needs MONGODB_URI and writes to the MONGODB_DB database
+(default shop_agent_bench here); its preference collection is dropped
+afterwards. The file backend writes to a temporary directory.
+
+Usage:
+  MONGODB_URI=mongodb://localhost:27017 python benchmarks/bench_async_preferences.py --tasks 64
+  python benchmarks/bench_async_preferences.py --backend file
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("MONGODB_DB", "shop_agent_bench")
+os.environ["PREFERENCE_CACHE_SIZE"] = "0"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from shop_agent.tracing import percentile  # noqa: E402
+
+ITEMS = ["earbuds", "laptop", "phone", "watch", "shoes", "backpack", "speaker", "monitor"]
+TICK_S = 0.001
+
+
+def preferences(i: int) -> dict:
+    return {"brand": ["Boat"], "preferred_colors": ["black"], "budget": {"min": None, "max": 1000 + i}}
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append((time.perf_counter() - start - TICK_S) * 1000)
+
+
+async def run_variant(manager, variant: str, tasks: int, ops: int) -> dict:
+    latencies, lags = [], []
+
+    async def worker(t: int):
+        user_id = f"bench-user-{t}"
+        for i in range(ops):
+            item_name = ITEMS[i // 2 % len(ITEMS)]
+            start = time.perf_counter()
+            if variant == "sync_on_loop":
+                if i % 2:
+                    manager.get_user_preferences(item_name, user_id)
+                else:
+                    manager.save_user_preferences(item_name, preferences(i), user_id)
+            else:
+                if i % 2:
+                    await manager.aget_user_preferences(item_name, user_id)
+                else:
+                    await manager.asave_user_preferences(item_name, preferences(i), user_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0)  # let the other requests in between operations
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(t) for t in range(tasks)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    return {
+        "wall_s": round(elapsed, 3),
+        "ops_per_s": round(tasks * ops / elapsed, 1),
+        "op_p50_ms": round(percentile(latencies, 50), 3),
+        "op_p95_ms": round(percentile(latencies, 95), 3),
+        "loop_lag_p95_ms": round(percentile(lags, 95), 3) if lags else None,
+        "loop_lag_max_ms": round(max(lags), 3) if lags else None,
+        "heartbeats": len(lags),
+    }
+
+
+async def main_async(args) -> dict:
+    from shop_agent.db.preference_store import FilePreferenceStore
+    from shop_agent.memory import MemoryManager
+
+    tmp = None
+    manager = MemoryManager(backend=args.backend)
+    if args.backend == "file":
+        tmp = tempfile.TemporaryDirectory()
+        manager._file_store = FilePreferenceStore(os.path.join(tmp.name, "prefs.json"))
+
+    report = {"backend": args.backend, "tasks": args.tasks, "ops_per_task": args.ops}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        await manager.aget_user_preferences("warm up", "bench-user-0")  # connect outside the timings
+        if manager.store.name != args.backend:
+            sys.exit(f"Could not open the {args.backend} backend (is MONGODB_URI set?)")
+        for variant in ("sync_on_loop", "async"):
+            report[variant] = await run_variant(manager, variant, args.tasks, args.ops)
+
+        if args.backend == "mongo":
+            manager.store.collection.drop()
+        await manager.aclose_connection()
+    if tmp:
+        tmp.cleanup()
+
+    report["throughput_speedup"] = round(report["async"]["ops_per_s"] / report["sync_on_loop"]["ops_per_s"], 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["mongo", "file"], default="mongo")
+    parser.add_argument("--tasks", type=int, default=32, help="Concurrent requests")
+    parser.add_argument("--ops", type=int, default=50, help="Operations per request")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
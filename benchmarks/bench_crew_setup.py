@@ -0,0 +1,59 @@
+"""
+Per-query crew setup: ShopAgent().crew() every query vs the cached crew factory.
+
+"before" is what main.run did for every product query: build ShopAgent
+(parsing config/agents.yaml and tasks.yaml), then all agents, tasks and
+tools. "after" takes the process-wide crew from get_crew(). Both then bind
+the query's inputs the way kickoff does (Crew._interpolate_inputs), so
+the numbers are the setup overhead before the first LLM call. No LLM or
+external service is contacted.
+
+Usage: python benchmarks/bench_crew_setup.py [--queries 50]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from shop_agent.crew import ShopAgent, get_crew
+    from shop_agent.main import build_inputs
+    import_s = time.perf_counter() - start
+
+    def inputs(i):
+        user_data = {"target_item": f"wireless earbuds {i}", "item_details": "black, under 2000"}
+        return build_inputs(f"user-{i}", user_data, {"budget": 2000}, None, {})
+
+    def before(i):
+        crew = ShopAgent().crew()
+        crew._interpolate_inputs(inputs(i))
+
+    def after(i):
+        crew = get_crew()
+        crew._interpolate_inputs(inputs(i))
+
+    report = {"queries": args.queries, "import_s": round(import_s, 2)}
+    for name, setup in (("before", before), ("after", after)):
+        start = time.perf_counter()
+        setup(0)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(1, args.queries + 1):
+            setup(i)
+        per_query = (time.perf_counter() - start) / args.queries
+        report[name] = {"first_query_ms": round(first * 1000, 2), "per_query_ms": round(per_query * 1000, 3)}
+    report["speedup"] = round(report["before"]["per_query_ms"] / report["after"]["per_query_ms"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Shared embedding service vs one SentenceTransformer per vector tool.
+
+"before" loads the model twice, as QdrantCustomUpsertTool and
+ShoppingMemorySearchTool each did, and encodes one text per call.
+"after" goes through shop_agent.embeddings.embedding_service (one lazy
+load, coalesced batches, LRU cache of repeat queries). Each variant runs
+in its own process so startup time and peak RSS are measured cleanly.
+
+The workload is --queries encode calls drawn from --unique distinct
+shopping queries, issued sequentially and then from --threads threads.
+
+Usage: python benchmarks/bench_embeddings.py [--queries 500] [--unique 100] [--threads 8]
+Needs sentence-transformers and the model (EMBEDDING_MODEL, default all-MiniLM-L6-v2).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+ITEMS = ["wireless earbuds", "gaming laptop", "running shoes", "smart watch", "backpack", "bluetooth speaker",
+         "4k monitor", "mechanical keyboard", "mirrorless camera", "air fryer"]
+DETAILS = ["under 2000", "black", "noise cancelling", "for travel", "waterproof", "best battery life",
+           "from boat", "with fast charging", "lightweight", "for my dad"]
+
+
+def workload(queries: int, unique: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    pool = [f"{rng.choice(ITEMS)} {rng.choice(DETAILS)} {i}" for i in range(unique)]
+    return [rng.choice(pool) for _ in range(queries)]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def run_variant(variant: str, texts: list, threads: int) -> dict:
+    model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    start = time.perf_counter()
+    if variant == "before":
+        from sentence_transformers import SentenceTransformer
+        upsert_model = SentenceTransformer(model_name)
+        search_model = SentenceTransformer(model_name)
+        models = [upsert_model, search_model]
+
+        def encode(i, text):
+            return models[i % 2].encode(text).tolist()
+        startup = time.perf_counter() - start
+    else:
+        from shop_agent.embeddings import embedding_service
+
+        def encode(i, text):
+            return embedding_service.encode(text)
+        encode(0, "warm up")  # the model loads on first use
+        startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        encode(i, text)
+    sequential = time.perf_counter() - start
+
+    if variant == "after":
+        embedding_service.clear_cache()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(encode, range(len(texts)), texts))
+    concurrent = time.perf_counter() - start
+
+    return {
+        "startup_s": round(startup, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "sequential_ms_per_query": round(sequential / len(texts) * 1000, 3),
+        "concurrent_ms_per_query": round(concurrent / len(texts) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--unique", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--variant", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    texts = workload(args.queries, args.unique)
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, texts, args.threads)))
+        return
+
+    report = {"queries": args.queries, "unique": args.unique, "threads": args.threads}
+    for variant in ("before", "after"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--variant", variant, "--queries", str(args.queries),
+             "--unique", str(args.unique), "--threads", str(args.threads)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        report[variant] = json.loads(out.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Episode collection growth and search latency: one point per search vs dedup + compaction.
+
+Replays a synthetic year of searches: --users users each run --searches
+searches. Each user's queries come from a few favourite categories, so
+they repeat often, in varying case, word order and detail. Then it
+compares three collections holding the same history:
+
+  before     a fresh uuid4 point per episode, what QdrantCustomUpsertTool did
+  dedup      EpisodeWriter.write_batch: deterministic (user_id, normalized
+             query) ids plus the near-duplicate merge at upsert time
+  compacted  dedup followed by EpisodeWriter.compact(), rolling each
+             user's episodes older than --older-than-days into one summary
+
+For each it reports the point count and, over --probes searches of a
+user's own past query through vector_store.search_episodes, the p50/p95
+latency and how many distinct searches fill the top 5 (repeats of one
+query crowd the others out).
+
+The stand-in encoder embeds a query as its normalized bag of hashed
+words, so reordered queries are near-duplicates as with a sentence model.
+Runs against a Qdrant server with --url (or QDRANT_URL), otherwise
+embedded in a temporary directory. Benchmark collections are deleted
+afterwards.
+
+Usage:
+  python benchmarks/bench_episode_compaction.py --url http://localhost:6333 --users 2000
+  python benchmarks/bench_episode_compaction.py
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from shop_agent.tracing import percentile  # noqa: E402
+
+CATEGORIES = ["wireless earbuds", "gaming laptop", "running shoes", "smart watch", "bluetooth speaker",
+              "air fryer", "mechanical keyboard", "4k monitor", "backpack", "phone case", "power bank",
+              "yoga mat", "office chair", "trimmer", "water bottle"]
+DETAILS = ["under 2000", "black", "for travel", "good battery", "for my dad", "waterproof", "from boat", ""]
+ITEMS = ["boAt Airdopes 141", "Noise Buds VS104", "JBL Wave Buds", "Nike Revolution 7", "Lenovo LOQ",
+         "Mi Power Bank 3i", "Prestige Air Fryer", "Amazfit Bip 5"]
+
+
+class HashedWordEncoder:
+    """Stands in for embedding_service: normalized bag of hashed words"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def encode(self, text: str) -> list:
+        vector = np.zeros(self.dim)
+        for word in str(text).lower().split():
+            vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def encode_many(self, texts: list) -> list:
+        return [self.encode(t) for t in texts]
+
+
+def phrasing(rng: random.Random, category: str) -> str:
+    words = category.split()
+    if rng.random() < 0.2:
+        words = list(reversed(words))
+    text = " ".join(words)
+    return text.title() if rng.random() < 0.3 else text
+
+
+def history(users: int, searches: int, seed: int = 0) -> list:
+    """Every user's searches over the last year, oldest first"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    episodes = []
+    for u in range(users):
+        favourites = rng.sample(CATEGORIES, rng.randint(2, 5))
+        for _ in range(searches):
+            category = rng.choice(favourites) if rng.random() < 0.85 else rng.choice(CATEGORIES)
+            query = phrasing(rng, category)
+            episodes.append({
+                "user_id": f"user-{u}",
+                "query": query,
+                "item_details": rng.choice(DETAILS),
+                "final_items": rng.sample(ITEMS, 2),
+                "timestamp": (now - timedelta(days=rng.uniform(0, 365))).isoformat(),
+                "description": f"Shopping episode for {query}",
+            })
+    episodes.sort(key=lambda e: e["timestamp"])
+    return episodes
+
+
+def fresh_collection(client, vector_store, name: str):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        vector_store.ensure_collection(client, name)
+
+
+def measure(client, vector_store, collection: str, probes: list, k: int = 5) -> dict:
+    latencies, distinct = [], []
+    for user_id, query in probes:
+        vector_store.episode_search_cache.clear()
+        start = time.perf_counter()
+        hits, = vector_store.search_episodes([query], user_id=user_id, limit=k, collection=collection)
+        latencies.append((time.perf_counter() - start) * 1000)
+        distinct.append(len({vector_store.normalize_text(h["query"]) for h in hits}))
+    return {
+        "points": client.count(collection, exact=True).count,
+        "search_p50_ms": round(percentile(latencies, 50), 3),
+        "search_p95_ms": round(percentile(latencies, 95), 3),
+        f"distinct_searches_in_top_{k}": round(sum(distinct) / len(distinct), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--searches", type=int, default=50, help="Searches per user over the year")
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--older-than-days", type=float, default=90)
+    parser.add_argument("--batch", type=int, default=256, help="Episodes per upsert")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL"), help="Qdrant server (default: embedded)")
+    args = parser.parse_args()
+
+    from qdrant_client import QdrantClient
+    from shop_agent import episode_writer as writer_module
+    from shop_agent.db import vector_store
+    from shop_agent.episode_writer import EpisodeWriter
+
+    tmp = None
+    if args.url:
+        client = QdrantClient(url=args.url, api_key=os.getenv("QDRANT_API_KEY"))
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        client = QdrantClient(path=tmp.name)
+
+    encoder = HashedWordEncoder(vector_store.VECTOR_DIM)
+    vector_store.embedding_service = encoder
+    writer_module.embedding_service = encoder
+    vector_store._client = client
+    writer_module.get_qdrant_client = lambda: client
+
+    episodes = history(args.users, args.searches)
+    rng = random.Random(1)
+    probes = [(e["user_id"], e["query"]) for e in rng.sample(episodes, min(args.probes, len(episodes)))]
+    report = {"users": args.users, "episodes": len(episodes)}
+
+    # Before: a fresh point per episode
+    fresh_collection(client, vector_store, "bench_episodes_before")
+    start = time.perf_counter()
+    for i in range(0, len(episodes), args.batch):
+        batch = episodes[i:i + args.batch]
+        vectors = encoder.encode_many([e["query"] for e in batch])
+        client.upsert("bench_episodes_before", points=[
+            vector_store.build_episode_point(e, v, point_id=str(uuid.uuid4())) for e, v in zip(batch, vectors)
+        ])
+    report["before"] = {"write_s": round(time.perf_counter() - start, 2),
+                        **measure(client, vector_store, "bench_episodes_before", probes)}
+    client.delete_collection("bench_episodes_before")
+
+    # After: dedup at upsert time, then compaction
+    fresh_collection(client, vector_store, "bench_episodes_after")
+    writer = EpisodeWriter(collection="bench_episodes_after")
+    start = time.perf_counter()
+    for i in range(0, len(episodes), args.batch):
+        writer.write_batch(episodes[i:i + args.batch])
+    report["dedup"] = {"write_s": round(time.perf_counter() - start, 2),
+                       **measure(client, vector_store, "bench_episodes_after", probes)}
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        compaction = writer.compact(older_than_days=args.older_than_days)
+    report["compacted"] = {"compact_s": compaction["elapsed_s"],
+                           "users_compacted": compaction["users_compacted"],
+                           **measure(client, vector_store, "bench_episodes_after", probes)}
+    client.delete_collection("bench_episodes_after")
+
+    report["points_ratio"] = round(report["compacted"]["points"] / report["before"]["points"], 4)
+    client.close()
+    if tmp:
+        tmp.cleanup()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
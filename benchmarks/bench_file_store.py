@@ -0,0 +1,101 @@
+"""
+File preference fallback: JsonLogStore vs rewriting the JSON file on every save.
+
+The "rewrite" variant is the original behaviour of the file fallback: read
+knowledge/user_preferences.json, update one item and dump the whole file
+with indent=2. Both variants start from a file of --items preferences and
+then save --saves more; reported are the seconds per save and per read.
+
+Usage: python benchmarks/bench_file_store.py [--items 10000] [--saves 500]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from shop_agent.db.file_store import JsonLogStore  # noqa: E402
+
+
+def preferences(i: int) -> dict:
+    return {
+        "brand": ["Boat", "Noise"][: 1 + i % 2],
+        "preferred_colors": ["black"],
+        "budget": {"min": None, "max": 1000 + i},
+        "features": ["bluetooth", "noise cancellation"],
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+def rewrite_save(path: str, item_name: str, prefs: dict):
+    all_prefs = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            all_prefs = json.load(f)
+    all_prefs[item_name] = prefs
+    with open(path, "w") as f:
+        json.dump(all_prefs, f, indent=2)
+
+
+def rewrite_get(path: str, item_name: str):
+    with open(path, "r") as f:
+        return json.load(f).get(item_name)
+
+
+def per_op(fn, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000, help="Preferences already stored")
+    parser.add_argument("--saves", type=int, default=500, help="Saves (and reads) timed per variant")
+    args = parser.parse_args()
+
+    seed = {f"item-{i}": preferences(i) for i in range(args.items)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rewrite.json")
+        with open(path, "w") as f:
+            json.dump(seed, f, indent=2)
+        rewrite = {
+            "save_ms": per_op(lambda i: rewrite_save(path, f"new-{i}", preferences(i)), args.saves) * 1000,
+            "get_ms": per_op(lambda i: rewrite_get(path, f"item-{i}"), args.saves) * 1000,
+        }
+
+        path = os.path.join(tmp, "log.json")
+        with open(path, "w") as f:
+            json.dump(seed, f)
+        store = JsonLogStore(path)
+        start = time.perf_counter()
+        len(store)
+        load_ms = (time.perf_counter() - start) * 1000
+        log = {
+            "load_ms": load_ms,
+            "save_ms": per_op(lambda i: store.set(f"new-{i}", preferences(i)), args.saves) * 1000,
+            "get_ms": per_op(lambda i: store.get(f"item-{i}"), args.saves) * 1000,
+        }
+        start = time.perf_counter()
+        store.compact()
+        log["compact_ms"] = (time.perf_counter() - start) * 1000
+        store.close()
+
+    report = {
+        "items": args.items,
+        "saves": args.saves,
+        "rewrite_on_save": {k: round(v, 4) for k, v in rewrite.items()},
+        "json_log_store": {k: round(v, 4) for k, v in log.items()},
+        "save_speedup": round(rewrite["save_ms"] / log["save_ms"], 1),
+        "get_speedup": round(rewrite["get_ms"] / log["get_ms"], 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
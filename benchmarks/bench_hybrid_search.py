@@ -0,0 +1,208 @@
+"""
+Episode retrieval, dense vs hybrid: exact-category recall and latency, with and without a recency window.
+
+Loads --n synthetic episodes for --users users into a shopping_episodes
+style collection (vector_store.ensure_collection: BM25 sparse vectors,
+user_id / timestamp_epoch / query indexes). Each episode is a search for
+one product category from the last year. Its dense vector mixes a
+product family center ("audio", "computing", ...) with a weaker
+category center plus noise. So, like a sentence encoder, it tells
+families apart but confuses "earbuds" with "headphones". Queries go
+through vector_store.search_episodes for a user's category, and a hit
+counts when it is an episode of exactly that category:
+
+  recall@k = relevant hits / min(k, relevant episodes the user has)
+
+Each mode is run over all episodes and with since_days=30; every hit of
+the windowed runs is checked to be inside the window.
+
+Runs against a Qdrant server with --url (or QDRANT_URL), otherwise
+embedded in a temporary directory. Embedded Qdrant scans every point and
+ignores payload indexes, so filtered latency is only representative on a
+server. The benchmark collection is deleted afterwards.
+
+Usage:
+  python benchmarks/bench_hybrid_search.py --url http://localhost:6333 --n 500000
+  python benchmarks/bench_hybrid_search.py
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from shop_agent.tracing import percentile  # noqa: E402
+
+COLLECTION = "bench_shopping_episodes"
+FAMILIES = {
+    "audio": ["earbuds", "headphones", "speaker", "soundbar"],
+    "computing": ["laptop", "monitor", "keyboard", "mouse"],
+    "wearables": ["smartwatch", "fitness band", "smart ring"],
+    "footwear": ["running shoes", "sneakers", "sandals"],
+    "kitchen": ["air fryer", "mixer grinder", "kettle"],
+}
+MODIFIERS = ["wireless", "cheap", "best", "black", "premium", "lightweight", "budget", "new", "durable", "compact"]
+DETAILS = ["under 2000", "black", "for travel", "good battery", "for my dad", "waterproof", "from boat", ""]
+
+
+class SyntheticEncoder:
+    """
+    Stands in for embedding_service: family center + weaker category center
+    + noise, seeded by the text so repeated texts embed the same way.
+    """
+
+    def __init__(self, dim: int, category_weight: float, noise: float, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.dim, self.category_weight, self.noise = dim, category_weight, noise
+        self.centers = {}
+        for family, categories in FAMILIES.items():
+            family_center = rng.standard_normal(dim)
+            for category in categories:
+                self.centers[category] = (family_center, rng.standard_normal(dim))
+
+    def category(self, text: str) -> str:
+        return max((c for c in self.centers if c in text), key=len)
+
+    def encode(self, text: str) -> list:
+        family_center, category_center = self.centers[self.category(text)]
+        rng = np.random.default_rng(zlib.crc32(text.encode()))
+        vector = family_center + self.category_weight * category_center \
+            + self.noise * rng.standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def encode_many(self, texts: list) -> list:
+        return [self.encode(t) for t in texts]
+
+
+def episodes(n: int, users: int, seed: int = 0):
+    rng = random.Random(seed)
+    categories = [c for family in FAMILIES.values() for c in family]
+    now = datetime.now()
+    for i in range(n):
+        category = rng.choice(categories)
+        yield {
+            "user_id": f"user-{rng.randrange(users)}",
+            "query": f"{rng.choice(MODIFIERS)} {category}",
+            "item_details": rng.choice(DETAILS),
+            "final_items": [],
+            "timestamp": (now - timedelta(days=rng.uniform(0, 365))).isoformat(),
+            "description": f"Shopping episode for {category}",
+            "category": category,
+        }
+
+
+def load(client, vector_store, encoder, n: int, users: int, batch: int) -> dict:
+    """Upload the episodes; returns {(user_id, category): [(point id, age in days)]}"""
+    relevant = {}
+    points = []
+    now = datetime.now()
+    for i, episode in enumerate(episodes(n, users)):
+        text = f"{episode['query']} {episode['item_details']}".strip()
+        points.append(vector_store.build_episode_point(episode, encoder.encode(text), point_id=i))
+        age = (now - datetime.fromisoformat(episode["timestamp"])).days
+        relevant.setdefault((episode["user_id"], episode["category"]), []).append((i, age))
+        if len(points) == batch:
+            client.upsert(COLLECTION, points=points)
+            points = []
+    if points:
+        client.upsert(COLLECTION, points=points)
+    return relevant
+
+
+def run_mode(vector_store, relevant: dict, probes: list, mode: str, k: int, since_days) -> dict:
+    latencies, found, possible, outside = [], 0, 0, 0
+    for user_id, category in probes:
+        expected = {str(i) for i, age in relevant[(user_id, category)] if since_days is None or age < since_days}
+        vector_store.episode_search_cache.clear()
+        start = time.perf_counter()
+        hits, = vector_store.search_episodes(
+            [category], user_id=user_id, limit=k, collection=COLLECTION, mode=mode, since_days=since_days
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += sum(1 for h in hits if h["id"] in expected)
+        possible += min(k, len(expected))
+        if since_days:
+            cutoff = (datetime.now() - timedelta(days=since_days)).isoformat()
+            outside += sum(1 for h in hits if h["timestamp"] < cutoff)
+
+    report = {
+        f"recall_at_{k}": round(found / possible, 4) if possible else None,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+    if since_days:
+        report["hits_outside_window"] = outside
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=20_000, help="Episodes in the collection")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--probes", type=int, default=100, help="(user, category) searches per run")
+    parser.add_argument("--k", type=int, default=5, help="Results per search (the memory tool's default)")
+    parser.add_argument("--category-weight", type=float, default=0.25,
+                        help="How strongly the dense vector separates categories within a family")
+    parser.add_argument("--noise", type=float, default=0.8)
+    parser.add_argument("--batch", type=int, default=1024, help="Upload batch size")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL"), help="Qdrant server (default: embedded)")
+    args = parser.parse_args()
+
+    from qdrant_client import QdrantClient
+    from shop_agent.db import vector_store
+
+    tmp = None
+    if args.url:
+        client = QdrantClient(url=args.url, api_key=os.getenv("QDRANT_API_KEY"))
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        client = QdrantClient(path=tmp.name)
+
+    encoder = SyntheticEncoder(vector_store.VECTOR_DIM, args.category_weight, args.noise)
+    vector_store.embedding_service = encoder
+    vector_store._client = client
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        vector_store.ensure_collection(client, COLLECTION)
+    if not vector_store._sparse_enabled:
+        sys.exit("The collection has no sparse vectors; hybrid search is unavailable")
+
+    start = time.perf_counter()
+    relevant = load(client, vector_store, encoder, args.n, args.users, args.batch)
+    load_s = time.perf_counter() - start
+
+    rng = random.Random(1)
+    recent = [key for key, found in relevant.items() if any(age < 30 for _, age in found)]
+    probes = rng.sample(sorted(recent), min(args.probes, len(recent)))
+
+    report = {
+        "engine": args.url or "embedded (exhaustive scan: payload indexes are ignored)",
+        "episodes": args.n,
+        "users": args.users,
+        "probes": len(probes),
+        "load_s": round(load_s, 2),
+    }
+    for mode in ("dense", "hybrid"):
+        for since_days in (None, 30):
+            name = mode if since_days is None else f"{mode}_last_30_days"
+            report[name] = run_mode(vector_store, relevant, probes, mode, args.k, since_days)
+
+    client.delete_collection(COLLECTION)
+    client.close()
+    if tmp:
+        tmp.cleanup()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
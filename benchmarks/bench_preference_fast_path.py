@@ -0,0 +1,98 @@
+"""
+Rule-based preference extraction vs the LLM preference_extraction_task.
+
+Runs the labelled corpus in tests/data/preference_corpus.jsonl through
+extract_user_preference and reports per-field accuracy, how many queries
+take the fast path (skipping the LLM) and the rule-based latency. With
+--llm, the same corpus also goes through the crew's
+preference_extraction_task (needs the MODEL API key), which adds the LLM's
+accuracy, its agreement with the rule-based result and the latency the
+fast path saves.
+
+Usage: python benchmarks/bench_preference_fast_path.py [--llm] [--repeat 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from shop_agent.preference_parser import FAST_PATH_CONFIDENCE, extract_user_preference  # noqa: E402
+from test_preference_fast_path import FIELDS, comparable, load_corpus  # noqa: E402
+
+
+def accuracy(predictions, cases) -> dict:
+    return {
+        field: round(sum(p[field] == comparable(c["expected"])[field] for p, c in zip(predictions, cases)) / len(cases), 3)
+        for field in FIELDS
+    }
+
+
+def llm_extract(cases):
+    """Run preference_extraction_task alone for every case; returns (predictions, seconds per case)"""
+    from crewai import Crew
+    from shop_agent.crew import get_shop_agent
+    from shop_agent.main import build_inputs
+
+    shop_agent = get_shop_agent()
+    task = shop_agent.preference_extraction_task()
+    crew = Crew(agents=[task.agent], tasks=[task])
+
+    predictions, latencies = [], []
+    for case in cases:
+        user_data = {"target_item": case["item"], "item_details": case["details"]}
+        start = time.perf_counter()
+        output = crew.kickoff(inputs=build_inputs("benchmark", user_data, {}, None, {}))
+        latencies.append(time.perf_counter() - start)
+        pydantic = getattr(output, "pydantic", None)
+        predictions.append(comparable(pydantic.model_dump() if pydantic else {}))
+    return predictions, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM preference_extraction_task")
+    parser.add_argument("--repeat", type=int, default=1000, help="Timing repetitions of the rule-based pass")
+    args = parser.parse_args()
+
+    cases = load_corpus()
+    results = [extract_user_preference(c["item"], c["details"]) for c in cases]
+    rules = [comparable(p.model_dump()) for p, _ in results]
+    fast = [conf >= FAST_PATH_CONFIDENCE for _, conf in results]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for c in cases:
+            extract_user_preference(c["item"], c["details"])
+    rule_ms = (time.perf_counter() - start) / (args.repeat * len(cases)) * 1000
+
+    fast_cases = [c for c, f in zip(cases, fast) if f]
+    fast_rules = [r for r, f in zip(rules, fast) if f]
+    report = {
+        "cases": len(cases),
+        "fast_path_rate": round(sum(fast) / len(cases), 3),
+        "rule_accuracy": accuracy(rules, cases),
+        "rule_accuracy_on_fast_path": accuracy(fast_rules, fast_cases) if fast_cases else {},
+        "rule_latency_ms": round(rule_ms, 4),
+    }
+
+    if args.llm:
+        llm, latencies = llm_extract(cases)
+        llm_s = sum(latencies) / len(latencies)
+        report.update({
+            "llm_accuracy": accuracy(llm, cases),
+            "llm_agreement_on_fast_path": round(
+                sum(r == l for r, l, f in zip(rules, llm, fast) if f) / max(1, sum(fast)), 3),
+            "llm_latency_s": round(llm_s, 3),
+            "saved_per_query_s": round(llm_s * sum(fast) / len(cases), 3),
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+parse_user_details: the original per-part loop vs the precompiled parser.
+
+"before" is a copy of the original parse_user_details from main.py (it
+imported re inside the loop, scanned the color list twice per part and
+printed DEBUG lines; printing goes to /dev/null here). "after" is
+shop_agent.preference_parser.parse_user_details and its parse_many batch
+API; "after_uncached" is the same parser with the fragment cache off
+(fragment_cache_size=0). All run over the same --count synthetic
+descriptions, built from a small set of repeating fragments the way real
+detail strings are.
+
+Usage: python benchmarks/bench_preference_parser.py [--count 100000]
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from shop_agent.preference_parser import DetailsParser, parse_many, parse_user_details  # noqa: E402
+
+FRAGMENTS = [
+    "black", "matte white", "navy blue", "rose gold", "under 2000", "budget around 1500", "rs 1,50,000",
+    "between 500 and 1500", "noise cancellation", "noise-cancelling", "wireless", "bluetooth 5.3",
+    "waterproof", "water resistant", "long battery life", "good bass", "from boat", "sony or jbl",
+    "lightweight", "fast charging", "for running", "gift for my dad", "2k-3k", "low latency for gaming",
+]
+
+
+def parse_user_details_before(details: str):
+    """Parse user details into structured preferences"""
+    parts = [part.strip() for part in details.split(',')]
+    preferences = {}
+
+    for part in parts:
+        part_lower = part.lower().strip()
+        original_part = part.strip()
+
+        # Extract budget (look for numbers)
+        if any(char.isdigit() for char in part_lower):
+            # Extract all numbers from the string
+            import re
+            numbers = re.findall(r'\d+', part_lower)
+            if numbers:
+                # Take the largest number as budget (assuming it's the price)
+                budget = max([int(num) for num in numbers])
+                preferences['budget'] = budget
+                print(f"DEBUG: Found budget: {budget} from '{original_part}'")
+
+        # Common colors
+        colors = ['black', 'white', 'red', 'blue', 'green', 'pink', 'grey', 'gray', 'silver', 'gold', 'brown', 'yellow', 'purple', 'orange']
+        for color in colors:
+            if color in part_lower:
+                preferences['color'] = color
+                print(f"DEBUG: Found color: {color} from '{original_part}'")
+                break
+
+        # Features
+        if 'noise' in part_lower and 'cancel' in part_lower:
+            if 'features' not in preferences:
+                preferences['features'] = []
+            preferences['features'].append('noise_cancellation')
+            print(f"DEBUG: Found feature: noise_cancellation from '{original_part}'")
+        elif 'wireless' in part_lower or 'bluetooth' in part_lower:
+            if 'features' not in preferences:
+                preferences['features'] = []
+            preferences['features'].append('wireless')
+            print(f"DEBUG: Found feature: wireless from '{original_part}'")
+        elif 'waterproof' in part_lower or 'water resistant' in part_lower:
+            if 'features' not in preferences:
+                preferences['features'] = []
+            preferences['features'].append('waterproof')
+            print(f"DEBUG: Found feature: waterproof from '{original_part}'")
+        elif len(part_lower) > 2 and not any(char.isdigit() for char in part_lower) and not any(color in part_lower for color in colors):
+            # General feature if it's not a color or number
+            if 'features' not in preferences:
+                preferences['features'] = []
+            preferences['features'].append(original_part)
+            print(f"DEBUG: Found general feature: {original_part}")
+
+    # Add the raw input for reference
+    preferences['raw_input'] = details
+
+    return preferences
+
+
+def descriptions(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [", ".join(rng.sample(FRAGMENTS, rng.randint(1, 5))) for _ in range(count)]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    texts = descriptions(args.count)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        before = timed(lambda: [parse_user_details_before(t) for t in texts])
+    after = timed(lambda: [parse_user_details(t) for t in texts])
+    uncached_parser = DetailsParser(fragment_cache_size=0)
+    uncached = timed(lambda: [uncached_parser.parse(t) for t in texts])
+    batch = timed(lambda: parse_many(texts))
+
+    report = {
+        "descriptions": args.count,
+        "before_s": round(before, 3),
+        "after_s": round(after, 3),
+        "after_uncached_s": round(uncached, 3),
+        "parse_many_s": round(batch, 3),
+        "before_us_each": round(before / args.count * 1e6, 2),
+        "after_us_each": round(after / args.count * 1e6, 2),
+        "after_uncached_us_each": round(uncached / args.count * 1e6, 2),
+        "speedup": round(before / after, 2),
+        "speedup_uncached": round(before / uncached, 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
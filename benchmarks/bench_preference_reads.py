@@ -0,0 +1,129 @@
+"""
+Long-term preference read latency at scale.
+
+Seeds --docs preference documents spread over --users users, then times:
+  keyed_get      store.get(item, user), served by the (user_id, item_name) index
+  list_page      one 50-document page of a user's preferences
+  legacy_get     find_one({"item_name": ...}), the lookup before per-user keys
+  legacy_all     find() of every document, what get_user_preferences() did
+                 without an item (capped with --legacy-all-runs)
+
+The mongo backend needs MONGODB_URI and writes to the MONGODB_DB database
+(default shop_agent_bench here); its benchmark collection is dropped
+afterwards. The file backend runs without a server and has no legacy
+variants.
+
+Usage:
+  MONGODB_URI=mongodb://localhost:27017 python benchmarks/bench_preference_reads.py --docs 1000000
+  python benchmarks/bench_preference_reads.py --backend file --docs 100000
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("MONGODB_DB", "shop_agent_bench")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from shop_agent.tracing import percentile  # noqa: E402
+
+ITEMS = ["earbuds", "laptop", "phone", "watch", "shoes", "backpack", "speaker", "monitor", "keyboard", "camera"]
+COLLECTION = "user_preferences_bench"
+
+
+def document(i: int, users: int) -> dict:
+    return {
+        "user_id": f"user-{i % users}",
+        "item_name": f"{ITEMS[i % len(ITEMS)]}-{i // (users * len(ITEMS))}",
+        "brand": ["Boat"],
+        "preferred_colors": ["black"],
+        "budget": {"min": None, "max": 1000 + i % 5000},
+        "features": ["bluetooth"],
+        "timestamp": f"2026-01-01T00:00:{i % 60:02d}",
+    }
+
+
+def timed(fn, runs: int) -> dict:
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": round(percentile(latencies, 50), 3), "p95_ms": round(percentile(latencies, 95), 3)}
+
+
+def seed_mongo(store, docs: int, users: int, batch: int = 10_000):
+    collection = store.collection
+    collection.delete_many({})
+    for start in range(0, docs, batch):
+        collection.insert_many([document(i, users) for i in range(start, min(docs, start + batch))],
+                               ordered=False)
+
+
+def seed_file(store, docs: int, users: int):
+    data = {store.key(d["item_name"], d["user_id"]): d for d in (document(i, users) for i in range(docs))}
+    store.store._load()
+    store.store._data.update(data)
+    store.store.compact()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["mongo", "file"], default="mongo")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=500, help="Timed lookups per variant")
+    parser.add_argument("--legacy-all-runs", type=int, default=3, help="Timed full-collection loads")
+    args = parser.parse_args()
+
+    from shop_agent.db.preference_store import FilePreferenceStore, MongoPreferenceStore
+
+    tmp = None
+    if args.backend == "mongo":
+        store = MongoPreferenceStore(COLLECTION)
+        seed_start = time.perf_counter()
+        seed_mongo(store, args.docs, args.users)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        store = FilePreferenceStore(os.path.join(tmp.name, "prefs.json"))
+        seed_start = time.perf_counter()
+        seed_file(store, args.docs, args.users)
+    seed_s = time.perf_counter() - seed_start
+
+    rng = random.Random(0)
+    samples = [document(rng.randrange(args.docs), args.users) for _ in range(args.runs)]
+    pick = itertools.cycle(samples)
+
+    def keyed_get():
+        d = next(pick)
+        assert store.get(d["item_name"], d["user_id"]) is not None
+
+    report = {
+        "backend": args.backend,
+        "docs": args.docs,
+        "users": args.users,
+        "seed_s": round(seed_s, 2),
+        "keyed_get": timed(keyed_get, args.runs),
+        "list_page": timed(lambda: store.list_page(next(pick)["user_id"], limit=50), args.runs),
+    }
+
+    if args.backend == "mongo":
+        collection = store.collection
+        report["legacy_get"] = timed(
+            lambda: collection.find_one({"item_name": next(pick)["item_name"]}, {"_id": 0}), args.runs)
+        report["legacy_all"] = timed(lambda: list(collection.find({}, {"_id": 0})), args.legacy_all_runs)
+        collection.drop()
+        store.close()
+    else:
+        store.close()
+        tmp.cleanup()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Episode search with quantized vs unquantized collections: recall@k and latency.
+
+Builds one collection per QDRANT_QUANTIZATION setting (none, scalar,
+binary) through vector_store.ensure_collection, so each has the same
+VectorParams, HNSW settings and on-disk payload as shopping_episodes.
+Each is loaded with the same --n synthetic episode embeddings: unit
+vectors scattered around --topics topic centers, like many phrasings of
+few product categories. --queries held-out queries are then searched with
+vector_store.search_params() (rescoring with the full vectors and
+oversampling). Recall@k is measured against exact cosine top-k computed
+with numpy.
+
+Runs against a Qdrant server with --url (or QDRANT_URL), otherwise
+embedded in a temporary directory (QdrantClient(path=...)). Embedded
+Qdrant searches exhaustively and ignores HNSW and quantization, so
+recall/latency differences only show up against a server. The benchmark
+collections are deleted afterwards. At --n 1000000 the vectors alone
+take 1.5 GB of RAM here.
+
+Usage:
+  python benchmarks/bench_quantization.py --url http://localhost:6333 --n 1000000
+  python benchmarks/bench_quantization.py --n 20000
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from shop_agent.tracing import percentile  # noqa: E402
+
+VARIANTS = ("none", "scalar", "binary")
+
+
+def unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic(n: int, queries: int, dim: int, topics: int, spread: float, seed: int = 0) -> tuple:
+    """Clustered unit vectors for the episodes and the held-out queries"""
+    rng = np.random.default_rng(seed)
+    centers = unit(rng.standard_normal((topics, dim)).astype(np.float32))
+
+    def sample(count):
+        noise = rng.standard_normal((count, dim)).astype(np.float32) * spread / np.sqrt(dim)
+        return unit(centers[rng.integers(topics, size=count)] + noise)
+    return sample(n), sample(queries)
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int, chunk: int = 100_000) -> np.ndarray:
+    """Ids of the exact cosine top-k of every query (brute force, chunked)"""
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(data), chunk):
+        scores = queries @ data[start:start + chunk].T
+        ids = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        scores = np.hstack([best_scores, scores])
+        ids = np.hstack([best_ids, ids])
+        top = np.argsort(-scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return best_ids
+
+
+def wait_until_indexed(client, collection: str, timeout_s: float = 3600):
+    """Wait for the server's optimizers to finish building the HNSW index"""
+    from qdrant_client import models
+    deadline = time.monotonic() + timeout_s
+    while client.get_collection(collection).status != models.CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            sys.exit(f"Collection {collection} was not indexed within {timeout_s:.0f}s")
+        time.sleep(1)
+
+
+def run_variant(client, vector_store, variant: str, data, queries, truth, k: int, batch: int) -> dict:
+    collection = f"bench_episodes_{variant}"
+    vector_store.QUANTIZATION = variant
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        vector_store.ensure_collection(client, collection)
+
+    start = time.perf_counter()
+    client.upload_collection(
+        collection_name=collection,
+        vectors=data,
+        ids=range(len(data)),
+        payload=({"user_id": f"user-{i % 1000}"} for i in range(len(data))),
+        batch_size=batch,
+        wait=True,
+    )
+    wait_until_indexed(client, collection)
+    load_s = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        points = client.query_points(
+            collection_name=collection, query=query.tolist(), limit=k,
+            search_params=vector_store.search_params(), with_payload=False,
+        ).points
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({p.id for p in points} & set(expected.tolist()))
+
+    client.delete_collection(collection)
+    return {
+        "load_s": round(load_s, 2),
+        f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="Episodes per collection")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5, help="Results per search (the memory tool's default)")
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=1.0, help="Noise around each topic center")
+    parser.add_argument("--batch", type=int, default=1024, help="Upload batch size")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL"), help="Qdrant server (default: embedded)")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    args = parser.parse_args()
+
+    from qdrant_client import QdrantClient
+    from shop_agent.db import vector_store
+
+    tmp = None
+    if args.url:
+        client = QdrantClient(url=args.url, api_key=os.getenv("QDRANT_API_KEY"))
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        client = QdrantClient(path=tmp.name)
+
+    data, queries = synthetic(args.n, args.queries, vector_store.VECTOR_DIM, args.topics, args.spread)
+    start = time.perf_counter()
+    truth = exact_top_k(data, queries, args.k)
+    report = {
+        "engine": args.url or "embedded (exhaustive search: HNSW and quantization are ignored)",
+        "episodes": args.n,
+        "dim": vector_store.VECTOR_DIM,
+        "queries": args.queries,
+        "numpy_exact_search_ms": round((time.perf_counter() - start) / args.queries * 1000, 3),
+    }
+    for variant in args.variants:
+        report[variant] = run_variant(client, vector_store, variant, data, queries, truth, args.k, args.batch)
+
+    client.close()
+    if tmp:
+        tmp.cleanup()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Local ranking of recorded SerpAPI results (product_ranking tool).
+
+Times compare_products + comparison_markdown over the recorded Google
+Shopping results in tests/data (repeated to --sizes products) and reports
+the markdown's token estimate: the output the compare agent used to
+generate itself and now copies from the tool. At typical LLM decode speeds
+(--tokens-per-s) that is the generation time the local ranking replaces.
+
+Usage: python benchmarks/bench_ranking.py [--results FILE] [--sizes 12,100,1000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from shop_agent.ranking import compare_products, comparison_markdown, estimate_tokens  # noqa: E402
+
+PREFERENCES = {"budget": {"min": None, "max": 2000}, "brand": ["boAt"], "features": ["bluetooth"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--results", default=os.path.join(ROOT, "tests", "data", "shopping_results_earbuds.json"),
+                        help="Recorded shopping_results JSON array")
+    parser.add_argument("--sizes", default="12,100,1000", help="Product counts to rank")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--tokens-per-s", type=float, default=60.0, help="LLM decode speed for the estimate")
+    args = parser.parse_args()
+
+    with open(args.results, encoding="utf-8") as f:
+        recorded = json.load(f)
+
+    report = {"results_file": os.path.relpath(args.results, ROOT), "sizes": {}}
+    for size in (int(s) for s in args.sizes.split(",")):
+        products = [dict(recorded[i % len(recorded)], title=f"{recorded[i % len(recorded)]['title']} #{i}")
+                    for i in range(size)]
+        repeat = max(1, args.repeat * 12 // size)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            markdown = comparison_markdown(compare_products(products, "wireless earbuds", PREFERENCES))
+        local_ms = (time.perf_counter() - start) / repeat * 1000
+        tokens = estimate_tokens(markdown)
+        report["sizes"][size] = {
+            "local_ms": round(local_ms, 3),
+            "markdown_tokens": tokens,
+            "llm_generation_s_est": round(tokens / args.tokens_per_s, 1),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Local compare-report parsing vs the LLM markdown_extraction_task.
+
+Runs every recorded report in tests/data/reports through
+parse_shopping_results (the item_find_task output, as JSON text) and
+parse_compare_report, the path extract_product_list takes after each
+kickoff, and reports per-report latency and whether the result matches
+tests/data/reports/expected.json. With --llm, each report also goes
+through markdown_extraction_task (needs the MODEL API key), the agent
+extract_product_list used to run every query, which adds its latency and
+how many of the expected titles it returned.
+
+Usage: python benchmarks/bench_report_parser.py [--llm] [--repeat 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from shop_agent.report_parser import parse_compare_report, parse_shopping_results  # noqa: E402
+
+DATA = ROOT / "tests" / "data"
+REPORTS = DATA / "reports"
+
+
+def llm_titles(report: str) -> tuple:
+    """Run markdown_extraction_task on one report; returns (titles, seconds)"""
+    from shop_agent.main import extract_json_block, markdown_extraction_task
+
+    inputs = {"user_id": "benchmark", "target_item": "wireless earbuds"}
+    start = time.perf_counter()
+    output = markdown_extraction_task(inputs).execute_sync(context=report)
+    elapsed = time.perf_counter() - start
+    if output.pydantic is not None:
+        return list(output.pydantic.items), elapsed
+    json_str = extract_json_block(output.raw)
+    return (json.loads(json_str) if json_str else []), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM markdown_extraction_task")
+    parser.add_argument("--repeat", type=int, default=1000, help="Timing repetitions of the local parse")
+    args = parser.parse_args()
+
+    expected = json.loads((REPORTS / "expected.json").read_text(encoding="utf-8"))
+    shopping_results = (DATA / "shopping_results_earbuds.json").read_text(encoding="utf-8")
+    reports = {name: (REPORTS / name).read_text(encoding="utf-8") for name in sorted(expected)}
+
+    report = {"reports": len(reports), "local": {}}
+    for name, text in reports.items():
+        parsed = parse_compare_report(text, parse_shopping_results(shopping_results))
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            parse_compare_report(text, parse_shopping_results(shopping_results))
+        report["local"][name] = {
+            "ms": round((time.perf_counter() - start) / args.repeat * 1000, 4),
+            "matches_expected": parsed == expected[name],
+        }
+    local_ms = sum(r["ms"] for r in report["local"].values()) / len(reports)
+    report["local_mean_ms"] = round(local_ms, 4)
+
+    if args.llm:
+        report["llm"] = {}
+        for name, text in reports.items():
+            titles, elapsed = llm_titles(text)
+            wanted = [p["title"] for p in expected[name]]
+            report["llm"][name] = {
+                "s": round(elapsed, 3),
+                "expected_titles_found": f"{sum(t in titles for t in wanted)}/{len(wanted)}",
+            }
+        llm_s = sum(r["s"] for r in report["llm"].values()) / len(reports)
+        report["llm_mean_s"] = round(llm_s, 3)
+        report["speedup"] = round(llm_s * 1000 / local_ms)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
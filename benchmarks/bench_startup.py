@@ -0,0 +1,78 @@
+"""
+CLI startup cost: `python -X importtime` of shop_agent.main.
+
+Imports shop_agent.main (what the run/batch entry points load before the
+first prompt) in --runs fresh interpreters and reports the median import
+time, the slowest imports by cumulative time, and which heavy
+dependencies got loaded eagerly. Those should all load on first use.
+With --max-ms the script exits non-zero when the median is over budget,
+so it can guard startup time in CI.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 10] [--max-ms 1500]
+Compare with an older commit: git worktree add /tmp/old <ref> and pass --src /tmp/old/src.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Must not be imported until first use
+HEAVY = ("crewai", "torch", "sentence_transformers", "qdrant_client", "pymongo", "composio_crewai", "litellm")
+
+PROBE = (
+    "import sys, json, shop_agent.main; "
+    f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+)
+
+
+def import_profile(src: str = SRC) -> tuple:
+    env = dict(os.environ, PYTHONPATH=src + os.pathsep + os.environ.get("PYTHONPATH", ""), PYTHONWARNINGS="ignore")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE],
+                          capture_output=True, text=True, env=env)
+    if proc.returncode:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        sys.exit(f"Importing shop_agent.main from {src} failed: {errors[-1] if errors else proc.returncode}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        modules[name] = (int(self_us), int(cumulative_us))
+    return modules, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--max-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--src", default=SRC, help="Source tree to import from (e.g. a worktree of an older commit)")
+    args = parser.parse_args()
+
+    totals, profile, heavy = [], {}, []
+    for _ in range(args.runs):
+        profile, heavy = import_profile(args.src)
+        totals.append(profile["shop_agent.main"][1] / 1000)
+
+    median = statistics.median(totals)
+    slowest = sorted(profile.items(), key=lambda kv: -kv[1][1])[1:args.top + 1]
+    report = {
+        "runs": args.runs,
+        "import_shop_agent_main_ms": {"median": round(median, 1), "min": round(min(totals), 1)},
+        "eager_heavy_imports": heavy,
+        "slowest_imports_ms": {name: round(cumulative / 1000, 1) for name, (_, cumulative) in slowest},
+    }
+    print(json.dumps(report, indent=2))
+
+    if heavy:
+        sys.exit(f"Heavy modules imported at startup: {', '.join(heavy)}")
+    if args.max_ms and median > args.max_ms:
+        sys.exit(f"Startup import time {median:.0f} ms exceeds the {args.max_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from shop_agent.tracing import percentile, tracer
+from shop_agent.usage import usage_tracker
+from shop_agent.db.search_cache import search_cache
+
+
+def read_rows(path: str):
+    """Yield (user, target_item, item_details) rows from a JSONL or CSV file"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+
+        for record in records:
+            user = record.get('user') or record.get('username') or record.get('user_id')
+            target_item = (record.get('target_item') or '').strip()
+            if not user or not target_item:
+                print(f"⚠️ Skipping row without user/target_item: {record}")
+                continue
+            yield {
+                'user': str(user).strip(),
+                'target_item': target_item,
+                'item_details': (record.get('item_details') or '').strip(),
+            }
+
+
+class BatchRunner:
+    """
+    Run many shopping queries through the crew with bounded parallelism.
+
+    Each worker thread kicks off its own copy of the shared crew, since a
+    crew's agents and tasks are mutated while it runs. Results are streamed
+    to a JSONL file as they complete.
+    """
+
+    def __init__(self, concurrency: int = 4, record_episodes: bool = True):
+        self.concurrency = max(1, concurrency)
+        self.record_episodes = record_episodes
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._saves = []  # background preference saves (parallel mode)
+
+    def _crew(self, exclude_tasks=()):
+        crews = getattr(self._local, 'crews', None)
+        if crews is None:
+            crews = self._local.crews = {}
+        if exclude_tasks not in crews:
+            from shop_agent.crew import get_crew
+            crews[exclude_tasks] = get_crew(exclude_tasks).copy()
+        return crews[exclude_tasks]
+
+    def run_one(self, row: dict) -> dict:
+        """Run a single row through the crew; never raises"""
+        from shop_agent.main import (
+            parse_user_details, plan_query, user_id_for, build_inputs, extract_product_list,
+            persist_preferences, _persistence_pool,
+        )
+        from shop_agent.memory import memory_manager
+        from shop_agent.episode_writer import episode_writer
+        from shop_agent.crew import trace_tasks, EXECUTION_MODE
+
+        start = time.perf_counter()
+        user_id = user_id_for(row['user'])
+        result = {
+            'user': row['user'],
+            'user_id': user_id,
+            'target_item': row['target_item'],
+            'item_details': row['item_details'],
+        }
+        try:
+            with tracer.span('pipeline.query', user_id=user_id, target_item=row['target_item']):
+                parsed_preferences = parse_user_details(row['item_details'])
+                long_term_prefs = memory_manager.get_user_preferences(row['target_item'], user_id=user_id)
+                exclude_tasks, user_preferences, _ = plan_query(row, parsed_preferences)
+                crew = self._crew(exclude_tasks)
+                inputs = build_inputs(user_id, row, user_preferences, None, long_term_prefs)
+                usage_before = usage_tracker.snapshot(crew)
+                with tracer.span('crew.kickoff', tasks=len(crew.tasks)):
+                    raw_output = crew.kickoff(inputs=inputs)
+                trace_tasks(crew)
+                usage = usage_tracker.record_kickoff(crew, usage_before, inputs, raw_output, user_id=user_id)
+                product_list = extract_product_list(raw_output, inputs)
+
+            # Parallel crews leave out save_to_db_task; save off the critical path like main.run
+            if EXECUTION_MODE == 'parallel':
+                self._saves.append(_persistence_pool.submit(
+                    persist_preferences, row['target_item'], parsed_preferences, long_term_prefs, user_id
+                ))
+
+            if self.record_episodes:
+                episode_writer.submit({
+                    'user_id': user_id,
+                    'query': row['target_item'],
+                    'item_details': row['item_details'],
+                    'final_items': [p['title'] for p in product_list],
+                    'timestamp': datetime.now().isoformat(),
+                    'description': f"Shopping episode for {row['target_item']}",
+                })
+
+            result.update({
+                'status': 'success',
+                'final_items': product_list,
+                'report': getattr(raw_output, 'raw', None) or str(raw_output),
+                'tokens': usage['total'],
+            })
+        except Exception as e:
+            result.update({'status': 'error', 'error': str(e)})
+
+        result['latency_s'] = round(time.perf_counter() - start, 3)
+        return result
+
+    def run(self, input_path: str, output_path: str) -> dict:
+        """Process every row of input_path and stream results to output_path"""
+        rows = list(read_rows(input_path))
+        latencies, failed = [], 0
+        start = time.perf_counter()
+
+        with open(output_path, 'w', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='batch') as pool:
+            futures = [pool.submit(self.run_one, row) for row in rows]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                latencies.append(result['latency_s'])
+                if result['status'] != 'success':
+                    failed += 1
+                with self._write_lock:
+                    out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    out.flush()
+                print(f"📦 [{done}/{len(rows)}] {result['status']}: {result['user']} / {result['target_item']} ({result['latency_s']:.1f}s)")
+
+        for save in self._saves:
+            try:
+                save.result()
+            except Exception as e:
+                print(f"❌ Failed to save preferences: {e}")
+        self._saves.clear()
+
+        if self.record_episodes:
+            from shop_agent.episode_writer import episode_writer
+            episode_writer.close()
+        tracer.print_summary()
+        usage_tracker.print_summary()
+
+        elapsed = time.perf_counter() - start
+        return {
+            'rows': len(rows),
+            'failed': failed,
+            'concurrency': self.concurrency,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_per_min': round(len(rows) / elapsed * 60, 2) if elapsed else 0.0,
+            'latency_p50_s': percentile(latencies, 50),
+            'latency_p95_s': percentile(latencies, 95),
+            'latency_p99_s': percentile(latencies, 99),
+            'serpapi_cache': search_cache.stats(),
+        }
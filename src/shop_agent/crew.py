@@ -1,24 +1,29 @@
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
-from composio_crewai import ComposioToolSet
 from dotenv import load_dotenv
 from .tools.custom_tool import GoogleShoppingTool
 from shop_agent.tools.vector_tools import ShoppingMemorySearchTool
 from .models.model import UserPreference, ExtractedProductNames
 from typing import List
 from .tools.db_tool import SavePreferencesTool, GetPreferencesTool, ListAllPreferencesTool
+from .tools.ranking_tool import ProductRankingTool
+from shop_agent.tracing import tracer
 import os
+import threading
+import uuid
 
 load_dotenv()
 
-vector_query_tool = ShoppingMemorySearchTool()
-
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
 # https://docs.crewai.com/concepts/crews#example-crew-class-with-decorators
 # scrape_tool = ScrapegraphScrapeTool(api_key=os.getenv("SCRAPEGRAPH_API_KEY"))
-composio_toolset = ComposioToolSet(api_key=os.getenv("COMPOSIO_API_KEY"))
-tool = composio_toolset.get_tools(actions=['SERPAPI_SEARCH'])
+
+def get_composio_tools(actions=('SERPAPI_SEARCH',)):
+    """Build Composio tools on demand (not used by the default crew)"""
+    from composio_crewai import ComposioToolSet
+    composio_toolset = ComposioToolSet(api_key=os.getenv("COMPOSIO_API_KEY"))
+    return composio_toolset.get_tools(actions=list(actions))
 
 @CrewBase
 class ShopAgent():
@@ -30,6 +35,23 @@ class ShopAgent():
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
 
+    required_agent_keys = ('role', 'goal', 'backstory')
+    required_task_keys = ('description', 'expected_output', 'agent')
+
+    def validate_config(self):
+        """Fail fast on incomplete agent/task YAML definitions"""
+        errors = []
+        for name, config in self.agents_config.items():
+            missing = [key for key in self.required_agent_keys if not config.get(key)]
+            if missing:
+                errors.append(f"agent '{name}' is missing {', '.join(missing)}")
+        for name, config in self.tasks_config.items():
+            missing = [key for key in self.required_task_keys if not config.get(key)]
+            if missing:
+                errors.append(f"task '{name}' is missing {', '.join(missing)}")
+        if errors:
+            raise ValueError("Invalid crew configuration: " + "; ".join(errors))
+
     # If you would like to add tools to your agents, you can learn more about it here:
     # https://docs.crewai.com/concepts/agents#agent-tools
     @agent
@@ -37,7 +59,7 @@ class ShopAgent():
         return Agent(
             config=self.agents_config['memory_query_agent'],
             verbose=True,
-            tools=[vector_query_tool],
+            tools=[ShoppingMemorySearchTool()],  # Qdrant/model are connected on first search
         )
 
     @agent
@@ -45,7 +67,7 @@ class ShopAgent():
         return Agent(
             config=self.agents_config['preference_extraction_agent'],
             # verbose=True,
-            # tools=tool,  # Using ComposioToolSet for SERPAPI_SEARCH
+            # tools=get_composio_tools(),  # Using ComposioToolSet for SERPAPI_SEARCH
         )
     
     @agent
@@ -60,7 +82,8 @@ class ShopAgent():
     def compare_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['compare_agent'],
-            verbose=True
+            verbose=True,
+            tools=[ProductRankingTool()],
         )
     
     @agent
@@ -141,3 +164,144 @@ class ShopAgent():
             verbose=True,
             # process=Process.hierarchical, # In case you wanna use that instead https://docs.crewai.com/how-to/Hierarchical/
         )
+
+
+# --------------------
+# Execution modes
+# --------------------
+# Output dependencies between tasks. In "parallel" mode, tasks that do not
+# depend on each other run concurrently (async_execution), each task only
+# receives the outputs it depends on, and persistence tasks are left to the
+# caller so they stay off the critical path. Tasks not listed here keep the
+# sequential semantics (they wait for, and see, everything before them).
+TASK_DEPENDENCIES = {
+    'memory_query_task': [],
+    'preference_extraction_task': [],
+    'item_find_task': ['memory_query_task', 'preference_extraction_task'],
+    'item_compare_task': ['item_find_task', 'preference_extraction_task'],
+    'markdown_extraction_task': ['item_compare_task'],
+    'save_to_db_task': [],
+}
+PERSISTENCE_TASKS = ('save_to_db_task',)
+
+EXECUTION_MODE = os.getenv("SHOP_AGENT_EXECUTION", "parallel").strip().lower()
+
+def plan_parallel_tasks(tasks: List[Task]) -> List[Task]:
+    """
+    Copy tasks with explicit context and async_execution set from
+    TASK_DEPENDENCIES, grouping consecutive independent tasks into waves
+    that run concurrently. The original tasks are left untouched.
+    """
+    names = {t.name for t in tasks}
+
+    # Split the task list into waves of mutually independent tasks
+    waves = []
+    for t in tasks:
+        deps = TASK_DEPENDENCIES.get(t.name)
+        joins_wave = (
+            waves
+            and deps is not None
+            and TASK_DEPENDENCIES.get(waves[-1][-1]) is not None
+            and not any(d in waves[-1] for d in deps)
+        )
+        if joins_wave:
+            waves[-1].append(t.name)
+        else:
+            waves.append([t.name])
+
+    # crewai waits for pending async tasks before each synchronous task, so
+    # every task of a wave runs async; the crew may end with one async task.
+    async_names = set()
+    for i, wave in enumerate(waves):
+        if len(wave) > 1:
+            async_names.update(wave if i < len(waves) - 1 else wave[:-1])
+
+    planned = {}
+    for t in tasks:
+        update = {'id': uuid.uuid4(), 'async_execution': t.name in async_names}
+        deps = [planned[d] for d in TASK_DEPENDENCIES.get(t.name) or [] if d in names]
+        if deps:
+            update['context'] = deps
+        planned[t.name] = t.model_copy(update=update)
+    return list(planned.values())
+
+def trace_tasks(crew: Crew):
+    """Record a span per task of the last kickoff from the tasks' own timings"""
+    for t in crew.tasks:
+        start, end = getattr(t, 'start_time', None), getattr(t, 'end_time', None)
+        if start and end:
+            tracer.record(f"task.{t.name}", (end - start).total_seconds(), start=start.timestamp(),
+                          agent=getattr(t.agent, 'role', None), async_execution=t.async_execution)
+
+def execution_report(crew: Crew, wall_seconds: float) -> dict:
+    """Per-task durations and the wall-clock saved versus running them back to back"""
+    durations = {}
+    for t in crew.tasks:
+        start, end = getattr(t, 'start_time', None), getattr(t, 'end_time', None)
+        if start and end:
+            durations[t.name] = round((end - start).total_seconds(), 3)
+
+    serial_seconds = sum(durations.values())
+    return {
+        'tasks': durations,
+        'wall_s': round(wall_seconds, 3),
+        'serial_s': round(serial_seconds, 3),
+        'saved_s': round(max(0.0, serial_seconds - wall_seconds), 3),
+    }
+
+
+# --------------------
+# Crew factory
+# --------------------
+_factory_lock = threading.Lock()
+_shop_agent = None
+_crews = {}
+
+def get_shop_agent() -> ShopAgent:
+    """Return the process-wide ShopAgent; YAML is parsed and validated once"""
+    global _shop_agent
+    if _shop_agent is None:
+        with _factory_lock:
+            if _shop_agent is None:
+                shop_agent = ShopAgent()
+                shop_agent.validate_config()
+                _shop_agent = shop_agent
+    return _shop_agent
+
+def get_crew(exclude_tasks=(), mode: str = None) -> Crew:
+    """
+    Return a cached crew built from the shared ShopAgent.
+
+    Agents, tasks and tools are created once per process; each kickoff only
+    interpolates its new inputs. `exclude_tasks` selects a variant of the
+    crew without the named tasks, and `mode` ("sequential" or "parallel",
+    default from SHOP_AGENT_EXECUTION) how its tasks are scheduled. Variants
+    are cached too.
+    """
+    mode = mode or EXECUTION_MODE
+    if mode == 'parallel':
+        exclude_tasks = tuple(exclude_tasks) + PERSISTENCE_TASKS
+    key = (frozenset(exclude_tasks), mode)
+    crew = _crews.get(key)
+    if crew is not None:
+        return crew
+
+    shop_agent = get_shop_agent()
+    with _factory_lock:
+        if key not in _crews:
+            base_key = (frozenset(), 'sequential')
+            base = _crews.get(base_key)
+            if base is None:
+                base = _crews[base_key] = shop_agent.crew()
+            if key != base_key:
+                tasks = [t for t in base.tasks if t.name not in key[0]]
+                if mode == 'parallel':
+                    tasks = plan_parallel_tasks(tasks)
+                agents = [a for a in base.agents if any(t.agent is a for t in tasks)]
+                _crews[key] = Crew(
+                    agents=agents,
+                    tasks=tasks,
+                    process=base.process,
+                    verbose=base.verbose,
+                )
+        return _crews[key]
@@ -0,0 +1,181 @@
+import atexit
+import copy
+import json
+import os
+import stat
+import tempfile
+import threading
+
+# Permissions of a new snapshot file (what open() gives under the usual umask)
+SNAPSHOT_MODE = 0o644
+
+
+class JsonLogStore:
+    """
+    Dict-backed key/value store persisted as a JSON snapshot plus an
+    append-only change log.
+
+    Reads are served from memory. Each write updates the in-memory dict and
+    appends one line to the log; every `compact_every` writes (and at exit)
+    the dict is written to a temp file and atomically renamed over the
+    snapshot, after which the log is truncated. On load the snapshot is read
+    and the log replayed, so no acknowledged write is lost between
+    compactions.
+    """
+
+    def __init__(self, path: str, compact_every: int = 1000):
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + ".log"
+        self.compact_every = compact_every
+
+        self._data = None
+        self._log = None
+        self._pending = 0
+        self._lock = threading.RLock()
+
+    # --------------------
+    # Loading
+    # --------------------
+    def _load(self):
+        if self._data is not None:
+            return
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Ignoring unreadable snapshot {self.path}: {e}")
+
+        pending = 0
+        if os.path.exists(self.log_path):
+            good = 0  # end offset of the last complete entry
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn final write
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(data, entry)
+                    pending += 1
+                    good += len(line)
+                size = f.seek(0, os.SEEK_END)
+            if size > good:
+                # Cut the torn tail so later appends start on a fresh line
+                print(f"⚠️ Discarding {size - good} bytes of a torn write at the end of {self.log_path}")
+                os.truncate(self.log_path, good)
+
+        self._data = data
+        self._pending = pending
+        atexit.register(self.close)
+
+    @staticmethod
+    def _apply(data: dict, entry: dict):
+        op = entry.get("op")
+        if op == "set":
+            data[entry["key"]] = entry["value"]
+        elif op == "delete":
+            data.pop(entry["key"], None)
+        elif op == "clear":
+            data.clear()
+
+    # --------------------
+    # Writes
+    # --------------------
+    def _append(self, entry: dict):
+        if self._log is None:
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._log.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._log.flush()
+
+        self._pending += 1
+        if self.compact_every and self._pending >= self.compact_every:
+            self.compact()
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._load()
+            value = copy.deepcopy(value)
+            self._data[key] = value
+            self._append({"op": "set", "key": key, "value": value})
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            self._load()
+            if key not in self._data:
+                return False
+            del self._data[key]
+            self._append({"op": "delete", "key": key})
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._load()
+            self._data.clear()
+            self._append({"op": "clear"})
+
+    def compact(self):
+        """Atomically rewrite the snapshot from memory and truncate the log"""
+        with self._lock:
+            if self._data is None:
+                return
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            # mkstemp creates 0600 files; keep the snapshot's existing mode
+            mode = stat.S_IMODE(os.stat(self.path).st_mode) if os.path.exists(self.path) else SNAPSHOT_MODE
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self._data, f, ensure_ascii=False, separators=(",", ":"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            open(self.log_path, 'w').close()
+            self._pending = 0
+
+    # --------------------
+    # Reads
+    # --------------------
+    def get(self, key: str, default=None):
+        with self._lock:
+            self._load()
+            value = self._data.get(key)
+            return copy.deepcopy(value) if value is not None else default
+
+    def all(self) -> dict:
+        with self._lock:
+            self._load()
+            return copy.deepcopy(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._load()
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._data)
+
+    def close(self):
+        """Compact pending changes and release the log file"""
+        with self._lock:
+            if self._data is not None and self._pending:
+                self.compact()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
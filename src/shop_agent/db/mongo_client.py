@@ -1,107 +1,197 @@
-from pymongo import MongoClient
-from datetime import datetime
 import os
+import threading
+import time
+from pymongo import MongoClient
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
 from dotenv import load_dotenv
+from shop_agent.tracing import tracer
 
 load_dotenv()
 
-class MongoMemoryManager:
+# Database holding the long-term memory collections
+DATABASE_NAME = os.getenv("MONGODB_DB", "shop_agent")
+
+# Connection pool settings shared by every MongoDB user in the process
+POOL_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", 50)),
+    "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", 0)),
+    "maxIdleTimeMS": int(os.getenv("MONGODB_MAX_IDLE_MS", 300_000)),
+    "waitQueueTimeoutMS": int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 5_000)),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5_000)),
+    "connectTimeoutMS": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 5_000)),
+    "socketTimeoutMS": int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", 20_000)),
+    "retryWrites": True,
+    "retryReads": True,
+}
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """
+    Connection pool counters collected from pymongo pool events: connections
+    opened/closed, checkouts in flight (and the peak), checkout failures and
+    the time spent waiting for a connection.
+    """
+
     def __init__(self):
-        # MongoDB connection
-        self.client = MongoClient(os.getenv("MONGODB_URI"))
-        self.db = self.client.shopping_agent
-        self.preferences_collection = self.db.user_preferences
-        
-        # Create indexes for better performance
-        self.preferences_collection.create_index("item_name")
-        self.preferences_collection.create_index("timestamp")
-    
-    def get_user_preferences(self, item_name: str = None):
-        """Get user preferences from MongoDB"""
-        try:
-            if item_name:
-                # Get preferences for specific item
-                prefs = self.preferences_collection.find_one({"item_name": item_name})
-                if prefs:
-                    # Remove MongoDB's _id field
-                    prefs.pop('_id', None)
-                    return prefs
-                return None
-            else:
-                # Get all preferences
-                all_prefs = list(self.preferences_collection.find())
-                # Remove MongoDB's _id field from all documents
-                for pref in all_prefs:
-                    pref.pop('_id', None)
-                return all_prefs
-        except Exception as e:
-            print(f"Error retrieving preferences: {e}")
-            return None
-    
-    def save_user_preferences(self, item_name: str, preferences: dict):
-        """Save or update user preferences in MongoDB"""
-        try:
-            # Add timestamp
-            preferences['timestamp'] = datetime.now().isoformat()
-            preferences['item_name'] = item_name
-            
-            # Update or insert preferences
-            result = self.preferences_collection.update_one(
-                {"item_name": item_name},
-                {"$set": preferences},
-                upsert=True
-            )
-            
-            if result.upserted_id:
-                print(f"New preferences saved for {item_name}")
-            else:
-                print(f"Preferences updated for {item_name}")
-            
-            return True
-        except Exception as e:
-            print(f"Error saving preferences: {e}")
-            return False
-    
-    def delete_preferences(self, item_name: str = None):
-        """Delete preferences from MongoDB"""
-        try:
-            if item_name:
-                # Delete specific item preferences
-                result = self.preferences_collection.delete_one({"item_name": item_name})
-                print(f"Deleted {result.deleted_count} preference(s) for {item_name}")
-            else:
-                # Delete all preferences
-                result = self.preferences_collection.delete_many({})
-                print(f"Deleted {result.deleted_count} preference(s)")
-            return True
-        except Exception as e:
-            print(f"Error deleting preferences: {e}")
-            return False
-    
-    def get_preferences_history(self, item_name: str = None, limit: int = 10):
-        """Get historical preferences (if you want to track changes over time)"""
-        try:
-            query = {}
-            if item_name:
-                query["item_name"] = item_name
-            
-            # Get recent preferences sorted by timestamp
-            history = list(self.preferences_collection.find(query)
-                          .sort("timestamp", -1)
-                          .limit(limit))
-            
-            # Remove MongoDB's _id field
-            for pref in history:
-                pref.pop('_id', None)
-            
-            return history
-        except Exception as e:
-            print(f"Error retrieving preferences history: {e}")
-            return []
-    
-    def close_connection(self):
-        """Close MongoDB connection"""
-        self.client.close()
-
-# Global instance
-memory_manager = MongoMemoryManager()
\ No newline at end of file
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.created = 0
+        self.closed = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.pools_cleared = 0
+
+    # Pool lifecycle
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    # Connection lifecycle
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    # Checkouts
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        waited = time.perf_counter() - started if started else 0.0
+        self._local.started = None
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_pool_size": POOL_OPTIONS["maxPoolSize"],
+                "open": self.created - self.closed,
+                "created": self.created,
+                "closed": self.closed,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+                "pools_cleared": self.pools_cleared,
+            }
+
+
+class CommandTracer(CommandListener):
+    """Records every MongoDB command as a "mongo.<command>" span, timed by the driver"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        tracer.record(f"mongo.{event.command_name}", event.duration_micros / 1e6,
+                      database=event.database_name)
+
+    def failed(self, event):
+        tracer.record(f"mongo.{event.command_name}", event.duration_micros / 1e6,
+                      database=event.database_name, failure=str(event.failure)[:200])
+
+
+# Process-wide pool metrics, fed by the shared client's event listener
+pool_metrics = PoolMetrics()
+command_tracer = CommandTracer()
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_mongo_client() -> MongoClient:
+    """Return the process-wide MongoClient (one tuned connection pool)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    os.getenv("MONGODB_URI"),
+                    event_listeners=[pool_metrics, command_tracer],
+                    **POOL_OPTIONS,
+                )
+    return _client
+
+
+def get_database(name: str = None):
+    """Return a database on the shared client"""
+    return get_mongo_client()[name or DATABASE_NAME]
+
+
+def get_async_mongo_client():
+    """
+    Return the process-wide AsyncMongoClient, configured like the sync one.
+    It binds to the event loop it is first used on.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from pymongo import AsyncMongoClient
+
+                _async_client = AsyncMongoClient(
+                    os.getenv("MONGODB_URI"),
+                    event_listeners=[pool_metrics, command_tracer],
+                    **POOL_OPTIONS,
+                )
+    return _async_client
+
+
+def get_async_database(name: str = None):
+    """Return a database on the shared async client"""
+    return get_async_mongo_client()[name or DATABASE_NAME]
+
+
+def close_mongo_client():
+    """Close the shared sync client and its pool"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose_mongo_client():
+    """Close the shared async client and its pool"""
+    global _async_client
+    with _client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
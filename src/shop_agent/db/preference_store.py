@@ -0,0 +1,308 @@
+import os
+from datetime import datetime
+from shop_agent.db.file_store import JsonLogStore
+
+# Owner of preferences saved before they were keyed per user
+GLOBAL_USER_ID = "global"
+
+# Preference documents never expose Mongo's _id
+PROJECTION = {"_id": 0}
+
+
+class PreferenceStore:
+    """
+    Storage backend interface for long-term user preferences.
+
+    Documents are keyed by (user_id, item_name). Backends raise on storage
+    errors; MemoryManager decides how to report them and when to fall back.
+    """
+
+    name = "base"
+
+    def get(self, item_name: str, user_id: str):
+        """The user's document for an item, else the shared (global) one"""
+        raise NotImplementedError
+
+    def find(self, user_id: str):
+        """All of a user's documents, as a list (empty if there are none)"""
+        raise NotImplementedError
+
+    def iter(self, user_id: str = None, batch_size: int = 500):
+        """Stream documents (all users unless user_id is given)"""
+        raise NotImplementedError
+
+    def list_page(self, user_id: str = None, limit: int = 50, after=None) -> list:
+        """Up to `limit` documents ordered by (user_id, item_name), after the given key"""
+        raise NotImplementedError
+
+    def save(self, item_name: str, preferences: dict, user_id: str) -> bool:
+        """Upsert a user's preferences; returns True if a new document was created"""
+        raise NotImplementedError
+
+    def delete(self, item_name: str = None, user_id: str = None) -> int:
+        """
+        Delete a user's document for one item, or all of the user's documents.
+        Without a user_id the same applies across all users.
+        """
+        raise NotImplementedError
+
+    def history(self, item_name: str = None, limit: int = 10, user_id: str = None) -> list:
+        """Most recently saved documents first"""
+        raise NotImplementedError
+
+    def migrate(self, default_user_id: str = GLOBAL_USER_ID) -> int:
+        """Assign documents saved before per-user keying to default_user_id"""
+        return 0
+
+    def metrics(self) -> dict:
+        return {"backend": self.name}
+
+    def close(self):
+        pass
+
+
+# --------------------
+# MongoDB backend
+# --------------------
+class MongoPreferenceStore(PreferenceStore):
+    """Preferences in a MongoDB collection on the shared connection pool"""
+
+    name = "mongo"
+
+    def __init__(self, collection_name: str = "user_preferences"):
+        from shop_agent.db.mongo_client import get_database
+
+        self.collection = get_database()[collection_name]
+        self.collection.database.client.admin.command('ping')
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        """One document per (user_id, item_name), and per-user history by timestamp"""
+        self.collection.create_index([("user_id", 1), ("item_name", 1)], unique=True, name="user_item")
+        self.collection.create_index([("user_id", 1), ("timestamp", -1)], name="user_timestamp")
+
+    def get(self, item_name: str, user_id: str):
+        # One round trip for the user's document and the shared fallback
+        # (None matches documents not migrated yet)
+        owners = list(dict.fromkeys([user_id, GLOBAL_USER_ID, None]))
+        docs = list(self.collection.find(
+            {"user_id": {"$in": owners}, "item_name": item_name}, PROJECTION
+        ).limit(len(owners)))
+        docs.sort(key=lambda d: owners.index(d.get("user_id")))
+        return docs[0] if docs else None
+
+    def find(self, user_id: str):
+        return list(self.collection.find({"user_id": user_id}, PROJECTION))
+
+    def iter(self, user_id: str = None, batch_size: int = 500):
+        query = {"user_id": user_id} if user_id else {}
+        yield from self.collection.find(query, PROJECTION, batch_size=batch_size)
+
+    def list_page(self, user_id: str = None, limit: int = 50, after=None) -> list:
+        query = {"user_id": user_id} if user_id else {}
+        if after:
+            after_user, after_item = after
+            if user_id:
+                query["item_name"] = {"$gt": after_item}
+            else:
+                query["$or"] = [
+                    {"user_id": {"$gt": after_user}},
+                    {"user_id": after_user, "item_name": {"$gt": after_item}},
+                ]
+        return list(self.collection.find(query, PROJECTION)
+                    .sort([("user_id", 1), ("item_name", 1)])
+                    .limit(limit))
+
+    def save(self, item_name: str, preferences: dict, user_id: str) -> bool:
+        preferences['timestamp'] = datetime.now().isoformat()
+        preferences['item_name'] = item_name
+        preferences['user_id'] = user_id
+
+        result = self.collection.update_one(
+            {"user_id": user_id, "item_name": item_name},
+            {"$set": preferences},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    def delete(self, item_name: str = None, user_id: str = None) -> int:
+        query = {"user_id": user_id} if user_id else {}
+        if item_name:
+            query["item_name"] = item_name
+        return self.collection.delete_many(query).deleted_count
+
+    def history(self, item_name: str = None, limit: int = 10, user_id: str = None) -> list:
+        query = {"user_id": user_id} if user_id else {}
+        if item_name:
+            query["item_name"] = item_name
+        return list(self.collection.find(query, PROJECTION)
+                    .sort("timestamp", -1)
+                    .limit(limit))
+
+    def migrate(self, default_user_id: str = GLOBAL_USER_ID) -> int:
+        result = self.collection.update_many(
+            {"user_id": {"$exists": False}},
+            {"$set": {"user_id": default_user_id}},
+        )
+        # The old single-field index is superseded by the compound one
+        try:
+            self.collection.drop_index("item_name_1")
+        except Exception:
+            pass
+        return result.modified_count
+
+    def metrics(self) -> dict:
+        from shop_agent.db.mongo_client import pool_metrics
+        return {"backend": self.name, "pool": pool_metrics.snapshot()}
+
+    def close(self):
+        from shop_agent.db.mongo_client import close_mongo_client
+        close_mongo_client()
+
+
+class AsyncMongoPreferenceStore:
+    """
+    Async counterpart of MongoPreferenceStore on pymongo's AsyncMongoClient.
+    Indexes are owned by the sync store, which is opened first.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection_name: str = "user_preferences"):
+        from shop_agent.db.mongo_client import get_async_database
+
+        self.collection = get_async_database()[collection_name]
+
+    async def get(self, item_name: str, user_id: str):
+        owners = list(dict.fromkeys([user_id, GLOBAL_USER_ID, None]))
+        cursor = self.collection.find(
+            {"user_id": {"$in": owners}, "item_name": item_name}, PROJECTION
+        ).limit(len(owners))
+        docs = await cursor.to_list(length=len(owners))
+        docs.sort(key=lambda d: owners.index(d.get("user_id")))
+        return docs[0] if docs else None
+
+    async def find(self, user_id: str):
+        return await self.collection.find({"user_id": user_id}, PROJECTION).to_list(length=None)
+
+    async def list_page(self, user_id: str = None, limit: int = 50, after=None) -> list:
+        query = {"user_id": user_id} if user_id else {}
+        if after:
+            after_user, after_item = after
+            if user_id:
+                query["item_name"] = {"$gt": after_item}
+            else:
+                query["$or"] = [
+                    {"user_id": {"$gt": after_user}},
+                    {"user_id": after_user, "item_name": {"$gt": after_item}},
+                ]
+        cursor = (self.collection.find(query, PROJECTION)
+                  .sort([("user_id", 1), ("item_name", 1)])
+                  .limit(limit))
+        return await cursor.to_list(length=limit)
+
+    async def save(self, item_name: str, preferences: dict, user_id: str) -> bool:
+        preferences['timestamp'] = datetime.now().isoformat()
+        preferences['item_name'] = item_name
+        preferences['user_id'] = user_id
+
+        result = await self.collection.update_one(
+            {"user_id": user_id, "item_name": item_name},
+            {"$set": preferences},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    async def delete(self, item_name: str = None, user_id: str = None) -> int:
+        query = {"user_id": user_id} if user_id else {}
+        if item_name:
+            query["item_name"] = item_name
+        return (await self.collection.delete_many(query)).deleted_count
+
+    async def close(self):
+        from shop_agent.db.mongo_client import aclose_mongo_client
+        await aclose_mongo_client()
+
+
+# --------------------
+# Local file backend
+# --------------------
+class FilePreferenceStore(PreferenceStore):
+    """Preferences in a local JSON snapshot + append log (JsonLogStore)"""
+
+    name = "file"
+
+    def __init__(self, path: str = "knowledge/user_preferences.json"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.store = JsonLogStore(path)
+
+    @staticmethod
+    def key(item_name: str, user_id: str) -> str:
+        """Global (legacy) preferences are keyed by item name alone"""
+        return item_name if user_id == GLOBAL_USER_ID else f"{user_id}::{item_name}"
+
+    def get(self, item_name: str, user_id: str):
+        prefs = self.store.get(self.key(item_name, user_id))
+        if prefs is None and user_id != GLOBAL_USER_ID:
+            prefs = self.store.get(item_name)
+        return prefs
+
+    def find(self, user_id: str):
+        return list(self.iter(user_id))
+
+    def iter(self, user_id: str = None, batch_size: int = 500):
+        for key, prefs in self.store.all().items():
+            owner, _, item_name = key.rpartition("::")
+            owner = owner or GLOBAL_USER_ID
+            if user_id is None or owner == user_id:
+                yield {**prefs, "user_id": owner, "item_name": prefs.get("item_name", item_name)}
+
+    def list_page(self, user_id: str = None, limit: int = 50, after=None) -> list:
+        docs = sorted(self.iter(user_id), key=lambda d: (d["user_id"], d["item_name"]))
+        if after:
+            docs = [d for d in docs if (d["user_id"], d["item_name"]) > tuple(after)]
+        return docs[:limit]
+
+    def save(self, item_name: str, preferences: dict, user_id: str) -> bool:
+        preferences['timestamp'] = datetime.now().isoformat()
+        key = self.key(item_name, user_id)
+        created = key not in self.store
+        self.store.set(key, preferences)
+        return created
+
+    def delete(self, item_name: str = None, user_id: str = None) -> int:
+        if item_name and user_id:
+            return int(self.store.delete(self.key(item_name, user_id)))
+        if item_name or user_id:
+            docs = [d for d in self.iter(user_id) if not item_name or d["item_name"] == item_name]
+            for doc in docs:
+                self.store.delete(self.key(doc["item_name"], doc["user_id"]))
+            return len(docs)
+        count = len(self.store)
+        self.store.clear()
+        return count
+
+    def history(self, item_name: str = None, limit: int = 10, user_id: str = None) -> list:
+        # No history is kept on file - just return current preferences
+        if item_name:
+            prefs = self.get(item_name, user_id or GLOBAL_USER_ID)
+            return [prefs] if prefs else []
+        docs = sorted(self.iter(user_id), key=lambda d: d.get("timestamp", ""), reverse=True)
+        return docs[:limit]
+
+    def metrics(self) -> dict:
+        return {"backend": self.name, "documents": len(self.store)}
+
+    def close(self):
+        self.store.close()
+
+
+BACKENDS = {
+    "mongo": MongoPreferenceStore,
+    "file": FilePreferenceStore,
+}
+
+# Native async backends; the others run in a worker thread
+ASYNC_BACKENDS = {
+    "mongo": AsyncMongoPreferenceStore,
+}
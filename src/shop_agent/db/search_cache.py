@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(value) -> str:
+    return _WHITESPACE.sub(" ", str(value or "")).strip().lower()
+
+
+class SearchResponseCache:
+    """
+    Persistent SQLite cache for SerpAPI responses.
+
+    Entries are keyed on the normalized (q, location, hl, gl) tuple, expire
+    after `ttl` seconds and are evicted least-recently-used once the cache
+    holds more than `max_entries` rows. Data survives process restarts.
+    """
+
+    def __init__(self, path: str, ttl: float = 6 * 60 * 60, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(q: str, location: str = None, hl: str = None, gl: str = None) -> str:
+        """Build the cache key from the normalized query parameters"""
+        return json.dumps([_normalize(q), _normalize(location), _normalize(hl), _normalize(gl)])
+
+    def get(self, key: str):
+        """Return the cached response dict, or None on miss/expiry"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.ttl and row[1] + self.ttl <= now):
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, response: dict):
+        """Store a response and evict the oldest rows beyond max_entries"""
+        now = time.time()
+        payload = json.dumps(response, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            if self.max_entries:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows, returning how many were removed"""
+        if not self.ttl:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            cur = conn.execute("DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl,))
+            conn.commit()
+            return cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            size = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Provide a module-level singleton instance
+search_cache = SearchResponseCache(
+    path=os.getenv("SERPAPI_CACHE_PATH", "knowledge/serpapi_cache.sqlite3"),
+    ttl=float(os.getenv("SERPAPI_CACHE_TTL", 6 * 60 * 60)),
+    max_entries=int(os.getenv("SERPAPI_CACHE_MAX_ENTRIES", 5000)),
+)
@@ -0,0 +1,449 @@
+import atexit
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from uuid import NAMESPACE_URL, uuid5
+
+from shop_agent.cache import LRUCache
+from shop_agent.embeddings import embedding_service, normalize_text
+from shop_agent.tracing import tracer
+
+COLLECTION_NAME = "shopping_episodes"
+
+# Dimension of the embedding model's vectors (all-MiniLM-L6-v2: 384)
+VECTOR_DIM = int(os.getenv("EMBEDDING_DIM", 384))
+
+# Collection tuning, applied when the collection is created
+QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "scalar").strip().lower()  # scalar | binary | none
+HNSW_M = int(os.getenv("QDRANT_HNSW_M", 16))
+HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+ON_DISK_PAYLOAD = os.getenv("QDRANT_ON_DISK_PAYLOAD", "1") != "0"
+
+# Quantized searches fetch extra candidates and rescore them with full vectors
+OVERSAMPLING = {"scalar": 2.0, "binary": 3.0}
+
+# Keyword (BM25-style) sparse vector, fused with dense results in hybrid mode
+SPARSE_VECTOR = "bm25"
+SEARCH_MODE = os.getenv("EPISODE_SEARCH_MODE", "hybrid").strip().lower()  # hybrid | dense
+HYBRID_CANDIDATES = 4  # per-retriever candidates, as a multiple of the limit
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_AVG_LENGTH = 12  # typical query + item_details length, in terms
+
+_TERM = re.compile(r"[a-z0-9]+")
+_SPARSE_STOPWORDS = {"a", "an", "and", "the", "for", "with", "in", "of", "to", "my", "i", "want", "need"}
+
+# Episodes this similar to one of the user's existing episodes are merged into it
+DEDUP_THRESHOLD = float(os.getenv("EPISODE_DEDUP_THRESHOLD", 0.95))
+MAX_FINAL_ITEMS = 20  # per merged episode, most recent first
+
+# Set by ensure_collection once the collection is known to have sparse vectors
+_sparse_enabled = False
+
+_client = None
+_client_lock = threading.Lock()
+
+# Short-lived cache of episode search results, keyed by
+# (user_id, normalized query, limit, score_threshold)
+episode_search_cache = LRUCache(
+    maxsize=int(os.getenv("EPISODE_SEARCH_CACHE_SIZE", 512)),
+    ttl=float(os.getenv("EPISODE_SEARCH_CACHE_TTL", 60)),
+)
+
+
+class TracedQdrantClient:
+    """QdrantClient wrapper that runs every client call in a "qdrant.<method>" span"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            with tracer.span(f"qdrant.{name}"):
+                return attr(*args, **kwargs)
+        return call
+
+
+def get_qdrant_client():
+    """
+    Return the process-wide QdrantClient, created on first use.
+
+    With QDRANT_PATH set, Qdrant runs embedded in this process and stores
+    data under that directory (single-node installs, no server needed);
+    otherwise it connects to QDRANT_URL. The episode collection is created
+    on first connect if it doesn't exist. Client calls are traced.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from qdrant_client import QdrantClient
+                path = os.getenv("QDRANT_PATH")
+                if path:
+                    client = QdrantClient(path=path)
+                else:
+                    client = QdrantClient(
+                        url=os.getenv("QDRANT_URL"),
+                        api_key=os.getenv("QDRANT_API_KEY")
+                    )
+                client = TracedQdrantClient(client)
+                ensure_collection(client)
+                _client = client
+    return _client
+
+
+def close_qdrant_client():
+    """Close the shared client (releases the embedded storage lock)"""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+# Registered at import, before any writer's exit hook: atexit runs hooks in
+# reverse order, so pending episodes are flushed before the client closes
+atexit.register(close_qdrant_client)
+
+
+def ensure_collection(client, collection: str = COLLECTION_NAME):
+    """
+    Create the episode collection (cosine VectorParams, BM25-style sparse
+    vectors, optional scalar or binary quantization, HNSW settings, on-disk
+    payload) and its payload indexes, unless they already exist.
+    """
+    global _sparse_enabled
+    from qdrant_client import models
+
+    sparse_config = {
+        SPARSE_VECTOR: models.SparseVectorParams(modifier=models.Modifier.IDF)
+    }
+
+    try:
+        if not client.collection_exists(collection):
+            quantization = None
+            if QUANTIZATION == "scalar":
+                quantization = models.ScalarQuantization(
+                    scalar=models.ScalarQuantizationConfig(
+                        type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+                    )
+                )
+            elif QUANTIZATION == "binary":
+                quantization = models.BinaryQuantization(
+                    binary=models.BinaryQuantizationConfig(always_ram=True)
+                )
+
+            print(f"🔧 Creating Qdrant collection '{collection}' ({VECTOR_DIM}-dim, quantization: {QUANTIZATION})")
+            client.create_collection(
+                collection_name=collection,
+                vectors_config=models.VectorParams(
+                    size=VECTOR_DIM, distance=models.Distance.COSINE, on_disk=True
+                ),
+                sparse_vectors_config=sparse_config,
+                hnsw_config=models.HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT),
+                quantization_config=quantization,
+                on_disk_payload=ON_DISK_PAYLOAD,
+            )
+
+        info = client.get_collection(collection)
+        sparse_vectors = info.config.params.sparse_vectors or {}
+        if SPARSE_VECTOR not in sparse_vectors:
+            # Collections created before hybrid search. Qdrant versions that
+            # can't add a vector to an existing collection stay dense-only
+            # until the collection is recreated
+            try:
+                client.update_collection(collection_name=collection, sparse_vectors_config=sparse_config)
+                sparse_vectors = {SPARSE_VECTOR: True}
+            except Exception as e:
+                print(f"⚠️ Sparse vectors unavailable, using dense search only "
+                      f"(recreate '{collection}' for hybrid search): {e}")
+        _sparse_enabled = SPARSE_VECTOR in sparse_vectors
+
+        schema = info.payload_schema or {}
+        indexes = {
+            "user_id": models.KeywordIndexParams(type="keyword"),
+            "timestamp_epoch": models.FloatIndexParams(type="float"),
+            "query": models.TextIndexParams(
+                type="text", tokenizer=models.TokenizerType.WORD, lowercase=True
+            ),
+            "item_details": models.TextIndexParams(
+                type="text", tokenizer=models.TokenizerType.WORD, lowercase=True
+            ),
+        }
+        for field, params in indexes.items():
+            if field not in schema:
+                print(f"🔧 Creating {params.type.value} index on '{field}'")
+                client.create_payload_index(
+                    collection_name=collection,
+                    field_name=field,
+                    field_schema=params
+                )
+    except Exception as e:
+        print(f"⚠️ Collection check failed: {e}")
+
+
+def sparse_vector(text: str, query: bool = False):
+    """
+    BM25-style sparse vector of a text: hashed term ids with saturated
+    term frequencies for documents, plain term presence for queries. The
+    collection's IDF modifier supplies the inverse document frequency.
+    """
+    from qdrant_client.models import SparseVector
+
+    counts = {}
+    for term in _TERM.findall(str(text or "").lower()):
+        if term not in _SPARSE_STOPWORDS:
+            index = zlib.crc32(term.encode("utf-8"))
+            counts[index] = counts.get(index, 0) + 1
+
+    if query:
+        weights = {index: 1.0 for index in counts}
+    else:
+        length = sum(counts.values())
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / BM25_AVG_LENGTH)
+        weights = {index: tf * (BM25_K1 + 1) / (tf + norm) for index, tf in counts.items()}
+
+    indices = sorted(weights)
+    return SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def timestamp_epoch(timestamp):
+    """Seconds since the epoch for an ISO timestamp (None if unparseable)"""
+    try:
+        return datetime.fromisoformat(str(timestamp)).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def search_params():
+    """Search params matching the collection's quantization (rescored with full vectors)"""
+    if QUANTIZATION not in OVERSAMPLING:
+        return None
+    from qdrant_client import models
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            rescore=True, oversampling=OVERSAMPLING[QUANTIZATION]
+        )
+    )
+
+
+def episode_point_id(user_id: str, query: str) -> str:
+    """Deterministic point id: one point per (user_id, normalized query)"""
+    return str(uuid5(NAMESPACE_URL, f"{user_id}::{normalize_text(query)}"))
+
+
+def merge_episode(existing: dict, episode: dict) -> dict:
+    """
+    Fold an episode into an existing episode payload: the more recent
+    one's query, details and timestamp win, final items are unioned (most
+    recent first) and the number of merged searches is counted.
+    """
+    def epoch(e):
+        return timestamp_epoch(e.get("timestamp")) or 0.0
+
+    latest, older = (episode, existing) if epoch(episode) >= epoch(existing) else (existing, episode)
+    items = list(dict.fromkeys([*(latest.get("final_items") or []), *(older.get("final_items") or [])]))
+    firsts = [t for t in (e.get("first_timestamp") or e.get("timestamp") for e in (existing, episode)) if t]
+    return {
+        **older,
+        **{k: v for k, v in latest.items() if v is not None},
+        "final_items": items[:MAX_FINAL_ITEMS],
+        "occurrences": existing.get("occurrences", 1) + episode.get("occurrences", 1),
+        "first_timestamp": min(firsts, key=lambda t: timestamp_epoch(t) or 0.0) if firsts else None,
+    }
+
+
+def build_episode_point(episode: dict, vector: list, point_id: str = None):
+    """Build the Qdrant point for a shopping episode"""
+    from qdrant_client.models import PointStruct
+
+    vectors = list(vector)
+    if _sparse_enabled:
+        text = f"{episode.get('query') or ''} {episode.get('item_details') or ''}"
+        vectors = {"": vectors, SPARSE_VECTOR: sparse_vector(text)}
+
+    payload = {
+        "user_id": episode.get("user_id"),
+        "query": episode.get("query"),
+        "item_details": episode.get("item_details"),
+        "final_items": episode.get("final_items"),
+        "timestamp": episode.get("timestamp"),
+        "timestamp_epoch": timestamp_epoch(episode.get("timestamp")),
+        "description": episode.get("description"),
+        "occurrences": episode.get("occurrences", 1),
+        "first_timestamp": episode.get("first_timestamp") or episode.get("timestamp"),
+    }
+    if episode.get("kind"):
+        # Summary points keep their kind and per-search counts
+        payload["kind"] = episode["kind"]
+        payload["searches"] = episode.get("searches")
+
+    return PointStruct(
+        id=point_id or episode_point_id(episode.get("user_id"), episode.get("query")),
+        vector=vectors,
+        payload=payload,
+    )
+
+
+def upsert_episodes(episodes: list, vectors: list, collection: str = COLLECTION_NAME) -> int:
+    """
+    Write episodes, merging each into the user's existing episode for the
+    same normalized query (deterministic id) or a near-duplicate one (dense
+    similarity >= DEDUP_THRESHOLD). Returns the number of points written.
+    """
+    from qdrant_client import models
+
+    client = get_qdrant_client()  # connect first: points depend on the collection's vectors
+
+    # One batched lookup for near-duplicates of every episode, per user
+    responses = client.query_batch_points(
+        collection_name=collection,
+        requests=[
+            models.QueryRequest(
+                query=list(vector),
+                filter=models.Filter(must=[
+                    models.FieldCondition(key="user_id", match=models.MatchValue(value=e.get("user_id")))
+                ]),
+                limit=1,
+                score_threshold=DEDUP_THRESHOLD,
+                with_payload=True,
+                params=search_params(),
+            )
+            for e, vector in zip(episodes, vectors)
+        ],
+    )
+    targets = [
+        str(r.points[0].id) if r.points else episode_point_id(e.get("user_id"), e.get("query"))
+        for e, r in zip(episodes, responses)
+    ]
+    existing = {str(p.id): p.payload for r in responses for p in r.points}
+
+    missing = [t for t in dict.fromkeys(targets) if t not in existing]
+    if missing:
+        existing.update({str(p.id): p.payload for p in client.retrieve(collection, ids=missing, with_payload=True)})
+
+    # Merge in order, so repeats inside one batch collapse as well
+    merged = {}
+    for episode, vector, target in zip(episodes, vectors, targets):
+        base = merged[target][0] if target in merged else existing.get(target)
+        merged[target] = (merge_episode(base, episode) if base else dict(episode), vector)
+
+    points = [build_episode_point(e, v, point_id=t) for t, (e, v) in merged.items()]
+    client.upsert(collection_name=collection, points=points)
+    episode_search_cache.clear()  # cached searches may now miss these episodes
+    return len(points)
+
+
+def _episode_hit(point) -> dict:
+    payload = point.payload or {}
+    return {
+        "id": str(point.id),
+        "user_id": payload.get("user_id"),
+        "query": payload.get("query"),
+        "item_details": payload.get("item_details"),
+        "final_items": payload.get("final_items"),
+        "timestamp": payload.get("timestamp"),
+        "description": payload.get("description"),
+        "score": point.score,
+    }
+
+
+def search_episodes(
+    queries: list,
+    user_id: str = None,
+    limit: int = 5,
+    score_threshold: float = None,
+    collection: str = COLLECTION_NAME,
+    mode: str = None,
+    since_days: float = None,
+) -> list:
+    """
+    Search past episodes for several query phrasings at once.
+
+    mode "dense" ranks by embedding similarity; "hybrid" fuses the dense
+    ranking with BM25-style keyword matches (reciprocal rank fusion), which
+    favours exact category/brand terms. since_days keeps only episodes
+    from the last N days.
+
+    Hybrid scores are RRF scores derived from each hit's rank in the two
+    candidate lists, not cosine similarities: an episode unrelated to the
+    query still gets a positive score, and scores are only comparable
+    within one search. score_threshold is a cosine cut-off on the dense
+    candidates only; keyword candidates are fused in regardless, so hybrid
+    results can score below it. Cached queries are answered from
+    episode_search_cache; the rest are encoded in one batch and sent as
+    one batched Qdrant query. Returns one list of hits per query, in input order.
+    """
+    client = get_qdrant_client()
+    mode = (mode or SEARCH_MODE).lower()
+    if mode == "hybrid" and not _sparse_enabled:
+        mode = "dense"
+
+    keys = [(user_id, normalize_text(q), limit, score_threshold, mode, since_days) for q in queries]
+    results = [episode_search_cache.get(key) for key in keys]
+
+    missing = list(dict.fromkeys(key for key, hits in zip(keys, results) if hits is None))
+    if missing:
+        from qdrant_client import models
+
+        conditions = []
+        if user_id:
+            conditions.append(models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id)))
+        if since_days:
+            since = time.time() - since_days * 86400
+            conditions.append(models.FieldCondition(key="timestamp_epoch", range=models.Range(gte=since)))
+        query_filter = models.Filter(must=conditions) if conditions else None
+
+        vectors = embedding_service.encode_many([key[1] for key in missing])
+        if mode == "hybrid":
+            requests = [
+                models.QueryRequest(
+                    prefetch=[
+                        models.Prefetch(
+                            query=vector,
+                            filter=query_filter,
+                            limit=limit * HYBRID_CANDIDATES,
+                            score_threshold=score_threshold,
+                            params=search_params(),
+                        ),
+                        models.Prefetch(
+                            query=sparse_vector(key[1], query=True),
+                            using=SPARSE_VECTOR,
+                            filter=query_filter,
+                            limit=limit * HYBRID_CANDIDATES,
+                        ),
+                    ],
+                    query=models.FusionQuery(fusion=models.Fusion.RRF),
+                    limit=limit,
+                    with_payload=True,
+                )
+                for key, vector in zip(missing, vectors)
+            ]
+        else:
+            requests = [
+                models.QueryRequest(
+                    query=vector,
+                    filter=query_filter,
+                    limit=limit,
+                    score_threshold=score_threshold,
+                    with_payload=True,
+                    params=search_params(),
+                )
+                for vector in vectors
+            ]
+
+        responses = client.query_batch_points(collection_name=collection, requests=requests)
+        fetched = {}
+        for key, response in zip(missing, responses):
+            fetched[key] = [_episode_hit(p) for p in response.points]
+            episode_search_cache.set(key, fetched[key])
+        results = [fetched[key] if hits is None else hits for key, hits in zip(keys, results)]
+
+    return [[dict(hit) for hit in hits] for hits in results]
@@ -0,0 +1,174 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from shop_agent.cache import LRUCache
+from shop_agent.tracing import tracer
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"  # 384-dim embeddings
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before embedding / cache lookup"""
+    return _WHITESPACE.sub(" ", str(text)).strip().lower()
+
+
+class EmbeddingService:
+    """
+    Process-wide sentence embedding service shared by the vector tools.
+
+    The SentenceTransformer model is loaded on first use. Concurrent
+    encode() calls are coalesced into a single forward pass, and recent
+    embeddings are kept in an LRU cache keyed by normalized text.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        cache_size: int = 2048,
+        max_batch_size: int = 64,
+        batch_window: float = 0.005,
+    ):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = LRUCache(maxsize=cache_size)
+
+        # Pending encode requests: list of (texts, Future)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._batch_running = False
+
+        self.batches = 0
+        self.encoded = 0
+
+    # --------------------
+    # Model
+    # --------------------
+    @property
+    def model(self):
+        """Load the SentenceTransformer model lazily (once per process)."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    # --------------------
+    # Encoding
+    # --------------------
+    def encode(self, text: str) -> list:
+        """Embed a single text, returning a list of floats."""
+        return self.encode_many([text])[0]
+
+    def encode_many(self, texts: list) -> list:
+        """Embed several texts, serving repeats from the cache."""
+        keys = [normalize_text(t) for t in texts]
+        vectors = [None] * len(keys)
+        missing = {}
+
+        for i, key in enumerate(keys):
+            cached = self._cache.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                vectors[i] = cached
+
+        if missing:
+            new_texts = list(missing)
+            with tracer.span("embedding.encode", texts=len(new_texts)):
+                new_vectors = self._submit(new_texts).result()
+            for key, vector in zip(new_texts, new_vectors):
+                self._cache.set(key, vector)
+                for i in missing[key]:
+                    vectors[i] = vector
+
+        return vectors
+
+    def _submit(self, texts: list) -> Future:
+        """
+        Queue texts for the next forward pass.
+
+        The first caller to find no batch in flight becomes the leader: it
+        waits for the batch window, then drains every pending request into
+        as few model.encode() calls as possible. Other callers just wait on
+        their future.
+        """
+        future = Future()
+        with self._pending_lock:
+            self._pending.append((texts, future))
+            if self._batch_running:
+                return future
+            self._batch_running = True
+
+        try:
+            if self.batch_window:
+                time.sleep(self.batch_window)
+            self._drain()
+        finally:
+            with self._pending_lock:
+                self._batch_running = False
+            # A request may have slipped in after the last drain
+            if self._pending:
+                self._drain()
+
+        return future
+
+    def _drain(self):
+        while True:
+            with self._pending_lock:
+                requests, self._pending = self._pending, []
+            if not requests:
+                return
+
+            unique = list(dict.fromkeys(t for texts, _ in requests for t in texts))
+            try:
+                with tracer.span("embedding.forward", texts=len(unique)):
+                    encoded = self.model.encode(
+                        unique,
+                        batch_size=self.max_batch_size,
+                        convert_to_numpy=True,
+                        show_progress_bar=False,
+                    )
+                by_text = dict(zip(unique, (v.tolist() for v in encoded)))
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.encoded += len(unique)
+            for texts, future in requests:
+                future.set_result([by_text[t] for t in texts])
+
+    # --------------------
+    # Stats
+    # --------------------
+    def stats(self) -> dict:
+        """Model/batching/cache counters for diagnostics."""
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "cache": self._cache.stats(),
+        }
+
+    def clear_cache(self):
+        self._cache.clear()
+
+
+# Provide a module-level singleton instance
+embedding_service = EmbeddingService(model_name=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL))
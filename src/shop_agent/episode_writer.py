@@ -0,0 +1,285 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from collections import Counter
+
+from shop_agent.embeddings import embedding_service
+from shop_agent.db.vector_store import (
+    COLLECTION_NAME, get_qdrant_client, upsert_episodes, build_episode_point, episode_point_id,
+    merge_episode, timestamp_epoch, episode_search_cache,
+)
+
+REQUIRED_FIELDS = ("user_id", "query", "timestamp")
+
+# Normalized "query" that keys each user's summary point
+SUMMARY_QUERY_KEY = "__summary__"
+SUMMARY_TOP_N = 10
+
+
+def summarize_episodes(user_id: str, payloads: list) -> dict:
+    """Roll episode payloads into one summary episode (top searches and items)"""
+    searches, items = Counter(), Counter()
+    for payload in payloads:
+        searches[payload.get("query") or ""] += payload.get("occurrences", 1)
+        items.update(payload.get("final_items") or [])
+    searches.pop("", None)
+
+    timestamps = sorted(p.get("timestamp") for p in payloads if p.get("timestamp"))
+    top_searches = [q for q, _ in searches.most_common(SUMMARY_TOP_N)]
+    return {
+        "kind": "summary",
+        "user_id": user_id,
+        "query": "Past searches: " + ", ".join(top_searches),
+        "item_details": "; ".join(
+            sorted({p.get("item_details") for p in payloads if p.get("item_details")})
+        )[:500],
+        "final_items": [i for i, _ in items.most_common(SUMMARY_TOP_N * 2)],
+        "timestamp": timestamps[-1] if timestamps else None,
+        "first_timestamp": timestamps[0] if timestamps else None,
+        "occurrences": sum(searches.values()) or len(payloads),
+        "description": f"Summary of {len(payloads)} older shopping episode(s)",
+        "searches": dict(searches.most_common(SUMMARY_TOP_N * 5)),
+    }
+
+
+def merge_summary(existing: dict, summary: dict) -> dict:
+    """Fold a new summary into the user's previous one"""
+    searches = Counter(existing.get("searches") or {})
+    searches.update(summary.get("searches") or {})
+    merged = merge_episode(existing, summary)
+    merged["searches"] = dict(searches.most_common(SUMMARY_TOP_N * 5))
+    merged["query"] = "Past searches: " + ", ".join(q for q, _ in searches.most_common(SUMMARY_TOP_N))
+    return merged
+
+
+class EpisodeWriter:
+    """
+    Buffered, write-behind episode writer for Qdrant.
+
+    Episodes submitted from the REPL are queued and flushed by a background
+    thread once `batch_size` episodes are pending or `flush_interval`
+    seconds have passed since the first pending one. Each flush encodes the
+    whole batch in one pass and writes it with a single multi-point upsert.
+    Pending episodes are flushed on close() and at interpreter exit.
+    """
+
+    def __init__(self, batch_size: int = 32, flush_interval: float = 2.0, collection: str = COLLECTION_NAME):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.collection = collection
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._closed = False
+
+        self.written = 0
+        self.failed = 0
+        self.merged = 0
+
+    # --------------------
+    # Background writer
+    # --------------------
+    def submit(self, episode: dict) -> bool:
+        """Queue an episode for upload; returns immediately"""
+        missing = [field for field in REQUIRED_FIELDS if not episode.get(field)]
+        if missing:
+            print(f"⚠️ Episode skipped, missing: {', '.join(missing)}")
+            return False
+        if self._closed:
+            # Late submissions after shutdown are written synchronously
+            return self.write_batch([episode]) == 1
+
+        self._start()
+        self._queue.put(dict(episode))
+        return True
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="episode-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _worker(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self.write_batch(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Block until every queued episode has been written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Flush pending episodes and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            if self.written or self.failed:
+                print(f"🟢 Episodic memory flushed ({self.written} written, {self.failed} failed)")
+
+    # --------------------
+    # Bulk writes
+    # --------------------
+    def write_batch(self, episodes: list) -> int:
+        """Encode and upsert episodes with one multi-point upsert"""
+        if not episodes:
+            return 0
+        try:
+            vectors = embedding_service.encode_many([e["query"] for e in episodes])
+            points = upsert_episodes(episodes, vectors, collection=self.collection)
+        except Exception as e:
+            self.failed += len(episodes)
+            print(f"❌ Failed to upload {len(episodes)} episode(s) to Qdrant: {e}")
+            return 0
+
+        self.written += len(episodes)
+        self.merged += len(episodes) - points
+        return len(episodes)
+
+    def backfill(self, path: str, batch_size: int = 256) -> int:
+        """Bulk-load past episodes from a JSONL file (one episode per line)"""
+        batch, total, skipped = [], 0, 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    episode = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"⚠️ Skipping line {line_no}: {e}")
+                    skipped += 1
+                    continue
+                if any(not episode.get(field) for field in REQUIRED_FIELDS):
+                    print(f"⚠️ Skipping line {line_no}: missing required fields")
+                    skipped += 1
+                    continue
+
+                episode.setdefault("item_details", "")
+                episode.setdefault("final_items", [])
+                episode.setdefault("description", f"Shopping episode for {episode['query']}")
+                batch.append(episode)
+                if len(batch) >= batch_size:
+                    total += self.write_batch(batch)
+                    batch = []
+
+        total += self.write_batch(batch)
+        print(f"📦 Backfilled {total} episode(s) from {path} ({skipped} skipped)")
+        return total
+
+    # --------------------
+    # Compaction
+    # --------------------
+    def compact(self, older_than_days: float = 90, min_episodes: int = 5) -> dict:
+        """
+        Roll each user's episodes older than `older_than_days` into one
+        summary point per user (most frequent searches and items), then
+        delete the rolled-up episodes. Users with fewer than `min_episodes`
+        old episodes are left alone. Returns collection stats before/after.
+        """
+        from qdrant_client import models
+
+        client = get_qdrant_client()
+        start = time.perf_counter()
+        before = client.count(self.collection, exact=True).count
+        cutoff = time.time() - older_than_days * 86400
+
+        # Old regular episodes (summaries are merged into, not rolled up)
+        old_filter = models.Filter(
+            should=[
+                models.FieldCondition(key="timestamp_epoch", range=models.Range(lt=cutoff)),
+                models.IsEmptyCondition(is_empty=models.PayloadField(key="timestamp_epoch")),
+            ],
+            must_not=[models.FieldCondition(key="kind", match=models.MatchValue(value="summary"))],
+        )
+
+        by_user, offset = {}, None
+        while True:
+            points, offset = client.scroll(
+                self.collection, scroll_filter=old_filter, limit=1000,
+                offset=offset, with_payload=True, with_vectors=False,
+            )
+            for p in points:
+                payload = p.payload or {}
+                epoch = payload.get("timestamp_epoch") or timestamp_epoch(payload.get("timestamp"))
+                if epoch is None or epoch < cutoff:
+                    by_user.setdefault(payload.get("user_id"), []).append((str(p.id), payload))
+            if offset is None:
+                break
+
+        summaries, rolled_up = [], []
+        for user_id, episodes in by_user.items():
+            if not user_id or len(episodes) < min_episodes:
+                continue
+            summaries.append(summarize_episodes(user_id, [payload for _, payload in episodes]))
+            rolled_up.extend(point_id for point_id, _ in episodes)
+
+        if summaries:
+            vectors = embedding_service.encode_many([s["query"] for s in summaries])
+            points = []
+            for summary, vector in zip(summaries, vectors):
+                point_id = episode_point_id(summary["user_id"], SUMMARY_QUERY_KEY)
+                existing = client.retrieve(self.collection, ids=[point_id], with_payload=True)
+                if existing:
+                    summary = merge_summary(existing[0].payload, summary)
+                points.append(build_episode_point(summary, vector, point_id=point_id))
+            client.upsert(collection_name=self.collection, points=points)
+            for i in range(0, len(rolled_up), 1000):
+                client.delete(self.collection, points_selector=models.PointIdsList(points=rolled_up[i:i + 1000]))
+            episode_search_cache.clear()
+
+        after = client.count(self.collection, exact=True).count
+        report = {
+            "points_before": before,
+            "points_after": after,
+            "users_compacted": len(summaries),
+            "episodes_rolled_up": len(rolled_up),
+            "elapsed_s": round(time.perf_counter() - start, 3),
+        }
+        print(f"🗜️ Compacted {len(rolled_up)} episode(s) for {len(summaries)} user(s): {before} → {after} points")
+        return report
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "merged": self.merged,
+            "failed": self.failed,
+        }
+
+
+# Provide a module-level singleton instance
+episode_writer = EpisodeWriter()
@@ -1,68 +1,25 @@
 #!/usr/bin/env python
-import sys, os, warnings, uuid, json
+import sys, os, re, time, warnings, uuid, json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from shop_agent.crew import ShopAgent
-from shop_agent.memory import memory_manager
-from shop_agent.tools.custom_tool import QdrantCustomUpsertTool 
-from shop_agent.memory import memory_manager
+from dotenv import load_dotenv
+from shop_agent.memory import memory_manager, GLOBAL_USER_ID
+from shop_agent.episode_writer import episode_writer
+from shop_agent.preference_parser import parse_user_details, extract_user_preference, FAST_PATH_CONFIDENCE
+from shop_agent.tracing import tracer
+from shop_agent.db.search_cache import search_cache
+from shop_agent.usage import usage_tracker
+from shop_agent.ranking import estimate_tokens
+from shop_agent.report_parser import parse_compare_report, parse_shopping_results
+
+# crewai, qdrant_client and sentence_transformers (torch) are imported lazily
+# inside run() so that `import shop_agent.main` stays fast.
+load_dotenv()
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
-def parse_user_details(details: str):
-    """Parse user details into structured preferences"""
-    parts = [part.strip() for part in details.split(',')]
-    preferences = {}
-    
-    for part in parts:
-        part_lower = part.lower().strip()
-        original_part = part.strip()
-        
-        # Extract budget (look for numbers)
-        if any(char.isdigit() for char in part_lower):
-            # Extract all numbers from the string
-            import re
-            numbers = re.findall(r'\d+', part_lower)
-            if numbers:
-                # Take the largest number as budget (assuming it's the price)
-                budget = max([int(num) for num in numbers])
-                preferences['budget'] = budget
-                print(f"DEBUG: Found budget: {budget} from '{original_part}'")
-        
-        # Common colors
-        colors = ['black', 'white', 'red', 'blue', 'green', 'pink', 'grey', 'gray', 'silver', 'gold', 'brown', 'yellow', 'purple', 'orange']
-        for color in colors:
-            if color in part_lower:
-                preferences['color'] = color
-                print(f"DEBUG: Found color: {color} from '{original_part}'")
-                break
-        
-        # Features
-        if 'noise' in part_lower and 'cancel' in part_lower:
-            if 'features' not in preferences:
-                preferences['features'] = []
-            preferences['features'].append('noise_cancellation')
-            print(f"DEBUG: Found feature: noise_cancellation from '{original_part}'")
-        elif 'wireless' in part_lower or 'bluetooth' in part_lower:
-            if 'features' not in preferences:
-                preferences['features'] = []
-            preferences['features'].append('wireless')
-            print(f"DEBUG: Found feature: wireless from '{original_part}'")
-        elif 'waterproof' in part_lower or 'water resistant' in part_lower:
-            if 'features' not in preferences:
-                preferences['features'] = []
-            preferences['features'].append('waterproof')
-            print(f"DEBUG: Found feature: waterproof from '{original_part}'")
-        elif len(part_lower) > 2 and not any(char.isdigit() for char in part_lower) and not any(color in part_lower for color in colors):
-            # General feature if it's not a color or number
-            if 'features' not in preferences:
-                preferences['features'] = []
-            preferences['features'].append(original_part)
-            print(f"DEBUG: Found general feature: {original_part}")
-    
-    # Add the raw input for reference
-    preferences['raw_input'] = details
-    
-    return preferences
+# Long-term preference saves run here, off the critical path, in parallel mode
+_persistence_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
 
 def get_user_input():
     product = input(
@@ -73,24 +30,149 @@ def get_user_input():
     details = input("Describe your needs (color, budget, must-have features): ").strip()
     return {'target_item': product, 'item_details': details}
 
+def user_id_for(username: str) -> str:
+    """Map a username to its stable session UUID"""
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, username.strip().lower()))
+
+def build_inputs(user_id, user_data, parsed_preferences, short_term, long_term_prefs):
+    """Build the crew kickoff inputs for one shopping query"""
+    return {
+        'user_id': str(user_id),
+        'target_item': user_data['target_item'],
+        'item_details': user_data['item_details'],
+        'user_preferences': parsed_preferences,
+        'short_term': short_term or "none",
+        'long_term_preferences': long_term_prefs or {},
+    }
+
+def plan_query(user_data, parsed_preferences):
+    """
+    Pick the crew variant for a query. Product names are parsed locally from
+    the compare report, so markdown_extraction_task only runs as a fallback;
+    when the rule-based extractor is confident, its UserPreference replaces
+    the LLM preference_extraction_task as well.
+    Returns (exclude_tasks, user_preferences, confidence).
+    """
+    exclude_tasks = ('markdown_extraction_task',)
+    preference, confidence = extract_user_preference(user_data['target_item'], user_data['item_details'])
+    if confidence >= FAST_PATH_CONFIDENCE:
+        return exclude_tasks + ('preference_extraction_task',), preference.model_dump(exclude_none=True), confidence
+    return exclude_tasks, parsed_preferences, confidence
+
+# If output comes in Markdown format (```json ... ```)
+def extract_json_block(text):
+    if not isinstance(text, str):
+        return None
+    match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
+    return match.group(1) if match else text.strip()
+
+def _names_to_products(parsed):
+    """Normalize ExtractedProductNames output into product dicts"""
+    if isinstance(parsed, dict):
+        parsed = parsed.get('items', [])
+    return [{'title': str(name)} for name in parsed or [] if name]
+
+def markdown_extraction_task(inputs=None):
+    """
+    A fresh markdown_extraction_task with its own agent, bound to the
+    kickoff's inputs. The ShopAgent's task is shared by every crew and
+    batch thread, so it is copied rather than executed directly.
+    """
+    from shop_agent.crew import get_shop_agent
+    template = get_shop_agent().markdown_extraction_task()
+    task = template.copy(agents=[template.agent.copy()], task_mapping={})
+    if inputs:
+        task.interpolate_inputs_and_add_conversation_history(inputs)
+    return task
+
+def extract_product_list(raw_output, inputs=None):
+    """
+    Pull the recommended products (title, link, price, source) out of a
+    crew output. The compare report is parsed locally; the markdown parser
+    agent only runs when that fails (with the kickoff's `inputs`).
+    """
+    outputs = {t.name: t.raw for t in raw_output.tasks_output}
+
+    # markdown_extraction_task ran as part of the crew
+    if outputs.get('markdown_extraction_task'):
+        try:
+            json_str = extract_json_block(outputs['markdown_extraction_task'])
+            return _names_to_products(json.loads(json_str) if json_str else [])
+        except Exception as e:
+            print(f"❌ Failed to parse final output: {e}")
+            return []
+
+    report = outputs.get('item_compare_task') or getattr(raw_output, 'raw', None)
+    products = parse_compare_report(report, parse_shopping_results(outputs.get('item_find_task')))
+    if products:
+        return products
+
+    # Fallback: let the markdown parser agent read the report
+    print("⚠️ Could not parse the compare report locally; asking the markdown parser agent")
+    try:
+        task_output = markdown_extraction_task(inputs).execute_sync(context=report)
+        if task_output.pydantic is not None:
+            return _names_to_products(task_output.pydantic.items)
+        json_str = extract_json_block(task_output.raw)
+        return _names_to_products(json.loads(json_str) if json_str else [])
+    except Exception as e:
+        print(f"❌ Failed to parse final output: {e}")
+        return []
+
+def persist_preferences(target_item, parsed_preferences, long_term_prefs, user_id=None):
+    """Merge the parsed preferences into long-term memory and save them"""
+    if long_term_prefs:
+        # Merge with existing preferences
+        merged_prefs = {**long_term_prefs, **parsed_preferences}
+        
+        # Handle features separately to avoid duplicates
+        if 'features' in long_term_prefs and 'features' in parsed_preferences:
+            existing_features = long_term_prefs.get('features', [])
+            new_features = parsed_preferences.get('features', [])
+            # Combine and remove duplicates
+            merged_features = list(set(existing_features + new_features))
+            merged_prefs['features'] = merged_features
+    else:
+        merged_prefs = parsed_preferences
+
+    save_success = memory_manager.save_user_preferences(target_item, merged_prefs, user_id=user_id)
+
+    if save_success:
+        print("✅ Preferences successfully saved to database!")
+    else:
+        print("❌ Failed to save preferences to database")
+
+    return save_success
+
 def run():
+    from shop_agent.crew import get_crew, execution_report, trace_tasks, EXECUTION_MODE as execution_mode
+
      # 🔤 Ask for a consistent user identifier
     username = input("👤 Enter your username: ").strip().lower()
-    session_user_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, username))
+    session_user_id = user_id_for(username)
     print(f"💡 Session started for user: {username} (UUID: {session_user_id})\n")
 
-    memory_manager.clear_short()
+    memory_manager.clear_short(session_user_id)
+    tracer.start_session()
+    usage_tracker.start_session()
 
     episodes = []  # 🧠 Store all shopping episodes here
-    qdrant_tool = QdrantCustomUpsertTool()  # 🔧 One-time init
+    pending_save = None
 
     while True:
         try:
             user_data = get_user_input()
             if user_data is None:
                 print("\n👋 Exiting Smart Shopping Assistant. Goodbye!")
-                memory_manager.clear_short()
+                memory_manager.clear_short(session_user_id)
                 print("🧠 Short-term memory cleared.\n")
+                episode_writer.close()  # 📡 Flush pending episodes to Qdrant
+                _persistence_pool.shutdown(wait=True)  # 💾 Finish background preference saves
+                print(f"📊 Preference storage: {memory_manager.storage_metrics()}")
+                print(f"📊 SerpAPI cache: {search_cache.stats()}")
+                tracer.print_summary()
+                tracer.flush()
+                usage_tracker.print_summary()
                 break
             
             start_time = datetime.now()
@@ -98,51 +180,36 @@ def run():
             parsed_preferences = parse_user_details(user_data['item_details'])
             print(f"📝 Parsed user preferences: {parsed_preferences}")
 
-            long_term_prefs = memory_manager.get_user_preferences(user_data['target_item'])
-            short_term = memory_manager.short_term
+            if pending_save is not None:
+                pending_save.result()  # Read our own last write
+            long_term_prefs = memory_manager.get_user_preferences(user_data['target_item'], user_id=session_user_id)
+            short_term = memory_manager.short_term_summary(session_user_id)
 
             print(f"\n🔍 Searching for {user_data['target_item']} with specs: {user_data['item_details']}")
             print(f"   • Injected long-term prefs: {long_term_prefs}")
-            print(f"   • Last final_items in short-term: {bool(short_term.get('last_final_items'))}\n")
+            print(f"   • Short-term memory: ~{estimate_tokens(short_term)} tokens\n")
 
             # print("🚀 Starting shopping assistant pipeline...\n")
-            raw_output = ShopAgent().crew().kickoff(inputs={
-                'user_id': str(session_user_id),
-                'target_item': user_data['target_item'],
-                'item_details': user_data['item_details'],
-                'user_preferences': parsed_preferences,
-                'short_term': short_term,
-                'long_term_preferences': long_term_prefs or {},
-            })
-
-            import re
-
-            # If output comes in Markdown format (```json ... ```)
-            def extract_json_block(text):
-                if not isinstance(text, str):
-                    return None
-                match = re.search(r"```json\s*(\{.*?\})\s*```", text, re.DOTALL)
-                return match.group(1) if match else text.strip()
-
-            parsed_items = next(
-                (t.raw for t in raw_output.tasks_output if t.name == "markdown_extraction_task"),
-                None
-            )
-
-            # Fallback if markdown_extraction_task didn't run
-            if not parsed_items and hasattr(raw_output, "final_output"):
-                parsed_items = raw_output.final_output
-
-            # Try parsing safely
-            try:
-                json_str = extract_json_block(parsed_items)
-                product_list = json.loads(json_str) if json_str else []
-            except Exception as e:
-                print(f"❌ Failed to parse final output: {e}")
-                product_list = []
-
-                    
-                print("\n🔖 Final Parsed Items:\n", product_list)
+            exclude_tasks, user_preferences, confidence = plan_query(user_data, parsed_preferences)
+            if 'preference_extraction_task' in exclude_tasks:
+                print(f"⚡ Rule-based preferences (confidence {confidence:.2f}): skipping LLM preference extraction")
+
+            crew = get_crew(exclude_tasks)  # Built on first query, then reused
+            inputs = build_inputs(session_user_id, user_data, user_preferences, short_term, long_term_prefs)
+            usage_before = usage_tracker.snapshot(crew)
+            kickoff_start = time.perf_counter()
+            with tracer.span("crew.kickoff", mode=execution_mode, tasks=len(crew.tasks)):
+                raw_output = crew.kickoff(inputs=inputs)
+            report = execution_report(crew, time.perf_counter() - kickoff_start)
+            trace_tasks(crew)
+            usage_tracker.print_query(usage_tracker.record_kickoff(
+                crew, usage_before, inputs, raw_output, user_id=session_user_id
+            ))
+            if execution_mode == 'parallel':
+                print(f"⏱️ Parallel tasks saved {report['saved_s']:.1f}s "
+                      f"(tasks back to back: {report['serial_s']:.1f}s, wall clock: {report['wall_s']:.1f}s)")
+
+            product_list = extract_product_list(raw_output, inputs)
 
             # 🧠 Save episode for later
             final_items = getattr(raw_output, 'result', None) or str(raw_output)
@@ -153,48 +220,92 @@ def run():
                 'user_id': str(session_user_id),
                 'query': f"{user_data['target_item']}",
                 'item_details': user_data['item_details'],
-                'final_items': product_list,
+                'final_items': [p['title'] for p in product_list],
                 'timestamp': datetime.now().isoformat(),
                 'description': f"Shopping episode for {user_data['target_item']}"
             }
 
             episodes.append(episode_data)
 
-             # 📡 Upload to Qdrant after each episode
-            result = qdrant_tool._run(**episode_data)
-            print(f"🟢 Episodic memory uploaded for: {user_data['target_item']}")
-
-
-            # Update long-term preferences
-            if long_term_prefs:
-                # Merge with existing preferences
-                merged_prefs = {**long_term_prefs, **parsed_preferences}
-                
-                # Handle features separately to avoid duplicates
-                if 'features' in long_term_prefs and 'features' in parsed_preferences:
-                    existing_features = long_term_prefs.get('features', [])
-                    new_features = parsed_preferences.get('features', [])
-                    # Combine and remove duplicates
-                    merged_features = list(set(existing_features + new_features))
-                    merged_prefs['features'] = merged_features
-            else:
-                merged_prefs = parsed_preferences
+            # 📡 Queue for Qdrant; uploaded in batches by a background thread
+            episode_writer.submit(episode_data)
+            print(f"🟢 Episodic memory queued for: {user_data['target_item']}")
 
-            save_success = memory_manager.save_user_preferences(user_data['target_item'], merged_prefs)
 
-            if save_success:
-                print("✅ Preferences successfully saved to database!")
-                
-                # Verify save by reading back
-                verification = memory_manager.get_user_preferences(user_data['target_item'])
-                print(f"🔍 Verification - Retrieved preferences: {verification}")
+            # 💾 Update long-term preferences (in the background in parallel mode)
+            if execution_mode == 'parallel':
+                pending_save = _persistence_pool.submit(
+                    persist_preferences, user_data['target_item'], parsed_preferences, long_term_prefs, session_user_id
+                )
             else:
-                print("❌ Failed to save preferences to database")
+                persist_preferences(user_data['target_item'], parsed_preferences, long_term_prefs, session_user_id)
 
-            memory_manager.write_short('last_final_items', product_list)
+            memory_manager.write_short('last_query', f"{user_data['target_item']} ({user_data['item_details']})", session_user_id)
+            memory_manager.write_short('last_final_items', product_list, session_user_id)
 
             elapsed = (datetime.now() - start_time).total_seconds()
+            tracer.record("pipeline.query", elapsed, start=start_time.timestamp(),
+                          user_id=session_user_id, target_item=user_data['target_item'])
             print(f"\n✅ Completed in {elapsed:.1f}s\n")
 
         except Exception as e:
-            print(f"\n❌ Error: {e}", file=sys.stderr)
\ No newline at end of file
+            print(f"\n❌ Error: {e}", file=sys.stderr)
+
+def backfill_episodes():
+    """
+    Bulk-load past shopping episodes from a JSONL file into Qdrant.
+    Usage: backfill_episodes <episodes.jsonl>
+    """
+    if len(sys.argv) < 2:
+        print("Usage: backfill_episodes <episodes.jsonl>", file=sys.stderr)
+        sys.exit(1)
+    episode_writer.backfill(sys.argv[1])
+
+
+def batch():
+    """
+    Run many shopping queries concurrently from a JSONL or CSV file.
+    Rows need user, target_item and item_details; results are streamed to JSONL.
+    Usage: batch <input.jsonl|input.csv> [-o results.jsonl] [-c 4]
+    """
+    import argparse
+    from shop_agent.batch import BatchRunner
+
+    parser = argparse.ArgumentParser(prog="batch", description="Batch shopping recommendations")
+    parser.add_argument("input", help="JSONL or CSV file of user, target_item, item_details rows")
+    parser.add_argument("-o", "--output", default="output/batch_results.jsonl", help="JSONL results file")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum concurrent crew kickoffs")
+    parser.add_argument("--no-episodes", action="store_true", help="Do not record episodes in Qdrant")
+    args = parser.parse_args(sys.argv[1:])
+
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+
+    runner = BatchRunner(concurrency=args.concurrency, record_episodes=not args.no_episodes)
+    summary = runner.run(args.input, args.output)
+    print(f"\n✅ Batch completed: {json.dumps(summary, indent=2)}")
+
+
+def migrate_preferences():
+    """
+    One-off migration of preference documents saved before they were keyed
+    per user. Usage: migrate_preferences [default_user_id]
+    """
+    default_user_id = sys.argv[1] if len(sys.argv) > 1 else GLOBAL_USER_ID
+    memory_manager.migrate_preferences(default_user_id)
+
+
+def compact_episodes():
+    """
+    Roll old shopping episodes into one summary episode per user.
+    Usage: compact_episodes [--older-than-days 90] [--min-episodes 5]
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="compact_episodes", description="Compact old shopping episodes")
+    parser.add_argument("--older-than-days", type=int, default=90, help="Only roll up episodes older than this")
+    parser.add_argument("--min-episodes", type=int, default=5, help="Minimum old episodes per user to compact")
+    args = parser.parse_args(sys.argv[1:])
+
+    report = episode_writer.compact(older_than_days=args.older_than_days, min_episodes=args.min_episodes)
+    print(f"\n✅ Compaction completed: {json.dumps(report, indent=2)}")
@@ -1,229 +1,361 @@
+import asyncio
+import copy
 import threading
 import os
-import json
-from datetime import datetime
-from pymongo import MongoClient
+from shop_agent.cache import LRUCache
+from shop_agent.short_term import ShortTermStore, TOKEN_BUDGET
+from shop_agent.tracing import traced
+from shop_agent.db.preference_store import BACKENDS, ASYNC_BACKENDS, GLOBAL_USER_ID, FilePreferenceStore
 
-# File where episodic memory is stored
+# Cached "no preferences stored" result, distinct from a cache miss
+_MISSING = object()
 
 class MemoryManager:
     """
     Singleton manager for handling short-term, episodic, and long-term memory.
+
+    Long-term preferences live in a pluggable PreferenceStore backend chosen
+    by PREFERENCE_BACKEND: "mongo", "file", or "auto" (MongoDB, falling back
+    to the local file store when it is unreachable).
     """
 
-    def __init__(self):
-        self.short_term = {}  # Short-term memory
-        try:
-            # MongoDB connection
-            self.client = MongoClient(os.getenv("MONGODB_URI"))
-            self.db = self.client.shop_agent
-            self.preferences_collection = self.db.user_preferences
-            
-            # Test connection
-            self.client.admin.command('ping')
-            print("✅ Connected to MongoDB successfully")
-            
-            # Create indexes for better performance
-            self.preferences_collection.create_index("item_name")
-            self.preferences_collection.create_index("timestamp")
-            
-        except Exception as e:
-            print(f"❌ MongoDB connection failed: {e}")
-            print("📝 Falling back to file-based storage...")
-            self.client = None
-            self.db = None
-            self.preferences_collection = None
-            
-            # Create knowledge directory if it doesn't exist
-            os.makedirs("knowledge", exist_ok=True)
-    
-    def get_user_preferences(self, item_name: str = None):
-        """Get user preferences - MongoDB first, fallback to file"""
+    def __init__(self, backend: str = None):
+        self.short_term = ShortTermStore()  # Bounded, per-user session memory
+        self.backend_name = (backend or os.getenv("PREFERENCE_BACKEND", "auto")).strip().lower()
+
+        # Read-through/write-through cache for per-item preference lookups
+        self._preference_cache = LRUCache(
+            maxsize=int(os.getenv("PREFERENCE_CACHE_SIZE", 1024)),
+            ttl=float(os.getenv("PREFERENCE_CACHE_TTL", 300)),
+        )
+
+        # Backends are connected lazily, on first long-term memory access
+        self._store = None
+        self._async_store = None
+        self._file_store = None
+        self._connect_lock = threading.Lock()
+
+    def _connect(self):
+        """Open the configured backend once, falling back to file-based storage"""
+        with self._connect_lock:
+            if self._store is not None:
+                return
+            if self.backend_name in ("auto", "mongo"):
+                try:
+                    self._store = BACKENDS["mongo"]()
+                    print("✅ Connected to MongoDB successfully")
+                    return
+                except Exception as e:
+                    print(f"❌ MongoDB connection failed: {e}")
+                    print("📝 Falling back to file-based storage...")
+            elif self.backend_name != "file":
+                print(f"⚠️ Unknown PREFERENCE_BACKEND '{self.backend_name}', using file-based storage")
+            self._store = self.file_store
+
+    @property
+    def store(self):
+        """The active long-term preference backend"""
+        if self._store is None:
+            self._connect()
+        return self._store
+
+    @property
+    def file_store(self):
+        """Local file backend, used directly when the primary backend fails"""
+        if self._file_store is None:
+            self._file_store = FilePreferenceStore()
+        return self._file_store
+
+    def _fallback(self, store):
+        """The file backend to retry on, or None if it already failed"""
+        return None if store is self.file_store else self.file_store
+
+    # --------------------
+    # Preference cache
+    # --------------------
+    def _cache_get(self, item_name: str, user_id: str):
+        value = self._preference_cache.get((user_id, item_name))
+        if value is None or value is _MISSING:
+            return value
+        return copy.deepcopy(value)
+
+    def _cache_set(self, item_name: str, user_id: str, value):
+        value = _MISSING if value is None else copy.deepcopy(value)
+        self._preference_cache.set((user_id, item_name), value)
+
+    def _invalidate(self, item_name: str = None, user_id: str = None):
+        """
+        Drop cached lookups affected by a write. Global preferences are the
+        fallback for every user, so changes to them clear the whole cache.
+        """
+        if item_name and user_id and user_id != GLOBAL_USER_ID:
+            self._preference_cache.pop((user_id, item_name))
+        else:
+            self._preference_cache.clear()
+
+    def cache_stats(self) -> dict:
+        """Hit-rate stats for the preference lookup cache"""
+        return self._preference_cache.stats()
+
+    def storage_metrics(self) -> dict:
+        """Backend metrics (connection pool counters for MongoDB)"""
+        return {**self.store.metrics(), "cache": self.cache_stats()}
+
+    # --------------------
+    # Long-term memory
+    # --------------------
+    @traced("memory.get_user_preferences")
+    def get_user_preferences(self, item_name: str = None, user_id: str = None):
+        """
+        Get user preferences - primary backend first, fallback to file.
+        With an item_name, returns the user's document for that item (or the
+        shared pre-migration one); without, all of the user's documents.
+        Per-item lookups are served from the preference cache when possible.
+        """
+        user_id = user_id or GLOBAL_USER_ID
+        if item_name:
+            cached = self._cache_get(item_name, user_id)
+            if cached is not None:
+                return None if cached is _MISSING else cached
+            prefs, answered = self._get_user_preferences(item_name, user_id)
+            if answered:
+                self._cache_set(item_name, user_id, prefs)
+            return prefs
+        return self._get_user_preferences(item_name, user_id)[0]
+
+    def _get_user_preferences(self, item_name: str, user_id: str):
+        """
+        Returns (prefs, answered). answered is False when the active backend
+        raised: the result then comes from the fallback (or is None) and must
+        not be cached, or a transient error would hide the user's
+        preferences for the whole cache TTL.
+        """
+        store = self.store
         try:
-            if self.preferences_collection is not None:
-                # MongoDB approach
-                if item_name:
-                    prefs = self.preferences_collection.find_one({"item_name": item_name})
-                    if prefs:
-                        prefs.pop('_id', None)
-                        return prefs
-                    return None
-                else:
-                    all_prefs = list(self.preferences_collection.find())
-                    for pref in all_prefs:
-                        pref.pop('_id', None)
-                    return all_prefs
-            else:
-                # File-based fallback
-                return self._get_preferences_from_file(item_name)
-                
+            return (store.get(item_name, user_id) if item_name else store.find(user_id)), True
         except Exception as e:
             print(f"Error retrieving preferences: {e}")
-            return self._get_preferences_from_file(item_name)
-    
-    def _get_preferences_from_file(self, item_name: str = None):
-        """Fallback method to get preferences from file"""
-        path = "knowledge/user_preferences.json"
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r') as f:
-                all_prefs = json.load(f)
-            if item_name:
-                return all_prefs.get(item_name)
-            return all_prefs
-        except json.JSONDecodeError:
-            return None
+            fallback = self._fallback(store)
+            if fallback is None:
+                return None, False
+            try:
+                return (fallback.get(item_name, user_id) if item_name else fallback.find(user_id)), False
+            except Exception as e:
+                print(f"Error reading preferences file: {e}")
+                return None, False
+
+    def iter_user_preferences(self, user_id: str = None, batch_size: int = 500):
+        """Stream preference documents (all users unless user_id is given)"""
+        return self.store.iter(user_id, batch_size=batch_size)
+
+    @traced("memory.list_user_preferences")
+    def list_user_preferences(self, user_id: str = None, limit: int = 50, after=None):
+        """
+        One page of preference documents, ordered by (user_id, item_name).
+        Pass the returned `next` value as `after` to fetch the following page.
+        """
+        items = self.store.list_page(user_id, limit=limit, after=after)
+        next_after = [items[-1]["user_id"], items[-1]["item_name"]] if len(items) == limit else None
+        return {"items": items, "next": next_after}
     
-    def save_user_preferences(self, item_name: str, preferences: dict):
-        """Save or update user preferences"""
+    @traced("memory.save_user_preferences")
+    def save_user_preferences(self, item_name: str, preferences: dict, user_id: str = None):
+        """Save or update a user's preferences for an item"""
+        user_id = user_id or GLOBAL_USER_ID
+        store = self.store
+        cached = self._cache_get(item_name, user_id)
+        self._invalidate(item_name, user_id)
         try:
-            if self.preferences_collection is not None:
-                # MongoDB approach
-                preferences['timestamp'] = datetime.now().isoformat()
-                preferences['item_name'] = item_name
-                
-                result = self.preferences_collection.update_one(
-                    {"item_name": item_name},
-                    {"$set": preferences},
-                    upsert=True
-                )
-                
-                if result.upserted_id:
-                    print(f"✅ New preferences saved for {item_name}")
-                else:
-                    print(f"✅ Preferences updated for {item_name}")
-                
-                return True
-            else:
-                # File-based fallback
-                return self._save_preferences_to_file(item_name, preferences)
-                
+            created = store.save(item_name, preferences, user_id)
         except Exception as e:
             print(f"Error saving preferences: {e}")
-            return self._save_preferences_to_file(item_name, preferences)
-    
-    def _save_preferences_to_file(self, item_name: str, preferences: dict):
-        """Fallback method to save preferences to file"""
-        path = "knowledge/user_preferences.json"
-        try:
-            # Load existing preferences
-            if os.path.exists(path):
-                with open(path, 'r') as f:
-                    all_prefs = json.load(f)
-            else:
-                all_prefs = {}
-            
-            # Add timestamp
-            preferences['timestamp'] = datetime.now().isoformat()
-            
-            # Update preferences
-            all_prefs[item_name] = preferences
-            
-            # Save back to file
-            with open(path, 'w') as f:
-                json.dump(all_prefs, f, indent=2)
-            
+            store = self._fallback(store)
+            if store is None:
+                return False
+            try:
+                created = store.save(item_name, preferences, user_id)
+            except Exception as e:
+                print(f"Error saving preferences to file: {e}")
+                return False
+
+        if store is self.file_store:
             print(f"✅ Preferences saved to file for {item_name}")
-            return True
-            
-        except Exception as e:
-            print(f"Error saving preferences to file: {e}")
-            return False
-    
-    def delete_preferences(self, item_name: str = None):
-        """Delete preferences"""
-        try:
-            if self.preferences_collection is not None:
-                # MongoDB approach
-                if item_name:
-                    result = self.preferences_collection.delete_one({"item_name": item_name})
-                    print(f"Deleted {result.deleted_count} preference(s) for {item_name}")
-                else:
-                    result = self.preferences_collection.delete_many({})
-                    print(f"Deleted {result.deleted_count} preference(s)")
-                return True
-            else:
-                # File-based fallback
-                return self._delete_preferences_from_file(item_name)
-                
-        except Exception as e:
-            print(f"Error deleting preferences: {e}")
-            return False
+        elif created:
+            print(f"✅ New preferences saved for {item_name}")
+        else:
+            print(f"✅ Preferences updated for {item_name}")
+
+        # Write-through. The file store replaces the whole value; MongoDB's
+        # $set merges into the stored document, so the cached copy is only
+        # exact for new documents or ones that were already cached
+        if store is self.file_store or created:
+            self._cache_set(item_name, user_id, preferences)
+        elif isinstance(cached, dict) and cached.get("user_id") == user_id:
+            self._cache_set(item_name, user_id, {**cached, **preferences})
+        return True
     
-    def _delete_preferences_from_file(self, item_name: str = None):
-        """Fallback method to delete preferences from file"""
-        path = "knowledge/user_preferences.json"
+    @traced("memory.delete_preferences")
+    def delete_preferences(self, item_name: str = None, user_id: str = None):
+        """Delete preferences (for one item, or all of a user's; all users if no user_id)"""
+        self._invalidate(item_name, user_id)
         try:
-            if not os.path.exists(path):
-                return True
-            
-            with open(path, 'r') as f:
-                all_prefs = json.load(f)
-            
+            deleted = self.store.delete(item_name, user_id)
             if item_name:
-                if item_name in all_prefs:
-                    del all_prefs[item_name]
-                    print(f"Deleted preferences for {item_name}")
+                print(f"Deleted {deleted} preference(s) for {item_name}")
             else:
-                all_prefs = {}
-                print("Deleted all preferences")
-            
-            with open(path, 'w') as f:
-                json.dump(all_prefs, f, indent=2)
-            
+                print(f"Deleted {deleted} preference(s)")
             return True
-            
         except Exception as e:
-            print(f"Error deleting preferences from file: {e}")
+            print(f"Error deleting preferences: {e}")
             return False
     
-    def get_preferences_history(self, item_name: str = None, limit: int = 10):
+    @traced("memory.get_preferences_history")
+    def get_preferences_history(self, item_name: str = None, limit: int = 10, user_id: str = None):
         """Get historical preferences"""
         try:
-            if self.preferences_collection is not None:
-                # MongoDB approach
-                query = {}
-                if item_name:
-                    query["item_name"] = item_name
-                
-                history = list(self.preferences_collection.find(query)
-                              .sort("timestamp", -1)
-                              .limit(limit))
-                
-                for pref in history:
-                    pref.pop('_id', None)
-                
-                return history
-            else:
-                # File-based fallback - just return current preferences
-                prefs = self.get_user_preferences(item_name)
-                return [prefs] if prefs else []
-                
+            return self.store.history(item_name, limit=limit, user_id=user_id)
         except Exception as e:
             print(f"Error retrieving preferences history: {e}")
             return []
+
+    @traced("memory.migrate_preferences")
+    def migrate_preferences(self, default_user_id: str = GLOBAL_USER_ID) -> int:
+        """
+        One-off migration: assign documents saved before per-user keying to
+        `default_user_id`. Returns the number of documents updated.
+        """
+        if self.store is self.file_store:
+            print("ℹ️ MongoDB unavailable; file-store keys are already compatible")
+            return 0
+        migrated = self.store.migrate(default_user_id)
+        self._invalidate()
+        print(f"✅ Migrated {migrated} preference document(s) to user '{default_user_id}'")
+        return migrated
     
     def close_connection(self):
-        """Close MongoDB connection"""
-        if self.client:
-            self.client.close()
+        """Close the backend connection and flush the file store"""
+        if self._file_store is not None:
+            self._file_store.close()
+        if self._store is not None and self._store is not self._file_store:
+            self._store.close()
             print("🔌 MongoDB connection closed")
 
+    # --------------------
+    # Async long-term memory
+    # --------------------
+    async def _astore(self):
+        """
+        The native async backend, or None when the active backend only has a
+        sync API (its calls then run in a worker thread).
+        """
+        if self._store is None:
+            # Connecting (ping + index creation) is blocking; keep it off the loop
+            await asyncio.to_thread(self._connect)
+        if self._async_store is None and self._store.name in ASYNC_BACKENDS \
+                and self._store is not self._file_store:
+            self._async_store = ASYNC_BACKENDS[self._store.name]()
+        return self._async_store
+
+    @traced("memory.aget_user_preferences")
+    async def aget_user_preferences(self, item_name: str = None, user_id: str = None):
+        """Async get_user_preferences, sharing the same preference cache"""
+        user_id = user_id or GLOBAL_USER_ID
+        if item_name:
+            cached = self._cache_get(item_name, user_id)
+            if cached is not None:
+                return None if cached is _MISSING else cached
+
+        store = await self._astore()
+        if store is None:
+            return await asyncio.to_thread(self.get_user_preferences, item_name, user_id)
+        try:
+            prefs = await (store.get(item_name, user_id) if item_name else store.find(user_id))
+        except Exception as e:
+            print(f"Error retrieving preferences: {e}")
+            prefs, _ = await asyncio.to_thread(self._get_user_preferences, item_name, user_id)
+            return prefs
+        if item_name:
+            self._cache_set(item_name, user_id, prefs)
+        return prefs
+
+    @traced("memory.alist_user_preferences")
+    async def alist_user_preferences(self, user_id: str = None, limit: int = 50, after=None):
+        """Async list_user_preferences"""
+        store = await self._astore()
+        if store is None:
+            return await asyncio.to_thread(self.list_user_preferences, user_id, limit, after)
+        items = await store.list_page(user_id, limit=limit, after=after)
+        next_after = [items[-1]["user_id"], items[-1]["item_name"]] if len(items) == limit else None
+        return {"items": items, "next": next_after}
+
+    @traced("memory.asave_user_preferences")
+    async def asave_user_preferences(self, item_name: str, preferences: dict, user_id: str = None):
+        """Async save_user_preferences"""
+        user_id = user_id or GLOBAL_USER_ID
+        store = await self._astore()
+        if store is None:
+            return await asyncio.to_thread(self.save_user_preferences, item_name, preferences, user_id)
+
+        cached = self._cache_get(item_name, user_id)
+        self._invalidate(item_name, user_id)
+        try:
+            created = await store.save(item_name, preferences, user_id)
+        except Exception as e:
+            print(f"Error saving preferences: {e}")
+            return await asyncio.to_thread(self.save_user_preferences, item_name, preferences, user_id)
+
+        if created:
+            print(f"✅ New preferences saved for {item_name}")
+            self._cache_set(item_name, user_id, preferences)
+        else:
+            print(f"✅ Preferences updated for {item_name}")
+            if isinstance(cached, dict) and cached.get("user_id") == user_id:
+                self._cache_set(item_name, user_id, {**cached, **preferences})
+        return True
+
+    @traced("memory.adelete_preferences")
+    async def adelete_preferences(self, item_name: str = None, user_id: str = None):
+        """Async delete_preferences"""
+        store = await self._astore()
+        if store is None:
+            return await asyncio.to_thread(self.delete_preferences, item_name, user_id)
+        self._invalidate(item_name, user_id)
+        try:
+            deleted = await store.delete(item_name, user_id)
+            if item_name:
+                print(f"Deleted {deleted} preference(s) for {item_name}")
+            else:
+                print(f"Deleted {deleted} preference(s)")
+            return True
+        except Exception as e:
+            print(f"Error deleting preferences: {e}")
+            return False
+
+    async def aclose_connection(self):
+        """Close the async client, then the sync backends"""
+        if self._async_store is not None:
+            await self._async_store.close()
+            self._async_store = None
+        await asyncio.to_thread(self.close_connection)
+
     # --------------------
     # Short-term memory
     # --------------------
-    def write_short(self, key: str, value):
-        """Write a key-value pair into short-term memory."""
-        self.short_term[key] = value
+    def write_short(self, key: str, value, user_id: str = None):
+        """Write a key-value pair into a user's short-term memory."""
+        self.short_term.session(user_id or GLOBAL_USER_ID).write(key, value)
+
+    def read_short(self, key: str, user_id: str = None):
+        """Read a value from a user's short-term memory."""
+        return self.short_term.session(user_id or GLOBAL_USER_ID).read(key)
 
-    def read_short(self, key: str):
-        """Read a value from short-term memory."""
-        return self.short_term.get(key)
+    def short_term_summary(self, user_id: str = None, token_budget: int = TOKEN_BUDGET) -> str:
+        """A user's short-term memory in compact form, for prompt injection."""
+        return self.short_term.session(user_id or GLOBAL_USER_ID).summary(token_budget)
 
-    def clear_short(self):
-        """Clear all short-term memory."""
-        self.short_term.clear()
+    def clear_short(self, user_id: str = None):
+        """Clear a user's short-term memory (everyone's without a user_id)."""
+        self.short_term.clear(user_id)
 
 # Provide a module-level singleton instance
 memory_manager = MemoryManager()
@@ -0,0 +1,316 @@
+import functools
+import logging
+import os
+import re
+from shop_agent.models.model import Budget, UserPreference
+
+logger = logging.getLogger(__name__)
+
+# --------------------
+# Lexicons
+# --------------------
+COLORS = [
+    'black', 'white', 'red', 'blue', 'green', 'pink', 'grey', 'gray', 'silver', 'gold',
+    'brown', 'yellow', 'purple', 'orange', 'beige', 'navy', 'maroon', 'teal', 'cyan',
+    'violet', 'cream', 'rose gold', 'space grey', 'midnight', 'graphite', 'olive',
+]
+
+BRANDS = {
+    'apple': 'Apple', 'samsung': 'Samsung', 'sony': 'Sony', 'boat': 'boAt', 'jbl': 'JBL',
+    'bose': 'Bose', 'oneplus': 'OnePlus', 'realme': 'realme', 'xiaomi': 'Xiaomi', 'redmi': 'Redmi',
+    'oppo': 'OPPO', 'vivo': 'vivo', 'google': 'Google', 'motorola': 'Motorola',
+    'sennheiser': 'Sennheiser', 'skullcandy': 'Skullcandy', 'boult': 'Boult', 'jabra': 'Jabra',
+    'beats': 'Beats', 'marshall': 'Marshall', 'philips': 'Philips', 'lg': 'LG', 'lenovo': 'Lenovo',
+    'hp': 'HP', 'dell': 'Dell', 'asus': 'ASUS', 'acer': 'Acer', 'msi': 'MSI', 'logitech': 'Logitech',
+    'nike': 'Nike', 'adidas': 'Adidas', 'puma': 'Puma', 'reebok': 'Reebok', 'fossil': 'Fossil',
+    'titan': 'Titan', 'fastrack': 'Fastrack', 'canon': 'Canon', 'nikon': 'Nikon', 'fujifilm': 'Fujifilm',
+    'noise': 'Noise', 'fire-boltt': 'Fire-Boltt', 'amazfit': 'Amazfit', 'garmin': 'Garmin',
+}
+
+# Brand names that are also everyday words ("low noise", "beats per minute").
+# They only count as a brand when written as one (capitalized, alone, or
+# after "brand"/"by"/"from") and never in a fragment naming a feature.
+AMBIGUOUS_BRANDS = {'noise', 'beats'}
+
+# Canonical feature -> phrases that imply it
+FEATURES = {
+    'noise_cancellation': ['noise cancellation', 'noise cancelling', 'noise canceling', 'noise cancel', 'noise-cancelling', 'anc'],
+    'wireless': ['wireless', 'bluetooth', 'tws'],
+    'waterproof': ['waterproof', 'water resistant', 'water-resistant', 'sweatproof', 'ipx4', 'ipx5', 'ipx7', 'ip67', 'ip68'],
+    'long battery life': ['long battery', 'battery life', 'good battery', 'long lasting battery'],
+    'fast charging': ['fast charging', 'quick charge', 'fast charge'],
+    'deep bass': ['deep bass', 'heavy bass', 'extra bass', 'bass'],
+    'microphone': ['mic', 'microphone'],
+    'touch controls': ['touch control', 'touch controls'],
+    'lightweight': ['lightweight', 'light weight'],
+    'gaming': ['gaming', 'low latency'],
+}
+
+# Canonical features recognised by parse_user_details (the rest stay free text)
+BASIC_FEATURES = {
+    'noise_cancellation': FEATURES['noise_cancellation'],
+    'wireless': FEATURES['wireless'],
+    'waterproof': FEATURES['waterproof'],
+}
+
+# --------------------
+# Patterns
+# --------------------
+_AMOUNT = r'(?:rs\.?|inr|₹|\$|usd|€|£)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|lakhs?|lacs?)?(?![a-z])'
+_RANGE = re.compile(_AMOUNT + r'\s*(?:-|–|to|and)\s*' + _AMOUNT)
+_BETWEEN = re.compile(r'between\s+' + _AMOUNT + r'\s+and\s+' + _AMOUNT)
+_MAX = re.compile(r'(?:under|below|less than|upto|up to|within|max(?:imum)?|not more than|<)\s*' + _AMOUNT)
+_MIN = re.compile(r'(?:above|over|more than|at least|min(?:imum)?|starting|>)\s*' + _AMOUNT)
+_APPROX = re.compile(r'(?:around|about|approx(?:imately)?|roughly|~|budget(?: of| is)?)\s*' + _AMOUNT)
+_PLAIN = re.compile(r'^' + _AMOUNT + r'(?:\s*(?:rs|inr|rupees|dollars|bucks))?$')
+# Any "noise" ... "cancel" phrasing: noise-canceling, noise canceller, ...
+_NOISE_CANCEL = re.compile(r'noise.*cancel')
+_BRAND_CONTEXT = re.compile(r'(?<![a-z])(?:brand|by|from|make)(?![a-z])')
+_NUMBER = re.compile(r'\d')
+_INTEGER = re.compile(r'\d+')
+# Split on commas, except digit group separators ("1,500", lakh-style "1,50,000")
+_PARTS = re.compile(r'(?<!\d),|,(?!\d)')
+
+
+def _amount(number: str, suffix: str) -> float:
+    value = float(number.replace(',', ''))
+    if not suffix:
+        return value
+    return value * (1000 if suffix == 'k' else 100_000)  # k, lakh
+
+
+def _phrase_pattern(phrases) -> re.Pattern:
+    alternation = '|'.join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+    return re.compile(r'(?<![a-z0-9])(?:' + alternation + r')(?![a-z0-9])')
+
+
+class KeywordScanner:
+    """
+    Single-pass keyword matcher over color, brand and feature lexicons.
+
+    All phrases are compiled into one alternation (longest phrase first), so
+    each text fragment is scanned once regardless of lexicon size.
+    """
+
+    def __init__(self, colors=COLORS, brands=BRANDS, features=FEATURES, ambiguous_brands=AMBIGUOUS_BRANDS):
+        self.ambiguous_brands = {b.lower() for b in ambiguous_brands}
+        self.noise_cancellation = 'noise_cancellation' in features
+        self.keywords = {}
+        for color in colors:
+            self.keywords[color.lower()] = ('color', color)
+        for key, name in brands.items():
+            self.keywords[key.lower()] = ('brand', name)
+        for feature, phrases in features.items():
+            for phrase in phrases:
+                self.keywords[phrase.lower()] = ('feature', feature)
+        self.pattern = _phrase_pattern(self.keywords)
+
+    def scan(self, text: str, original: str = None) -> list:
+        """Return (kind, canonical) for every keyword in lower-cased text, in order"""
+        return self.scan_fragment(text, original)[0]
+
+    def scan_fragment(self, text: str, original: str = None):
+        """
+        Scan one lower-cased fragment; `original` is its unlowered form.
+        Returns (matches, ambiguous), where ambiguous is True if a brand name
+        that is also an everyday word had to be guessed as brand or not.
+        """
+        found = [(m, self.keywords[m]) for m in self.pattern.findall(text)]
+        matches, ambiguous = [], False
+
+        # "noise" + "cancel" in any form is the feature, as in the original parser
+        if self.noise_cancellation and _NOISE_CANCEL.search(text):
+            if ('feature', 'noise_cancellation') not in [kv for _, kv in found]:
+                found.append(('noise cancel', ('feature', 'noise_cancellation')))
+        has_feature = any(kind == 'feature' for _, (kind, _) in found)
+
+        for token, (kind, value) in found:
+            if kind == 'brand' and token in self.ambiguous_brands:
+                if has_feature:
+                    continue  # "noise-canceling": the feature, not the brand
+                if not _BRAND_CONTEXT.search(text):
+                    ambiguous = True
+                    written_as_brand = text.strip() == token or (original and token.capitalize() in original)
+                    if not written_as_brand:
+                        continue
+            matches.append((kind, value))
+        return matches, ambiguous
+
+
+_preference_scanner = KeywordScanner()
+
+
+def parse_budget(text: str):
+    """Return a Budget for a text fragment, or None if it states no budget"""
+    text = text.lower()
+    match = _BETWEEN.search(text) or _RANGE.search(text)
+    if match:
+        low, high = _amount(*match.group(1, 2)), _amount(*match.group(3, 4))
+        return Budget(min=min(low, high), max=max(low, high))
+
+    match = _MAX.search(text)
+    if match:
+        return Budget(max=_amount(*match.group(1, 2)))
+
+    match = _MIN.search(text)
+    if match:
+        return Budget(min=_amount(*match.group(1, 2)))
+
+    match = _APPROX.search(text) or _PLAIN.search(text.strip())
+    if match:
+        return Budget(max=_amount(*match.group(1, 2)))
+    return None
+
+
+def extract_user_preference(target_item: str, details: str):
+    """
+    Rule-based preference extraction.
+
+    Returns (UserPreference, confidence). Confidence is the share of the
+    comma-separated description that was explained by a budget, color,
+    brand or known feature; free-text fragments are kept as features but
+    lower the confidence, as do numbers that could not be read as a budget
+    and words that may or may not be a brand ("noise"). An empty
+    description has no confidence: there is nothing to go on.
+    """
+    parts = [p.strip() for p in _PARTS.split(details or '') if p.strip()]
+    budget, colors, brands, features = None, [], [], []
+    explained = 0.0
+
+    for part in parts:
+        text = part.lower()
+        matched = False
+
+        if _NUMBER.search(text):
+            part_budget = parse_budget(text)
+            if part_budget is not None:
+                budget = part_budget
+                matched = True
+
+        matches, ambiguous = _preference_scanner.scan_fragment(text, part)
+        for kind, value in matches:
+            matched = True
+            bucket = {'color': colors, 'brand': brands, 'feature': features}[kind]
+            if value not in bucket:
+                bucket.append(value)
+
+        if matched:
+            explained += 0.5 if ambiguous else 1
+        elif _NUMBER.search(text):
+            # Unreadable numbers (model numbers, sizes) need the LLM
+            continue
+        elif len(text) > 2:
+            # Keep free text as a general feature, at reduced confidence
+            features.append(part)
+            explained += 0.5
+
+    confidence = explained / len(parts) if parts else 0.0
+    preference = UserPreference(
+        item=target_item,
+        brand=brands or None,
+        preferred_colors=colors or None,
+        budget=budget,
+        features=features or None,
+    )
+    return preference, round(confidence, 3)
+
+
+# Minimum confidence for skipping the LLM preference_extraction_task
+FAST_PATH_CONFIDENCE = float(os.getenv("PREFERENCE_FAST_PATH_CONFIDENCE", 0.8))
+
+# Distinct detail fragments whose parse is memoized per DetailsParser
+FRAGMENT_CACHE_SIZE = int(os.getenv("PREFERENCE_FRAGMENT_CACHE_SIZE", 4096))
+
+
+class DetailsParser:
+    """
+    Fast parser for free-text item details, e.g.
+    "black, budget around 150, noise cancellation, good battery life".
+
+    Produces the long-term preference dict stored in memory: budget (largest
+    number), color, brand(s), features (canonical or free text) and the raw
+    input. Lexicons are configurable; patterns are compiled once.
+    """
+
+    def __init__(self, colors=COLORS, brands=BRANDS, features=BASIC_FEATURES,
+                 fragment_cache_size: int = FRAGMENT_CACHE_SIZE):
+        self.scanner = KeywordScanner(colors=colors, brands=brands, features=features)
+        # One feature per fragment, by lexicon order (noise cancellation > wireless > waterproof)
+        self.feature_priority = {name: rank for rank, name in enumerate(features)}
+        # Descriptions repeat fragments ("black", "under 2000"): analyse each once
+        self._fragment = functools.lru_cache(maxsize=fragment_cache_size)(self._parse_fragment)
+
+    def _parse_fragment(self, part: str) -> tuple:
+        """(original, budget, color, brands, feature) for one comma-separated fragment"""
+        original_part = part.strip()
+        part_lower = original_part.lower()
+        has_digits = _NUMBER.search(part_lower) is not None
+
+        # Extract budget: the stated (upper) amount, else the largest number
+        budget = None
+        if has_digits:
+            stated = parse_budget(part_lower)
+            if stated is not None:
+                budget = int(stated.max or stated.min)
+            else:
+                numbers = _INTEGER.findall(part_lower.replace(',', ''))
+                if numbers:
+                    budget = max(int(num) for num in numbers)
+
+        matches = self.scanner.scan(part_lower, original_part)
+        colors = [value for kind, value in matches if kind == 'color']
+        brands = tuple(dict.fromkeys(value for kind, value in matches if kind == 'brand'))
+        features = [value for kind, value in matches if kind == 'feature']
+
+        if features:
+            feature = min(features, key=self.feature_priority.__getitem__)
+        elif len(part_lower) > 2 and not has_digits and not colors and not brands:
+            # General feature if it's not a color, brand or number
+            feature = original_part
+        else:
+            feature = None
+        return original_part, budget, colors[0] if colors else None, brands, feature
+
+    def parse(self, details: str) -> dict:
+        """Parse user details into structured preferences"""
+        preferences = {}
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        for part in _PARTS.split(details):
+            original_part, budget, color, brands, feature = self._fragment(part)
+
+            if budget is not None:
+                preferences['budget'] = budget
+                if debug:
+                    logger.debug("Found budget: %s from '%s'", budget, original_part)
+
+            if color:
+                preferences['color'] = color
+                if debug:
+                    logger.debug("Found color: %s from '%s'", color, original_part)
+
+            for brand in brands:
+                if brand not in preferences.setdefault('brand', []):
+                    preferences['brand'].append(brand)
+                    if debug:
+                        logger.debug("Found brand: %s from '%s'", brand, original_part)
+
+            if feature:
+                preferences.setdefault('features', []).append(feature)
+                if debug:
+                    logger.debug("Found feature: %s from '%s'", feature, original_part)
+
+        # Add the raw input for reference
+        preferences['raw_input'] = details
+        return preferences
+
+    def parse_many(self, details_list) -> list:
+        """Parse many descriptions (bulk/batch inputs)"""
+        parse = self.parse
+        return [parse(details) for details in details_list]
+
+
+# Provide a module-level default parser
+details_parser = DetailsParser()
+parse_user_details = details_parser.parse
+parse_many = details_parser.parse_many
@@ -0,0 +1,414 @@
+import math
+import re
+from datetime import date
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+_NUMBER = re.compile(r"\d[\d,.\s]*")
+_COUNT = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*([km])?(?![a-z])", re.IGNORECASE)
+_COUNT_SUFFIX = {"k": 1e3, "m": 1e6}
+
+# Words that carry no signal when matching a title against the request
+_STOPWORDS = {"a", "an", "and", "the", "for", "with", "in", "of", "to", "under", "below", "inr", "rs", "usd"}
+
+# Currency markers in SerpAPI price strings
+CURRENCIES = [
+    ("INR", re.compile(r"₹|\brs\.?|\binr\b", re.IGNORECASE)),
+    ("USD", re.compile(r"US\$|\$|\busd\b", re.IGNORECASE)),
+    ("EUR", re.compile(r"€|\beur\b", re.IGNORECASE)),
+    ("GBP", re.compile(r"£|\bgbp\b", re.IGNORECASE)),
+    ("JPY", re.compile(r"¥|\bjpy\b", re.IGNORECASE)),
+    ("AED", re.compile(r"\baed\b", re.IGNORECASE)),
+]
+
+_WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+_MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_DAYS = re.compile(r"(\d+)\s*(?:-|to)?\s*(\d+)?\s*(?:business\s+|working\s+)?days?")
+_WEEKDAY = re.compile(r"\b(" + "|".join(_WEEKDAYS) + r")[a-z]*\b")
+_DAY_MONTH = re.compile(r"\b(\d{1,2})\s+(" + "|".join(_MONTHS) + r")[a-z]*")
+_MONTH_DAY = re.compile(r"\b(" + "|".join(_MONTHS) + r")[a-z]*\s+(\d{1,2})\b")
+
+# Prior for Bayesian-averaged ratings: a product needs reviews to beat it
+RATING_PRIOR = 4.0
+RATING_PRIOR_REVIEWS = 50
+
+# Base weights of the combined score; preferences the user stated get more
+BASE_WEIGHTS = {
+    "relevance": 0.30,
+    "budget": 0.15,
+    "brand": 0.05,
+    "extras": 0.05,
+    "rating": 0.20,
+    "reviews": 0.10,
+    "delivery": 0.05,
+    "price": 0.10,
+}
+
+TOP_N = 5
+
+# Budget and price score of a result priced in another currency than the
+# rest: it can't be checked against the budget, so it ranks below unknowns
+FOREIGN_PRICE_SCORE = 0.0
+
+
+def _words(text) -> set:
+    return {w for w in _WORD.findall(str(text or "").lower()) if w not in _STOPWORDS}
+
+
+# --------------------
+# Field parsing
+# --------------------
+def parse_currency(product: dict):
+    """ISO code of the currency in a result's price text, or None"""
+    text = str(product.get("price") or "")
+    for code, pattern in CURRENCIES:
+        if pattern.search(text):
+            return code
+    return None
+
+
+def parse_price(product: dict):
+    """Numeric price of a shopping result (SerpAPI's extracted_price, else the price text)"""
+    value = product.get("extracted_price")
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    match = _NUMBER.search(str(product.get("price") or ""))
+    if not match:
+        return None
+    number = match.group(0).strip().replace(" ", "")
+    # "1.299,00" (decimal comma) vs "1,299.00" (thousands comma)
+    if "," in number and (number.rfind(",") > number.rfind(".")) and len(number) - number.rfind(",") == 3:
+        number = number.replace(".", "").replace(",", ".")
+    else:
+        number = number.replace(",", "")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value or ""))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).strip().replace(",", "").replace(" ", ""))
+    except ValueError:
+        return None
+
+
+def parse_count(value):
+    """Review count from SerpAPI fields ("1,234", "(412K)", "1.1M reviews"), or None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _COUNT.search(str(value or ""))
+    if not match:
+        return None
+    number, suffix = match.groups()
+    return float(number.replace(",", "")) * _COUNT_SUFFIX.get((suffix or "").lower(), 1)
+
+
+def parse_delivery_days(text, today: date = None):
+    """
+    Estimated days until delivery from SerpAPI delivery text ("Delivery by
+    Tue", "Free delivery in 2-4 days", "Get it by 15 Oct", "tomorrow").
+    Returns None when the text gives no timing.
+    """
+    text = str(text or "").lower()
+    if not text:
+        return None
+    today = today or date.today()
+    if "today" in text or "same day" in text or "same-day" in text:
+        return 0.0
+    if "tomorrow" in text or "next day" in text or "next-day" in text:
+        return 1.0
+
+    match = _DAYS.search(text)
+    if match:
+        low, high = match.group(1), match.group(2)
+        return (float(low) + float(high)) / 2 if high else float(low)
+
+    match = _DAY_MONTH.search(text) or _MONTH_DAY.search(text)
+    if match:
+        day, month = match.groups() if match.re is _DAY_MONTH else match.groups()[::-1]
+        try:
+            target = date(today.year, _MONTHS.index(month[:3]) + 1, int(day))
+        except ValueError:
+            return None
+        if target < today:
+            target = target.replace(year=today.year + 1)
+        return float((target - today).days)
+
+    match = _WEEKDAY.search(text)
+    if match:
+        ahead = (_WEEKDAYS.index(match.group(1)[:3]) - today.weekday()) % 7
+        return float(ahead or 7)
+    return None
+
+
+def normalize_preferences(preferences) -> dict:
+    """
+    Flatten either preference shape used in the crew inputs - a UserPreference
+    dump or a parse_user_details dict - into item, brands, colors, features
+    and a (min, max) budget.
+    """
+    if hasattr(preferences, "model_dump"):
+        preferences = preferences.model_dump(exclude_none=True)
+    preferences = preferences if isinstance(preferences, dict) else {}
+
+    budget = preferences.get("budget")
+    if isinstance(budget, dict):
+        budget_min, budget_max = budget.get("min"), budget.get("max")
+    elif isinstance(budget, (int, float)):
+        budget_min, budget_max = None, float(budget)
+    else:
+        budget_min = budget_max = None
+
+    def as_list(value):
+        if not value:
+            return []
+        return [value] if isinstance(value, str) else list(value)
+
+    return {
+        "item": preferences.get("item") or "",
+        "brands": as_list(preferences.get("brand")),
+        "colors": as_list(preferences.get("preferred_colors") or preferences.get("color")),
+        "features": [f.replace("_", " ") for f in as_list(preferences.get("features"))],
+        "budget_min": budget_min,
+        "budget_max": budget_max,
+    }
+
+
+# --------------------
+# Vectorized scoring
+# --------------------
+class ProductTable:
+    """Column arrays of the numeric fields of a list of shopping results"""
+
+    def __init__(self, products: list, today: date = None):
+        self.products = products
+        n = len(products)
+        self.price = np.array([parse_price(p) for p in products], dtype=float).reshape(n)
+        self.currency = [parse_currency(p) for p in products]
+        self.rating = np.array([_number(p.get("rating")) for p in products], dtype=float).reshape(n)
+        self.reviews = np.array([parse_count(p.get("reviews")) for p in products], dtype=float).reshape(n)
+        self.delivery_days = np.array(
+            [parse_delivery_days(p.get("delivery"), today) for p in products], dtype=float
+        ).reshape(n)
+
+        # Prices are only comparable within one currency: use the most common
+        known = [c for c in self.currency if c]
+        self.main_currency = max(set(known), key=known.count) if known else None
+        self.comparable = np.array(
+            [c is None or c == self.main_currency for c in self.currency], dtype=bool
+        ).reshape(n)
+
+
+def _budget_fit(price: np.ndarray, budget_min=None, budget_max=None) -> np.ndarray:
+    """1.0 inside the budget, falling off linearly with the overshoot; 0.5 if unknown"""
+    fit = np.ones_like(price)
+    if budget_max:
+        fit = np.where(price > budget_max, np.clip(1.0 - (price - budget_max) / budget_max, 0.0, 1.0), fit)
+    if budget_min:
+        fit = np.where(price < budget_min, np.clip(price / budget_min, 0.0, 1.0), fit)
+    return np.where(np.isnan(price), 0.5, fit)
+
+
+def _text_scores(products: list, query: str, prefs: dict):
+    """Per-product title relevance, brand match and color/feature match"""
+    wanted = _words(query) | _words(prefs["item"])
+    brands = [b.lower() for b in prefs["brands"]]
+    extras = [e.lower() for e in prefs["colors"] + prefs["features"]]
+
+    relevance, brand, extra = [], [], []
+    for p in products:
+        title = _words(p.get("title"))
+        text = " ".join(str(p.get(k) or "") for k in ("title", "source")).lower()
+        relevance.append(len(title & wanted) / len(wanted) if wanted else 0.0)
+        brand.append(1.0 if any(b in text for b in brands) else 0.0)
+        extra.append(sum(1 for e in extras if e in text) / len(extras) if extras else 0.0)
+    return np.array(relevance), np.array(brand), np.array(extra)
+
+
+def weights_for(prefs: dict) -> dict:
+    """Score weights, shifted towards the preferences the user actually stated"""
+    weights = dict(BASE_WEIGHTS)
+    if prefs["budget_min"] or prefs["budget_max"]:
+        weights["budget"] += 0.15
+    if prefs["brands"]:
+        weights["brand"] += 0.10
+    if prefs["colors"] or prefs["features"]:
+        weights["extras"] += 0.10
+    total = sum(weights.values())
+    return {k: v / total for k, v in weights.items()}
+
+
+def score_components(table: ProductTable, query: str, prefs: dict) -> dict:
+    """Each scoring signal as an array in [0, 1] (NaN-free)"""
+    relevance, brand, extras = _text_scores(table.products, query, prefs)
+
+    # Bayesian-averaged rating, so 5.0 from 3 reviews doesn't beat 4.6 from 3,000
+    reviews = np.nan_to_num(table.reviews, nan=0.0)
+    rating = np.where(np.isnan(table.rating), RATING_PRIOR, table.rating)
+    bayes = (rating * reviews + RATING_PRIOR * RATING_PRIOR_REVIEWS) / (reviews + RATING_PRIOR_REVIEWS)
+
+    log_reviews = np.log1p(reviews)
+    review_score = log_reviews / log_reviews.max() if log_reviews.size and log_reviews.max() > 0 else np.zeros_like(log_reviews)
+
+    days = table.delivery_days
+    delivery = np.where(np.isnan(days), 0.3, 1.0 / (1.0 + np.nan_to_num(days, nan=0.0)))
+
+    # Cheaper is better, relative to the comparable price range
+    price = np.where(table.comparable, table.price, np.nan)
+    cheapness = np.full_like(price, 0.5)
+    if np.any(~np.isnan(price)):
+        low, high = np.nanmin(price), np.nanmax(price)
+        if high > low:
+            cheapness = np.where(np.isnan(price), 0.5, (high - price) / (high - low))
+
+    foreign = ~table.comparable & ~np.isnan(table.price)
+    budget = np.where(foreign, FOREIGN_PRICE_SCORE, _budget_fit(price, prefs["budget_min"], prefs["budget_max"]))
+    cheapness = np.where(foreign, FOREIGN_PRICE_SCORE, cheapness)
+
+    return {
+        "relevance": relevance,
+        "budget": budget,
+        "brand": brand,
+        "extras": extras,
+        "rating": np.clip((bayes - 1.0) / 4.0, 0.0, 1.0),
+        "reviews": review_score,
+        "delivery": delivery,
+        "price": cheapness,
+    }
+
+
+def score_products(products: list, query: str = "", preferences=None, today: date = None):
+    """Combined score per product (array aligned with products) and the table used"""
+    prefs = normalize_preferences(preferences)
+    table = ProductTable(products, today)
+    if not products:
+        return np.zeros(0), table, {}
+    components = score_components(table, query, prefs)
+    weights = weights_for(prefs)
+    total = sum(weights[name] * values for name, values in components.items())
+    return total, table, components
+
+
+def rank_products(products: list, query: str = "", preferences=None, limit: int = None) -> list:
+    """Products sorted by combined score (stable for ties), optionally truncated"""
+    if not products:
+        return []
+    scores, _, _ = score_products(products, query, preferences)
+    order = np.argsort(-scores, kind="stable")
+    ranked = [products[i] for i in order]
+    return ranked[:limit] if limit else ranked
+
+
+# --------------------
+# Comparison report
+# --------------------
+def compare_products(products: list, query: str = "", preferences=None, limit: int = TOP_N, today: date = None) -> dict:
+    """
+    Deterministic comparison of shopping results: the top `limit` products by
+    combined score plus Best Value, Fastest Delivery and Top Rated picks
+    (indices into `top`) and a price/delivery matrix.
+    """
+    scores, table, components = score_products(products, query, preferences, today)
+    if not products:
+        return {"top": [], "best_value": None, "fastest_delivery": None, "top_rated": None}
+
+    order = np.argsort(-scores, kind="stable")[:limit]
+    top_scores = scores[order]
+
+    # Best value: quality (rating, relevance, budget fit) per unit of relative price
+    quality = (components["rating"] + components["relevance"] + components["budget"])[order] / 3
+    price = np.where(table.comparable, table.price, np.nan)[order]
+    relative = price / np.nanmedian(price) if np.any(~np.isnan(price)) else np.ones_like(price)
+    value = np.where(np.isnan(relative), -np.inf, quality / np.maximum(relative, 1e-6))
+
+    days = table.delivery_days[order]
+    rated = components["rating"][order]
+
+    def pick(values, best=np.argmax):
+        if not np.any(np.isfinite(values)):
+            return None
+        return int(best(values))
+
+    top = []
+    for rank, i in enumerate(order):
+        p = products[i]
+        top.append({
+            "rank": rank + 1,
+            "title": p.get("title"),
+            "link": p.get("product_link") or p.get("link"),
+            "price": p.get("price"),
+            "source": p.get("source"),
+            "rating": None if math.isnan(table.rating[i]) else float(table.rating[i]),
+            "reviews": None if math.isnan(table.reviews[i]) else int(table.reviews[i]),
+            "delivery": p.get("delivery"),
+            "delivery_days": None if math.isnan(table.delivery_days[i]) else float(table.delivery_days[i]),
+            "score": round(float(top_scores[rank]), 4),
+        })
+
+    return {
+        "top": top,
+        "currency": table.main_currency,
+        "best_value": pick(value),
+        "fastest_delivery": pick(np.where(np.isnan(days), np.inf, days), best=np.argmin),
+        "top_rated": pick(rated),
+    }
+
+
+def _cell(value) -> str:
+    return str(value).replace("|", "/") if value not in (None, "") else "—"
+
+
+def comparison_markdown(comparison: dict) -> str:
+    """Render compare_products output as the markdown sections of the compare report"""
+    top = comparison["top"]
+    if not top:
+        return "No products to compare."
+
+    lines = ["## Top Recommendations", ""]
+    for p in top:
+        title = f"[{p['title']}]({p['link']})" if p["link"] else f"**{p['title']}**"
+        details = " - ".join(_cell(v) for v in (p["price"], p["source"]) if v)
+        lines.append(f"{p['rank']}. {title}" + (f" - {details}" if details else ""))
+
+    def pick_line(label, index, detail):
+        if index is None:
+            return f"- **{label}:** not enough data"
+        p = top[index]
+        return f"- **{label}:** {p['title']} ({detail(p)})"
+
+    lines += [
+        "",
+        "## Picks",
+        "",
+        pick_line("Best Value", comparison["best_value"],
+                  lambda p: f"{_cell(p['price'])}, rated {_cell(p['rating'])}"),
+        pick_line("Fastest Delivery", comparison["fastest_delivery"],
+                  lambda p: _cell(p["delivery"])),
+        pick_line("Top Rated", comparison["top_rated"],
+                  lambda p: f"{_cell(p['rating'])} from {_cell(p['reviews'])} reviews, {_cell(p['price'])}"),
+        "",
+        "## Comparison Matrix",
+        "",
+        "| # | Product | Price | Source | Rating | Reviews | Delivery |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for p in top:
+        lines.append(
+            f"| {p['rank']} | {_cell(p['title'])} | {_cell(p['price'])} | {_cell(p['source'])} "
+            f"| {_cell(p['rating'])} | {_cell(p['reviews'])} | {_cell(p['delivery'])} |"
+        )
+    return "\n".join(lines)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token)"""
+    return (len(text or "") + 3) // 4
@@ -0,0 +1,156 @@
+import json
+import re
+
+MAX_PRODUCTS = 5
+
+_FENCE = re.compile(r"```(?:json|markdown|md)?\s*(.*?)```", re.DOTALL)
+_LINK = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_BOLD = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_LIST_ITEM = re.compile(r"^\s*(?:#{1,6}\s*)?(?:\d+[.)]|[-*+])\s+(.*)$")
+_HEADING_ITEM = re.compile(r"^\s*#{1,6}\s*(?:\d+[.)]\s*)?(.*)$")
+_PRICE = re.compile(r"(?:₹|rs\.?\s?|inr\s?|\$|€|£)\s?\d(?:[\d,]*\d)?(?:\.\d+)?", re.IGNORECASE)
+_TABLE_ROW = re.compile(r"^\s*\|(.+)\|\s*$")
+_TABLE_RULE = re.compile(r"^\s*\|?\s*:?-{3,}")
+_NON_TITLE = re.compile(r"[^\w\s\-+&/().,'\"]", re.UNICODE)
+_LABEL = re.compile(
+    r"^(?:top pick|best value|fastest delivery|top rated|best overall|budget pick|pick|option|product|recommendation)"
+    r"\s*(?:\d+)?\s*[:\-–]\s*",
+    re.IGNORECASE,
+)
+# Sections after the recommendation list that repeat product names
+_STOP_SECTION = re.compile(r"best value|fastest delivery|top rated|comparison matrix|comparison table", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_title(title: str) -> str:
+    return _WHITESPACE.sub(" ", re.sub(r"[^\w\s]", " ", title.lower())).strip()
+
+
+def _clean_title(text: str, descriptors: bool = True) -> str:
+    text = _LINK.sub(r"\1", text)
+    text = _BOLD.sub(lambda m: m.group(1) or m.group(2), text)
+    text = text.replace("`", "").replace("*", "").replace("_", " ")
+    if descriptors:
+        # Drop trailing " - price / source / rating" descriptors
+        text = re.split(r"\s+[-–—|:]\s+|\s+\(", text, maxsplit=1)[0]
+    text = _LABEL.sub("", text.strip())
+    text = _NON_TITLE.sub("", text)
+    return _WHITESPACE.sub(" ", text).strip(" -:.")
+
+
+def _strip_fences(text: str) -> str:
+    match = _FENCE.search(text)
+    return match.group(1) if match else text
+
+
+def parse_shopping_results(text) -> list:
+    """Parse the item_find_task output (a JSON array of products) into dicts"""
+    if not text:
+        return []
+    if isinstance(text, list):
+        return [p for p in text if isinstance(p, dict)]
+
+    body = _strip_fences(str(text))
+    start, end = body.find("["), body.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        products = json.loads(body[start:end + 1])
+    except json.JSONDecodeError:
+        return []
+    return [p for p in products if isinstance(p, dict) and p.get("title")]
+
+
+def _match_product(title: str, link: str, products: list):
+    """Find the shopping result a report entry refers to (by link, then title)"""
+    if link:
+        for p in products:
+            if link in (p.get("product_link"), p.get("link")):
+                return p
+    key = _normalize_title(title)
+    if not key:
+        return None
+    for p in products:
+        candidate = _normalize_title(p.get("title", ""))
+        if candidate and (candidate.startswith(key) or key.startswith(candidate)):
+            return p
+    return None
+
+
+def _entry(title: str, link: str, line: str, products: list) -> dict:
+    match = _match_product(title, link, products)
+    price = _PRICE.search(line)
+    return {
+        "title": title,
+        "link": link or (match or {}).get("product_link") or (match or {}).get("link"),
+        "price": price.group(0).strip() if price else (match or {}).get("price"),
+        "source": (match or {}).get("source"),
+    }
+
+
+def _list_entries(lines: list, products: list) -> list:
+    entries = []
+    for line in lines:
+        if _STOP_SECTION.search(line) and entries:
+            break
+        item = _LIST_ITEM.match(line) or (line.lstrip().startswith("#") and _HEADING_ITEM.match(line))
+        if not item:
+            continue
+        body = item.group(1)
+        link = _LINK.search(body)
+        bold = _BOLD.search(body)
+        # Link and bold text is the whole title ("... (Bold Black)", "... - Deep Grey")
+        if link:
+            title, url = _clean_title(link.group(1), descriptors=False), link.group(2)
+        elif bold:
+            title, url = _clean_title(bold.group(1) or bold.group(2), descriptors=False), None
+        else:
+            continue  # plain bullets are descriptions, not product titles
+        if title and not _STOP_SECTION.fullmatch(title):
+            entries.append(_entry(title, url, body, products))
+    return entries
+
+
+def _table_entries(lines: list, products: list) -> list:
+    entries, header = [], None
+    for line in lines:
+        row = _TABLE_ROW.match(line)
+        if not row or _TABLE_RULE.match(line):
+            continue
+        cells = [c.strip() for c in row.group(1).split("|")]
+        if header is None:
+            header = [c.lower() for c in cells]
+            continue
+        column = next((i for i, h in enumerate(header) if "product" in h or "title" in h or "name" in h), 0)
+        if column >= len(cells):
+            continue
+        link = _LINK.search(cells[column])
+        title = _clean_title(cells[column])
+        if title:
+            entries.append(_entry(title, link.group(2) if link else None, line, products))
+    return entries
+
+
+def parse_compare_report(report: str, products: list = None, limit: int = MAX_PRODUCTS) -> list:
+    """
+    Extract the recommended products from the item_compare_task markdown report.
+
+    Reads the numbered/bulleted recommendation list at the top of the report
+    (linked or bold titles), falling back to the comparison matrix table.
+    Links and prices come from the report, or from the matching
+    item_find_task result. Returns [] when nothing could be parsed.
+    """
+    if not report or not isinstance(report, str):
+        return []
+    products = products or []
+    lines = _strip_fences(report).splitlines()
+
+    entries = _list_entries(lines, products) or _table_entries(lines, products)
+
+    seen, unique = set(), []
+    for e in entries:
+        key = _normalize_title(e["title"])
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(e)
+    return unique[:limit]
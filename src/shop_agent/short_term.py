@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shop_agent.cache import LRUCache
+from shop_agent.ranking import estimate_tokens
+
+# Per-user limits
+MAX_ENTRIES = int(os.getenv("SHORT_TERM_MAX_ENTRIES", 16))
+MAX_LIST_ITEMS = int(os.getenv("SHORT_TERM_MAX_LIST_ITEMS", 10))
+ENTRY_TTL = float(os.getenv("SHORT_TERM_TTL", 1800))
+TOKEN_BUDGET = int(os.getenv("SHORT_TERM_TOKEN_BUDGET", 300))
+
+# Process-wide limits on concurrent sessions
+MAX_SESSIONS = int(os.getenv("SHORT_TERM_MAX_SESSIONS", 1000))
+SESSION_TTL = float(os.getenv("SHORT_TERM_SESSION_TTL", 3600))
+
+# Product fields kept in the prompt summary
+SUMMARY_FIELDS = ("price", "rating", "source")
+SUMMARY_MAX_PRODUCTS = 5
+MAX_TITLE_CHARS = 60
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def summarize_value(key: str, value) -> str:
+    """One compact line for a short-term entry"""
+    label = key.replace("_", " ")
+    if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+        # Product lists: titles with the fields that matter for continuity
+        products = []
+        for p in value[:SUMMARY_MAX_PRODUCTS]:
+            details = ", ".join(str(p[f]) for f in SUMMARY_FIELDS if p.get(f) not in (None, ""))
+            title = _clip(p.get("title") or p.get("name") or "?", MAX_TITLE_CHARS)
+            products.append(f"{title} ({details})" if details else title)
+        return f"{label}: " + "; ".join(products)
+    if isinstance(value, (dict, list)):
+        return f"{label}: " + json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"{label}: {value}"
+
+
+class ShortTermMemory:
+    """
+    One user's session memory: at most `max_entries` keys, least recently
+    written first out, each expiring after `ttl` seconds. Lists are capped
+    at `max_list_items` when written.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = ENTRY_TTL,
+                 max_list_items: int = MAX_LIST_ITEMS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_list_items = max_list_items
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+            self.evicted += 1
+
+    def write(self, key: str, value):
+        if isinstance(value, list):
+            value = value[:self.max_list_items]
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evicted += 1
+
+    def read(self, key: str, default=None):
+        with self._lock:
+            self._expire()
+            entry = self._data.get(key)
+            return entry[1] if entry else default
+
+    def items(self) -> list:
+        """Live (key, value) pairs, most recently written first"""
+        with self._lock:
+            self._expire()
+            return [(key, value) for key, (_, value) in reversed(self._data.items())]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            self._expire()
+            return len(self._data)
+
+    def summary(self, token_budget: int = TOKEN_BUDGET) -> str:
+        """
+        Compact text form for prompt injection: one line per entry, most
+        recent first, cut off at the token budget.
+        """
+        lines, used = [], 0
+        for key, value in self.items():
+            line = "- " + summarize_value(key, value)
+            tokens = estimate_tokens(line) + 1
+            if used + tokens > token_budget:
+                remaining = (token_budget - used) * 4
+                if remaining > 40:  # room for a useful truncated line
+                    lines.append(_clip(line, remaining))
+                break
+            lines.append(line)
+            used += tokens
+        return "\n".join(lines)
+
+
+class ShortTermStore:
+    """
+    Short-term memories of many concurrent users, isolated per user id.
+    Idle sessions expire after SHORT_TERM_SESSION_TTL and the least
+    recently used are dropped beyond SHORT_TERM_MAX_SESSIONS.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, session_ttl: float = SESSION_TTL):
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=session_ttl)
+        self._lock = threading.Lock()
+
+    def session(self, user_id: str) -> ShortTermMemory:
+        with self._lock:
+            memory = self._sessions.get(user_id)
+            if memory is None:
+                memory = ShortTermMemory()
+            self._sessions.set(user_id, memory)  # refresh the idle timeout
+            return memory
+
+    def clear(self, user_id: str = None):
+        """Clear one user's session, or every session"""
+        if user_id is None:
+            self._sessions.clear()
+        else:
+            self._sessions.pop(user_id)
+
+    def stats(self) -> dict:
+        return self._sessions.stats()
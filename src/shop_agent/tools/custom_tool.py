@@ -1,58 +1,222 @@
 from crewai.tools import BaseTool
-from typing import Type,Optional,List
-from pydantic import BaseModel, Field,ConfigDict
-from serpapi import GoogleSearch
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-import os, json
-from uuid import uuid4
+from typing import Type,Optional,List,Dict,Any
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from itertools import zip_longest
+from pydantic import BaseModel, Field
+from shop_agent.embeddings import embedding_service
+from shop_agent.db.search_cache import search_cache
+from shop_agent.ranking import rank_products, estimate_tokens
+from shop_agent.tracing import traced
+from shop_agent.db.vector_store import COLLECTION_NAME, get_qdrant_client, upsert_episodes
+import os, json, time
 
 class GoogleShoppingInput(BaseModel):
     query: str = Field(..., description="The search query, e.g. 'wireless earphones under 1500 INR'")
     location: str = Field("India", description="Location to search from, e.g. 'India'")
+    query_variants: Optional[List[str]] = Field(
+        None, description="Extra phrasings of the query, searched concurrently with it"
+    )
+    locations: Optional[List[str]] = Field(
+        None, description="Extra locations to search from, searched concurrently"
+    )
+    user_preferences: Optional[Dict[str, Any]] = Field(
+        None, description="The user's preferences (budget, brand, colors, features), used to rank results"
+    )
+
+# SerpAPI country code (gl) for common search locations
+LOCATION_GL = {
+    "india": "in",
+    "united states": "us",
+    "usa": "us",
+    "united kingdom": "uk",
+    "uk": "uk",
+    "canada": "ca",
+    "australia": "au",
+    "germany": "de",
+    "france": "fr",
+    "japan": "jp",
+    "singapore": "sg",
+    "united arab emirates": "ae",
+}
+
+MAX_SEARCH_REQUESTS = 8
+
+# Result fields the find/compare tasks use; compact output keeps only these
+COMPACT_FIELDS = ("title", "price", "source", "product_link", "rating", "reviews", "delivery")
+FULL_FIELDS = ("title", "price", "source", "link", "product_link", "rating", "reviews", "thumbnail", "delivery")
+
+# Shared worker pool for concurrent SerpAPI requests
+_search_pool = ThreadPoolExecutor(max_workers=MAX_SEARCH_REQUESTS, thread_name_prefix="serpapi")
+
+
+def gl_for(location: str) -> Optional[str]:
+    """Country code for a location ("Mumbai, India" -> "in"); None if unknown"""
+    text = (location or "").strip().lower()
+    if text in LOCATION_GL:
+        return LOCATION_GL[text]
+    country = text.rsplit(",", 1)[-1].strip()
+    return LOCATION_GL.get(country)
+
+
+@traced("serpapi.search")
+def fetch_shopping_results(params: dict, timeout: float) -> dict:
+    """Run one SerpAPI Google Shopping request"""
+    from serpapi import GoogleSearch
+    search = GoogleSearch(params)
+    search.timeout = timeout  # read by get_response; not a constructor argument
+    return search.get_dict()
+
+
+def _dedupe_keys(product: dict) -> list:
+    """Products are duplicates if they share a product link or a normalized title"""
+    keys = []
+    link = product.get("product_link") or product.get("link")
+    if link:
+        keys.append(("link", link))
+    title = " ".join(str(product.get("title") or "").lower().split())
+    if title:
+        keys.append(("title", title))
+    return keys
+
 
 class GoogleShoppingTool(BaseTool):
     name: str = "Google Shopping Tool"
-    description: str = "Fetches shopping results using SerpAPI's Google Shopping engine based on query and location."
+    description: str = (
+        "Fetches shopping results using SerpAPI's Google Shopping engine based on query and location. "
+        "Optionally pass query_variants and locations to search several phrasings/locations in one call; "
+        "results are merged and de-duplicated."
+    )
     args_schema: Type[BaseModel] = GoogleShoppingInput
 
-    def _run(self, query: str, location: str = "India") -> str:
-        serpapi_key = os.getenv("SERPAPI_API_KEY")
-        if not serpapi_key:
-            return "Error: SERPAPI_API_KEY not found in environment variables."
+    request_timeout: float = float(os.getenv("SERPAPI_TIMEOUT", 15))
+
+    # Compact mode: top-N ranked results, used fields only, no indentation
+    compact: bool = os.getenv("SERPAPI_COMPACT", "1") != "0"
+    max_results: int = int(os.getenv("SERPAPI_MAX_RESULTS", 10))
+
+    # Latency report of the most recent call
+    last_report: dict = {}
 
+    def _search(self, query: str, location: str, api_key: str, cache=None):
+        """One (possibly cached) search; returns (products, cached)"""
+        cache = cache or search_cache
         params = {
             "engine": "google_shopping",
             "q": query,
             "location": location,
             "hl": "en",
-            "gl": "in",  # India-specific results
-            "api_key": serpapi_key
+            "api_key": api_key
         }
+        gl = gl_for(location)
+        if gl:
+            params["gl"] = gl
+
+        cache_key = cache.make_key(params["q"], params["location"], params["hl"], params.get("gl"))
+        products = cache.get(cache_key)
+        if products is not None:
+            return products, True
+
+        results = fetch_shopping_results(params, self.request_timeout)
+        if "error" in results:
+            raise RuntimeError(results["error"])
+        products = results.get("shopping_results", [])
+
+        # Only cache successful responses
+        cache.set(cache_key, products)
+        return products, False
 
-        try:
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            products = results.get("shopping_results", [])
-        except Exception as e:
-            return f"Error fetching results: {str(e)}"
-
-        clean_results = []
-
-        for p in products:
-            clean_results.append({
-                "title": p.get("title"),
-                "price": p.get("price"),
-                "source": p.get("source"),
-                "link": p.get("link"),
-                "product_link": p.get("product_link"),
-                "rating": p.get("rating"),
-                "reviews": p.get("reviews"),
-                "thumbnail": p.get("thumbnail"),
-                "delivery": p.get("delivery"),
-            })
-
-        return json.dumps(clean_results, ensure_ascii=False, indent=2)
+    def _timed_search(self, query: str, location: str, api_key: str, cache=None):
+        start = time.perf_counter()
+        products, cached = self._search(query, location, api_key, cache)
+        return products, cached, time.perf_counter() - start
+
+    @traced()
+    def _run(
+        self,
+        query: str,
+        location: str = "India",
+        query_variants: Optional[List[str]] = None,
+        locations: Optional[List[str]] = None,
+        user_preferences: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> str:
+        serpapi_key = os.getenv("SERPAPI_API_KEY")
+        if not serpapi_key:
+            return "Error: SERPAPI_API_KEY not found in environment variables."
+
+        queries = list(dict.fromkeys(q.strip() for q in [query, *(query_variants or [])] if q and q.strip()))
+        places = list(dict.fromkeys(l.strip() for l in [location, *(locations or [])] if l and l.strip()))
+        searches = [(q, l) for q in queries for l in places][:MAX_SEARCH_REQUESTS]
+
+        # A request that misses the deadline can't be stopped once it has
+        # started: it finishes in the pool and still caches its response
+        # (so a repeat search is served from the cache). Each request is
+        # bound to the cache current at submit time, not at completion.
+        start = time.perf_counter()
+        futures = [_search_pool.submit(self._timed_search, q, l, serpapi_key, search_cache) for q, l in searches]
+
+        responses, errors, cached, sequential = [], [], 0, 0.0
+        for (q, l), future in zip(searches, futures):
+            try:
+                # Every request gets the same deadline, measured from fan-out
+                remaining = max(0.0, self.request_timeout - (time.perf_counter() - start))
+                products, hit, latency = future.result(timeout=remaining)
+            except FutureTimeout:
+                future.cancel()  # only drops requests still queued behind others
+                errors.append(f"{q!r} @ {l}: timed out after {self.request_timeout:.0f}s")
+                sequential += self.request_timeout
+                continue
+            except Exception as e:
+                errors.append(f"{q!r} @ {l}: {e}")
+                continue
+            responses.append(products)
+            cached += hit
+            sequential += latency
+
+        wall = time.perf_counter() - start
+        self.last_report = {
+            "requests": len(searches),
+            "cached": cached,
+            "failed": len(errors),
+            "wall_s": round(wall, 3),
+            "sequential_s": round(sequential, 3),
+        }
+        if len(searches) > 1:
+            print(f"⏱️ {len(searches)} searches in {wall:.2f}s (sequential estimate {sequential:.2f}s, "
+                  f"{cached} cached, {len(errors)} failed)")
+
+        if not responses:
+            return f"Error fetching results: {'; '.join(errors)}"
+
+        merged, seen = [], set()
+
+        # Interleave responses so every variant contributes its top results
+        for p in (p for rank in zip_longest(*responses) for p in rank if p):
+            keys = _dedupe_keys(p)
+            if not keys or any(key in seen for key in keys):
+                continue
+            seen.update(keys)
+            merged.append(p)
+
+        if not self.compact:
+            clean_results = [{field: p.get(field) for field in FULL_FIELDS} for p in merged]
+            return json.dumps(clean_results, ensure_ascii=False, indent=2)
+
+        ranked = rank_products(merged, query, user_preferences, limit=self.max_results)
+        clean_results = [
+            {field: p[field] for field in COMPACT_FIELDS if p.get(field) is not None}
+            for p in ranked
+        ]
+        output = json.dumps(clean_results, ensure_ascii=False, separators=(",", ":"))
+
+        # Token estimate against the full, indented payload
+        full_tokens = estimate_tokens(json.dumps(
+            [{field: p.get(field) for field in FULL_FIELDS} for p in merged], ensure_ascii=False, indent=2
+        ))
+        tokens = estimate_tokens(output)
+        self.last_report.update({"results": len(clean_results), "tokens_est": tokens, "full_tokens_est": full_tokens})
+        print(f"✂️ {len(clean_results)}/{len(merged)} results, ~{tokens} tokens (full payload ~{full_tokens})")
+        return output
     
 
 class QdrantUpsertInput(BaseModel):
@@ -71,22 +235,14 @@ class QdrantCustomUpsertTool(BaseTool):
     )
     args_schema: Type[BaseModel] = QdrantUpsertInput 
 
-    # Allow QdrantClient and SentenceTransformer as arbitrary types for Pydantic
-    model_config = ConfigDict(arbitrary_types_allowed=True)
-
-    qdrant: Optional[QdrantClient] = None
-    collection: Optional[str] = None
-    embedder: Optional[SentenceTransformer] = None
-
-    def __init__(self):
-        super().__init__()
-        self.qdrant = QdrantClient(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
-        )
-        self.collection = "shopping_episodes"
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")  # 384-dim embeddings
-        
+    collection: str = COLLECTION_NAME
+
+    @property
+    def qdrant(self):
+        """Shared Qdrant client, connected on first use"""
+        return get_qdrant_client()
+
+    @traced()
     def _run(
         self,
         user_id: str,
@@ -101,21 +257,16 @@ class QdrantCustomUpsertTool(BaseTool):
         if not user_id or not query or not timestamp:
             return "Error: 'user_id', 'query' and 'timestamp' are required fields."
 
-        vector = self.embedder.encode(query).tolist()
-
-        point = {
-            "id": str(uuid4()),  # Generate a unique ID for the point
-            "vector": vector,
-            "payload": {
-                "user_id": user_id,
-                "query": query,
-                "item_details": item_details,
-                "final_items": final_items,
-                "timestamp": timestamp,
-                "description": description,
-            },
-        }
+        vector = embedding_service.encode(query)
 
-        self.qdrant.upsert(collection_name=self.collection, points=[point])
+        # Repeat and near-duplicate searches are merged into the existing episode
+        upsert_episodes([{
+            "user_id": user_id,
+            "query": query,
+            "item_details": item_details,
+            "final_items": final_items,
+            "timestamp": timestamp,
+            "description": description,
+        }], [vector], collection=self.collection)
 
         return "Data upserted to Qdrant successfully"
@@ -1,13 +1,15 @@
 from crewai.tools import BaseTool
-from typing import Type, Dict, Any
+from typing import Type, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from shop_agent.memory import memory_manager
+from shop_agent.tracing import traced
 import json
 
 class SavePreferencesInput(BaseModel):
     """Input schema for SavePreferencesTool."""
     item_name: str = Field(..., description="Name of the item category")
     preferences: Dict[str, Any] = Field(..., description="User preferences dictionary")
+    user_id: Optional[str] = Field(None, description="ID of the user the preferences belong to")
 
 class SavePreferencesTool(BaseTool):
     name: str = "save_preferences"
@@ -18,37 +20,57 @@ class SavePreferencesTool(BaseTool):
     )
     args_schema: Type[BaseModel] = SavePreferencesInput
 
-    def _run(self, item_name: str, preferences: Dict[str, Any]) -> str:
+    @traced()
+    def _run(self, item_name: str, preferences: Dict[str, Any], user_id: Optional[str] = None) -> str:
         """
         Save user preferences to database.
         
         Args:
             item_name: The name of the item category
             preferences: Dictionary containing user preferences
+            user_id: The user the preferences belong to
             
         Returns:
             Success/failure message
         """
         try:
-            print(f"🔧 SavePreferencesTool called with:")
-            print(f"   • item_name: {item_name}")
-            print(f"   • preferences: {preferences}")
+            self._log_call(item_name, preferences)
             
             # Save preferences to database
-            success = memory_manager.save_user_preferences(item_name, preferences)
-            
-            if success:
-                # Verify the save
-                verification = memory_manager.get_user_preferences(item_name)
-                print(f"✅ Verification - Retrieved after save: {verification}")
-                return f"Successfully saved preferences for {item_name} to long-term memory database. Verified: {verification}"
-            else:
-                return f"Failed to save preferences for {item_name} to database."
+            success = memory_manager.save_user_preferences(item_name, preferences, user_id=user_id)
+            return self._result(item_name, preferences, success)
                 
         except Exception as e:
-            error_msg = f"Error saving preferences to database: {str(e)}"
-            print(f"❌ {error_msg}")
-            return error_msg
+            return self._error(e)
+
+    @traced()
+    async def _arun(self, item_name: str, preferences: Dict[str, Any], user_id: Optional[str] = None) -> str:
+        """Async variant of _run, without blocking the event loop on the database"""
+        try:
+            self._log_call(item_name, preferences)
+            success = await memory_manager.asave_user_preferences(item_name, preferences, user_id=user_id)
+            return self._result(item_name, preferences, success)
+        except Exception as e:
+            return self._error(e)
+
+    @staticmethod
+    def _log_call(item_name: str, preferences: Dict[str, Any]):
+        print(f"🔧 SavePreferencesTool called with:")
+        print(f"   • item_name: {item_name}")
+        print(f"   • preferences: {preferences}")
+
+    @staticmethod
+    def _result(item_name: str, preferences: Dict[str, Any], success: bool) -> str:
+        if success:
+            return f"Successfully saved preferences for {item_name} to long-term memory database: {json.dumps(preferences, default=str)}"
+        else:
+            return f"Failed to save preferences for {item_name} to database."
+
+    @staticmethod
+    def _error(e: Exception) -> str:
+        error_msg = f"Error saving preferences to database: {str(e)}"
+        print(f"❌ {error_msg}")
+        return error_msg
 
 class GetPreferencesTool(BaseTool):
     name: str = "get_preferences"
@@ -60,15 +82,18 @@ class GetPreferencesTool(BaseTool):
     
     class GetPreferencesInput(BaseModel):
         item_name: str = Field(..., description="Name of the item category")
+        user_id: Optional[str] = Field(None, description="ID of the user whose preferences to read")
     
     args_schema: Type[BaseModel] = GetPreferencesInput
 
-    def _run(self, item_name: str) -> str:
+    @traced()
+    def _run(self, item_name: str, user_id: Optional[str] = None) -> str:
         """
         Retrieve user preferences from database.
         
         Args:
             item_name: The name of the item category
+            user_id: The user whose preferences to read
             
         Returns:
             User preferences or message if not found
@@ -77,57 +102,95 @@ class GetPreferencesTool(BaseTool):
             print(f"🔍 GetPreferencesTool called for item: {item_name}")
             
             # Get preferences from database
-            preferences = memory_manager.get_user_preferences(item_name)
-            
-            if preferences:
-                result = f"Retrieved preferences for {item_name}: {json.dumps(preferences, indent=2)}"
-                print(f"✅ {result}")
-                return result
-            else:
-                result = f"No preferences found for {item_name} in database."
-                print(f"ℹ️ {result}")
-                return result
+            preferences = memory_manager.get_user_preferences(item_name, user_id=user_id)
+            return self._result(item_name, preferences)
                 
         except Exception as e:
-            error_msg = f"Error retrieving preferences from database: {str(e)}"
-            print(f"❌ {error_msg}")
-            return error_msg
+            return self._error(e)
+
+    @traced()
+    async def _arun(self, item_name: str, user_id: Optional[str] = None) -> str:
+        """Async variant of _run, without blocking the event loop on the database"""
+        try:
+            print(f"🔍 GetPreferencesTool called for item: {item_name}")
+            preferences = await memory_manager.aget_user_preferences(item_name, user_id=user_id)
+            return self._result(item_name, preferences)
+        except Exception as e:
+            return self._error(e)
+
+    @staticmethod
+    def _result(item_name: str, preferences) -> str:
+        if preferences:
+            result = f"Retrieved preferences for {item_name}: {json.dumps(preferences, indent=2)}"
+            print(f"✅ {result}")
+        else:
+            result = f"No preferences found for {item_name} in database."
+            print(f"ℹ️ {result}")
+        return result
+
+    @staticmethod
+    def _error(e: Exception) -> str:
+        error_msg = f"Error retrieving preferences from database: {str(e)}"
+        print(f"❌ {error_msg}")
+        return error_msg
 
 class ListAllPreferencesTool(BaseTool):
     name: str = "list_all_preferences"
     description: str = (
-        "List all stored user preferences in the database. "
+        "List stored user preferences in the database, one page at a time. "
         "This tool helps see what preferences are currently stored."
     )
+    page_size: int = 50
     
     class ListAllPreferencesInput(BaseModel):
-        dummy: str = Field(default="", description="Dummy field as no input needed")
+        user_id: Optional[str] = Field(None, description="Only list this user's preferences")
+        after: Optional[list] = Field(None, description="The 'next' value returned by the previous page")
     
     args_schema: Type[BaseModel] = ListAllPreferencesInput
 
-    def _run(self, dummy: str = "") -> str:
+    @traced()
+    def _run(self, user_id: Optional[str] = None, after: Optional[list] = None, **kwargs) -> str:
         """
-        List all stored preferences.
+        List stored preferences, paginated.
         
         Returns:
-            All stored preferences or message if none found
+            One page of stored preferences or message if none found
         """
         try:
             print("📋 ListAllPreferencesTool called")
             
-            # Get all preferences from database
-            all_preferences = memory_manager.get_user_preferences()
-            
-            if all_preferences:
-                result = f"All stored preferences:\n{json.dumps(all_preferences, indent=2)}"
-                print(f"✅ Found {len(all_preferences) if isinstance(all_preferences, dict) else 'some'} preference(s)")
-                return result
-            else:
-                result = "No preferences found in database."
-                print(f"ℹ️ {result}")
-                return result
+            # Get one page of preferences from database
+            page = memory_manager.list_user_preferences(user_id=user_id, limit=self.page_size, after=after)
+            return self._result(page)
                 
         except Exception as e:
-            error_msg = f"Error listing all preferences: {str(e)}"
-            print(f"❌ {error_msg}")
-            return error_msg
\ No newline at end of file
+            return self._error(e)
+
+    @traced()
+    async def _arun(self, user_id: Optional[str] = None, after: Optional[list] = None, **kwargs) -> str:
+        """Async variant of _run, without blocking the event loop on the database"""
+        try:
+            print("📋 ListAllPreferencesTool called")
+            page = await memory_manager.alist_user_preferences(user_id=user_id, limit=self.page_size, after=after)
+            return self._result(page)
+        except Exception as e:
+            return self._error(e)
+
+    @staticmethod
+    def _result(page: dict) -> str:
+        all_preferences = page["items"]
+        if all_preferences:
+            result = f"Stored preferences:\n{json.dumps(all_preferences, indent=2)}"
+            if page["next"]:
+                result += f"\nMore preferences available; pass after={json.dumps(page['next'])} for the next page."
+            print(f"✅ Found {len(all_preferences)} preference(s)")
+        else:
+            result = "No preferences found in database."
+            print(f"ℹ️ {result}")
+        return result
+
+    @staticmethod
+    def _error(e: Exception) -> str:
+        error_msg = f"Error listing all preferences: {str(e)}"
+        print(f"❌ {error_msg}")
+        return error_msg
\ No newline at end of file
@@ -0,0 +1,54 @@
+from crewai.tools import BaseTool
+from typing import Type, Dict, Any, Optional, Union, List
+from pydantic import BaseModel, Field
+from shop_agent.ranking import compare_products, comparison_markdown
+from shop_agent.report_parser import parse_shopping_results
+from shop_agent.tracing import traced
+
+class ProductRankingInput(BaseModel):
+    """Input schema for ProductRankingTool."""
+    products: Union[str, List[Dict[str, Any]]] = Field(
+        ..., description="The JSON array of products returned by the Google Shopping Tool"
+    )
+    query: str = Field("", description="What the user is shopping for, e.g. 'wireless earbuds'")
+    user_preferences: Optional[Dict[str, Any]] = Field(
+        None, description="The user's preferences (budget, brand, colors, features)"
+    )
+
+class ProductRankingTool(BaseTool):
+    name: str = "product_ranking"
+    description: str = (
+        "Rank shopping results deterministically by relevance, budget fit, rating, reviews, "
+        "price and delivery speed, weighted by the user's preferences. Returns the top 5 "
+        "recommendations, the Best Value, Fastest Delivery and Top Rated picks, and a "
+        "price/delivery comparison matrix as markdown."
+    )
+    args_schema: Type[BaseModel] = ProductRankingInput
+
+    @traced()
+    def _run(
+        self,
+        products: Union[str, List[Dict[str, Any]]],
+        query: str = "",
+        user_preferences: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> str:
+        """
+        Rank products and render the comparison sections.
+        
+        Returns:
+            Markdown with the ranked list, picks and comparison matrix
+        """
+        try:
+            items = parse_shopping_results(products)
+            print(f"📊 ProductRankingTool called with {len(items)} product(s)")
+            if not items:
+                return "Error: no products could be read; pass the JSON array returned by the Google Shopping Tool."
+
+            comparison = compare_products(items, query, user_preferences)
+            return comparison_markdown(comparison)
+
+        except Exception as e:
+            error_msg = f"Error ranking products: {str(e)}"
+            print(f"❌ {error_msg}")
+            return error_msg
@@ -1,17 +1,19 @@
-import os
-from typing import Optional, ClassVar
-from pydantic import ConfigDict, PrivateAttr
+from typing import Optional, ClassVar, List, Type
+from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
-from qdrant_client import QdrantClient
-from qdrant_client.models import (
-    VectorParams,
-    Distance,
-    Filter,
-    FieldCondition,
-    MatchValue,
-    KeywordIndexParams
-)
-from sentence_transformers import SentenceTransformer
+from shop_agent.tracing import traced
+from shop_agent.db.vector_store import COLLECTION_NAME, VECTOR_DIM, get_qdrant_client, search_episodes
+
+
+class ShoppingMemorySearchInput(BaseModel):
+    query: str = Field(..., description="Product or item description, e.g. 'wireless earbuds'")
+    user_id: Optional[str] = Field(None, description="Filter results to a specific user")
+    queries: Optional[List[str]] = Field(
+        None, description="Extra phrasings of the query, searched in the same batch"
+    )
+    since_days: Optional[float] = Field(
+        None, description="Only return episodes from the last N days, e.g. 30 for 'recent' searches"
+    )
 
 
 class ShoppingMemorySearchTool(BaseTool):
@@ -21,76 +23,57 @@ class ShoppingMemorySearchTool(BaseTool):
         "Input:\n"
         "- query: str → product or item description (e.g., 'wireless earbuds')\n"
         "- user_id: str → filter results to a specific user\n"
+        "- queries: list[str] → optional extra phrasings, searched together in one batch\n"
+        "- since_days: float → optional recency window, e.g. 30 for recent searches\n"
         "Returns: a list of relevant past shopping episodes"
     )
-
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    args_schema: Type[BaseModel] = ShoppingMemorySearchInput
 
     # Class-level constants
-    collection_name: ClassVar[str] = "shopping_episodes"
-    vector_dim: ClassVar[int] = 384
-    score_threshold: ClassVar[float] = 0.75
+    collection_name: ClassVar[str] = COLLECTION_NAME
+    vector_dim: ClassVar[int] = VECTOR_DIM
+    score_threshold: ClassVar[float] = 0.75  # cosine; hybrid mode applies it to dense candidates only
     limit: ClassVar[int] = 5
 
-    # Private attributes
-    _qdrant: QdrantClient = PrivateAttr()
-    _embedder: SentenceTransformer = PrivateAttr()
-
-    def __init__(self):
-        super().__init__()
-        self._qdrant = QdrantClient(
-            url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
-        )
-        self._embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    @property
+    def _qdrant(self):
+        """Shared Qdrant client, connected on first use"""
+        return get_qdrant_client()
 
-        # Ensure keyword index on user_id
+    @traced()
+    def _run(
+        self,
+        query: str,
+        user_id: Optional[str] = None,
+        queries: Optional[List[str]] = None,
+        since_days: Optional[float] = None,
+        **kwargs
+    ) -> list:
         try:
-            schema = self._qdrant.get_collection(self.collection_name).payload_schema or {}
-            if "user_id" not in schema:
-                print(f"🔧 Creating keyword index on 'user_id'")
-                self._qdrant.create_payload_index(
-                    collection_name=self.collection_name,
-                    field_name="user_id",
-                    field_schema=KeywordIndexParams(type="keyword")
-                )
-        except Exception as e:
-            print(f"⚠️ Index check failed: {e}")
-
-    def _run(self, query: str, user_id: Optional[str] = None) -> list:
-        try:
-            vector = self._embedder.encode(query).tolist()
-
-            search_filter = None
-            if user_id:
-                search_filter = Filter(
-                    must=[FieldCondition(key="user_id", match=MatchValue(value=user_id))]
-                )
-
-            results = self._qdrant.search(
-                collection_name=self.collection_name,
-                query_vector=vector,
+            phrasings = list(dict.fromkeys(q for q in [query, *(queries or [])] if q and q.strip()))
+            per_query = search_episodes(
+                phrasings,
+                user_id=user_id,
                 limit=self.limit,
-                with_payload=True,
                 score_threshold=self.score_threshold,
-                query_filter=search_filter
+                collection=self.collection_name,
+                since_days=since_days,
             )
 
+            # Merge phrasings: one hit per episode, at its best score
+            best = {}
+            for hits in per_query:
+                for hit in hits:
+                    if hit["id"] not in best or hit["score"] > best[hit["id"]]["score"]:
+                        best[hit["id"]] = hit
+            results = sorted(best.values(), key=lambda h: h["score"], reverse=True)[:self.limit]
+
             if not results:
                 return [{"status": "no_results", "message": "No matches found."}]
 
             return [
-                {
-                    "status": "success",
-                    "user_id": r.payload.get("user_id"),
-                    "query": r.payload.get("query"),
-                    "item_details": r.payload.get("item_details"),
-                    "final_items": r.payload.get("final_items"),
-                    "timestamp": r.payload.get("timestamp"),
-                    "description": r.payload.get("description"),
-                    "score": r.score
-                }
-                for r in results
+                {"status": "success", **{k: v for k, v in hit.items() if k != "id"}}
+                for hit in results
             ]
 
         except Exception as e:
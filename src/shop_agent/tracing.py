@@ -0,0 +1,203 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Where finished spans go: "jsonl" (TRACE_PATH), "otel" (OpenTelemetry, if
+# installed and configured by the host application) or "none" (summary only)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "jsonl").strip().lower()
+TRACE_PATH = os.getenv("TRACE_PATH", "output/traces.jsonl")
+
+# Span currently open in this thread/task: (trace_id, span_id)
+_current = contextvars.ContextVar("shop_agent_span", default=None)
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Tracer:
+    """
+    Lightweight span tracer for the shopping pipeline.
+
+    Spans are named "<stage>.<operation>" (task.item_find_task,
+    tool.Google Shopping Tool, serpapi.search, embedding.encode,
+    qdrant.query_points, mongo.find, memory.get_user_preferences, ...).
+    Every finished span is exported and its duration kept for the session
+    summary, which reports count, p50, p95 and max per span name.
+    """
+
+    def __init__(self, export: str = TRACE_EXPORT, path: str = TRACE_PATH):
+        self.export = export
+        self.path = path
+        self.session_id = uuid.uuid4().hex
+        self._durations = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._otel = None
+
+        if self.export == "otel":
+            try:
+                from opentelemetry import trace as otel_trace
+                self._otel = otel_trace.get_tracer("shop_agent")
+            except ImportError:
+                print("⚠️ TRACE_EXPORT=otel but opentelemetry is not installed; writing JSONL instead")
+                self.export = "jsonl"
+
+    # --------------------
+    # Spans
+    # --------------------
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time the enclosed block as a span nested under the current one"""
+        parent = _current.get()
+        trace_id = parent[0] if parent else uuid.uuid4().hex
+        span_id = uuid.uuid4().hex[:16]
+        token = _current.set((trace_id, span_id))
+
+        otel_span = self._otel.start_as_current_span(name, attributes=attrs) if self._otel else None
+        if otel_span is not None:
+            otel_span.__enter__()
+
+        start, started = time.time(), time.perf_counter()
+        error = None
+        try:
+            yield attrs  # callers may add attributes while the span is open
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            _current.reset(token)
+            if otel_span is not None:
+                otel_span.__exit__(None, None, None)
+            self._finish(name, start, duration, attrs, trace_id, span_id, parent, error)
+
+    def record(self, name: str, duration: float, start: float = None, **attrs):
+        """Record a span measured elsewhere (e.g. crew task timings, driver events)"""
+        parent = _current.get()
+        start = start if start is not None else time.time() - duration
+        trace_id = parent[0] if parent else uuid.uuid4().hex
+
+        if self._otel is not None:
+            otel_span = self._otel.start_span(name, attributes=attrs, start_time=int(start * 1e9))
+            otel_span.end(end_time=int((start + duration) * 1e9))
+
+        self._finish(name, start, duration, attrs, trace_id, uuid.uuid4().hex[:16], parent, None)
+
+    def _finish(self, name, start, duration, attrs, trace_id, span_id, parent, error):
+        with self._lock:
+            self._durations.setdefault(name, []).append(duration)
+            if self.export != "jsonl":
+                return
+            try:
+                if self._file is None:
+                    if os.path.dirname(self.path):
+                        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(json.dumps({
+                    "session_id": self.session_id,
+                    "trace_id": trace_id,
+                    "span_id": span_id,
+                    "parent_id": parent[1] if parent else None,
+                    "name": name,
+                    "start": round(start, 6),
+                    "duration_ms": round(duration * 1000, 3),
+                    "error": error,
+                    "attributes": attrs,
+                }, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                print(f"⚠️ Could not write trace to {self.path}: {e}; JSONL export disabled")
+                self.export = "none"
+
+    # --------------------
+    # Session summary
+    # --------------------
+    def summary(self) -> dict:
+        """Per-span-name count, total, p50, p95 and max (seconds) for this session"""
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+        return {
+            name: {
+                "count": len(values),
+                "total_s": round(sum(values), 3),
+                "p50_s": round(percentile(values, 50), 4),
+                "p95_s": round(percentile(values, 95), 4),
+                "max_s": round(max(values), 4),
+            }
+            for name, values in sorted(durations.items())
+        }
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        width = max(len(name) for name in summary)
+        print(f"\n⏱️ Stage latencies this session (session {self.session_id[:8]}):")
+        print(f"   {'stage':<{width}}  {'count':>5}  {'p50':>8}  {'p95':>8}  {'max':>8}  {'total':>8}")
+        for name, s in summary.items():
+            print(f"   {name:<{width}}  {s['count']:>5}  {s['p50_s']:>7.3f}s  {s['p95_s']:>7.3f}s  "
+                  f"{s['max_s']:>7.3f}s  {s['total_s']:>7.2f}s")
+
+    def start_session(self, session_id: str = None):
+        """Start a new session: new id, empty summary"""
+        with self._lock:
+            self.session_id = session_id or uuid.uuid4().hex
+            self._durations = {}
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# Provide a module-level singleton instance
+tracer = Tracer()
+atexit.register(tracer.close)
+
+
+def traced(name: str = None):
+    """
+    Decorator: run a function or coroutine inside a span. Without a name,
+    tool methods are named "tool.<tool name>" and other functions by their
+    qualified name.
+    """
+    def decorate(func):
+        def span_name(args):
+            if name:
+                return name
+            tool_name = getattr(args[0], "name", None) if args else None
+            return f"tool.{tool_name}" if isinstance(tool_name, str) else func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name(args)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name(args)):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
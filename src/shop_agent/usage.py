@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+# Where per-query usage records are appended ("" disables the file)
+USAGE_PATH = os.getenv("USAGE_PATH", "output/usage.jsonl")
+
+# USD per 1M (prompt, completion) tokens, matched by model name substring;
+# LLM_PROMPT_PRICE / LLM_COMPLETION_PRICE (USD per 1M tokens) override them
+MODEL_PRICES = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_prompt_tokens", "total_tokens", "successful_requests")
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+def price_for(model: str):
+    """(prompt, completion) USD per 1M tokens for a model, or None if unknown"""
+    prompt, completion = os.getenv("LLM_PROMPT_PRICE"), os.getenv("LLM_COMPLETION_PRICE")
+    if prompt and completion:
+        return float(prompt), float(completion)
+    model = (model or "").lower()
+    matches = [key for key in MODEL_PRICES if key in model]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def usage_dict(metrics) -> dict:
+    """Token counters from a crewai UsageMetrics (or dict), zero-filled"""
+    if metrics is None:
+        return {field: 0 for field in USAGE_FIELDS}
+    if isinstance(metrics, dict):
+        return {field: int(metrics.get(field) or 0) for field in USAGE_FIELDS}
+    return {field: int(getattr(metrics, field, 0) or 0) for field in USAGE_FIELDS}
+
+
+def add_usage(total: dict, usage: dict) -> dict:
+    for field, value in usage.items():
+        total[field] = total.get(field, 0) + value
+    return total
+
+
+def cost_usd(usage: dict, model: str):
+    price = price_for(model)
+    if price is None:
+        return None
+    return round((usage["prompt_tokens"] * price[0] + usage["completion_tokens"] * price[1]) / 1e6, 6)
+
+
+def render_input(value) -> str:
+    """An input value as it is interpolated into a prompt"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def agent_usage(agent) -> dict:
+    """Cumulative token counters of an agent's LLM"""
+    process = getattr(agent, "_token_process", None)
+    return usage_dict(process.get_summary() if process is not None else None)
+
+
+def model_name(agent) -> str:
+    llm = getattr(agent, "llm", None)
+    return str(getattr(llm, "model", None) or llm or os.getenv("MODEL", ""))
+
+
+def prompt_bytes(crew, inputs: dict) -> dict:
+    """
+    Bytes each input variable contributes to every task's prompt (task
+    description, expected output and agent role/goal/backstory), plus the
+    outputs of earlier tasks passed in as context.
+    """
+    report = {}
+    seen_outputs = []
+    for t in crew.tasks:
+        sizes = {}
+        templates = [
+            getattr(t, "_original_description", None) or t.description,
+            getattr(t, "_original_expected_output", None) or t.expected_output,
+        ]
+        agent = t.agent
+        if agent is not None:
+            templates += [getattr(agent, f"_original_{field}", None) or getattr(agent, field, "")
+                          for field in ("role", "goal", "backstory")]
+        for template in templates:
+            for name in _PLACEHOLDER.findall(template or ""):
+                if name in inputs:
+                    sizes[name] = sizes.get(name, 0) + len(render_input(inputs[name]).encode("utf-8"))
+
+        # Explicit context, else (sequential semantics) every earlier output
+        context = t.context if isinstance(t.context, list) else None
+        outputs = [c.output for c in context] if context is not None else seen_outputs
+        context_bytes = sum(len(str(getattr(o, "raw", "") or "").encode("utf-8")) for o in outputs if o)
+        if context_bytes:
+            sizes["context"] = context_bytes
+
+        report[t.name] = sizes
+        seen_outputs = seen_outputs + [t.output]
+    return report
+
+
+class UsageTracker:
+    """
+    LLM token and cost accounting.
+
+    Each kickoff is attributed per task from the change in its agent's token
+    counters, and added to running per-user and per-session totals. Prompt
+    bytes are broken down by input variable so the largest contributors to
+    prompt size stand out. Records are appended to USAGE_PATH as JSON lines.
+    """
+
+    def __init__(self, path: str = USAGE_PATH):
+        self.path = path
+        self.session_id = uuid.uuid4().hex
+        self.session = {}
+        self.users = {}
+        self.prompt_bytes = {}
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def start_session(self, session_id: str = None):
+        with self._lock:
+            self.session_id = session_id or uuid.uuid4().hex
+            self.session, self.users, self.prompt_bytes, self.queries = {}, {}, {}, 0
+
+    def snapshot(self, crew) -> dict:
+        """Token counters of the crew's agents, taken before a kickoff"""
+        return {id(a): agent_usage(a) for a in crew.agents}
+
+    def record_kickoff(self, crew, before: dict, inputs: dict, raw_output=None, user_id: str = None) -> dict:
+        """Account one kickoff; returns its usage record"""
+        tasks, total_cost = {}, 0.0
+        bytes_by_task = prompt_bytes(crew, inputs)
+
+        for agent in crew.agents:
+            after = agent_usage(agent)
+            prior = before.get(id(agent), {})
+            # crewai may reset an agent's counters between kickoffs
+            if after["total_tokens"] >= prior.get("total_tokens", 0):
+                delta = {field: after[field] - prior.get(field, 0) for field in USAGE_FIELDS}
+            else:
+                delta = after
+            names = [t.name for t in crew.tasks if t.agent is agent]
+            if not names or not any(delta.values()):
+                continue
+            model = model_name(agent)
+            cost = cost_usd(delta, model)
+            total_cost += cost or 0.0
+            tasks["+".join(names)] = {**delta, "model": model, "cost_usd": cost}
+
+        # The crew's token_usage sums the agents' lifetime counters, which
+        # span several kickoffs of a cached crew; it's only the fallback
+        total = {field: sum(t[field] for t in tasks.values()) for field in USAGE_FIELDS}
+        if not total["total_tokens"]:
+            total = usage_dict(getattr(raw_output, "token_usage", None))
+        total["cost_usd"] = round(total_cost, 6)
+
+        query_bytes = {}
+        for sizes in bytes_by_task.values():
+            add_usage(query_bytes, sizes)
+
+        with self._lock:
+            self.queries += 1
+            add_usage(self.session, total)
+            user_total = add_usage(self.users.setdefault(user_id, {}), total)
+            add_usage(self.prompt_bytes, query_bytes)
+            record = {
+                "timestamp": datetime.now().isoformat(),
+                "session_id": self.session_id,
+                "user_id": user_id,
+                "tasks": tasks,
+                "total": total,
+                "prompt_bytes": dict(sorted(query_bytes.items(), key=lambda kv: -kv[1])),
+                "prompt_bytes_by_task": bytes_by_task,
+                "user_total": dict(user_total),
+                "session_total": dict(self.session),
+            }
+            self._write(record)
+        return record
+
+    def _write(self, record: dict):
+        if not self.path:
+            return
+        try:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write usage to {self.path}: {e}")
+
+    def summary(self) -> dict:
+        """Session totals, per-user totals and prompt bytes by input variable"""
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "queries": self.queries,
+                "session_total": dict(self.session),
+                "users": {user: dict(total) for user, total in self.users.items()},
+                "prompt_bytes": dict(sorted(self.prompt_bytes.items(), key=lambda kv: -kv[1])),
+            }
+
+    @staticmethod
+    def print_query(record: dict):
+        total = record["total"]
+        largest = ", ".join(f"{name} {size / 1024:.1f}KB" for name, size in list(record["prompt_bytes"].items())[:3])
+        print(f"🧮 Tokens: {total['prompt_tokens']} prompt + {total['completion_tokens']} completion "
+              f"(~${total['cost_usd']:.4f}); largest prompt inputs: {largest or 'n/a'}")
+        for name, usage in record["tasks"].items():
+            print(f"   • {name}: {usage['prompt_tokens']} + {usage['completion_tokens']} tokens "
+                  f"in {usage['successful_requests']} request(s)")
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary["queries"]:
+            return
+        total = summary["session_total"]
+        print(f"\n🧮 Session tokens over {summary['queries']} quer{'y' if summary['queries'] == 1 else 'ies'}: "
+              f"{total.get('prompt_tokens', 0)} prompt + {total.get('completion_tokens', 0)} completion "
+              f"(~${total.get('cost_usd', 0.0):.4f})")
+        print(f"   Prompt bytes by input: {json.dumps(summary['prompt_bytes'])}")
+
+
+# Provide a module-level singleton instance
+usage_tracker = UsageTracker()
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Keep what the modules write by default (traces, token usage, the SerpAPI
+# cache) out of the working tree. Set before any shop_agent module is
+# imported, since they read these at import time.
+_artifacts = tempfile.TemporaryDirectory(prefix="shop_agent-tests-")
+os.environ["TRACE_EXPORT"] = "jsonl"
+os.environ["TRACE_PATH"] = os.path.join(_artifacts.name, "traces.jsonl")
+os.environ["USAGE_PATH"] = os.path.join(_artifacts.name, "usage.jsonl")
+os.environ["SERPAPI_CACHE_PATH"] = os.path.join(_artifacts.name, "serpapi_cache.sqlite3")
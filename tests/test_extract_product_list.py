@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("crewai")
+
+from shop_agent import main  # noqa: E402
+from shop_agent.crew import get_shop_agent  # noqa: E402
+
+INPUTS = {"user_id": "alice", "target_item": "wireless earbuds"}
+
+
+def crew_output(report: str):
+    return SimpleNamespace(tasks_output=[SimpleNamespace(name="item_compare_task", raw=report)], raw=report)
+
+
+def test_markdown_extraction_task_is_a_fresh_copy():
+    shared = get_shop_agent().markdown_extraction_task()
+    description = shared.description
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        tasks = list(pool.map(lambda _: main.markdown_extraction_task(INPUTS), range(4)))
+
+    assert len({id(t) for t in tasks} | {id(shared)}) == 5
+    assert len({id(t.agent) for t in tasks} | {id(shared.agent)}) == 5
+    assert all(t.name == "markdown_extraction_task" and t.output_pydantic is shared.output_pydantic for t in tasks)
+    assert shared.description == description
+
+
+def test_fallback_runs_the_extraction_task_with_the_kickoff_inputs(monkeypatch):
+    calls = []
+
+    class StubTask:
+        def execute_sync(self, context=None):
+            calls.append(context)
+            return SimpleNamespace(pydantic=SimpleNamespace(items=["boAt Airdopes 141"]), raw="")
+
+    def stub_task(inputs=None):
+        calls.append(inputs)
+        return StubTask()
+
+    monkeypatch.setattr(main, "markdown_extraction_task", stub_task)
+    report = "I could not compare these products."
+
+    assert main.extract_product_list(crew_output(report), INPUTS) == [{"title": "boAt Airdopes 141"}]
+    assert calls == [INPUTS, report]
+
+
+def test_parsed_report_skips_the_extraction_task(monkeypatch):
+    monkeypatch.setattr(main, "markdown_extraction_task", pytest.fail)
+    report = "1. [Noise Buds VS104](https://example.com/noise) - ₹999"
+
+    products = main.extract_product_list(crew_output(report), INPUTS)
+    assert [p["title"] for p in products] == ["Noise Buds VS104"]
@@ -0,0 +1,56 @@
+import json
+import os
+import stat
+
+from shop_agent.db.file_store import JsonLogStore
+
+
+def reopen(store: JsonLogStore) -> JsonLogStore:
+    """A fresh store over the same files, as after a restart (no compaction)"""
+    if store._log is not None:
+        store._log.close()
+    return JsonLogStore(store.path, compact_every=store.compact_every)
+
+
+def test_writes_survive_restart_without_compaction(tmp_path):
+    store = JsonLogStore(str(tmp_path / "prefs.json"), compact_every=0)
+    store.set("earbuds", {"brand": ["Boat"]})
+    store.set("laptop", {"budget": 60000})
+    store.delete("laptop")
+
+    store = reopen(store)
+    assert store.all() == {"earbuds": {"brand": ["Boat"]}}
+
+
+def test_compaction_writes_snapshot_and_truncates_log(tmp_path):
+    store = JsonLogStore(str(tmp_path / "prefs.json"), compact_every=3)
+    for i in range(3):
+        store.set(f"item{i}", {"n": i})
+
+    with open(store.path, encoding="utf-8") as f:
+        assert json.load(f) == {f"item{i}": {"n": i} for i in range(3)}
+    assert os.path.getsize(store.log_path) == 0
+
+
+def test_torn_tail_is_cut_so_later_writes_replay(tmp_path):
+    store = JsonLogStore(str(tmp_path / "prefs.json"), compact_every=0)
+    store.set("earbuds", {"brand": ["Boat"]})
+    store._log.write('{"op":"set","key":"lap')  # crash mid-write
+    store._log.flush()
+
+    store = reopen(store)
+    assert store.all() == {"earbuds": {"brand": ["Boat"]}}
+    store.set("phone", {"budget": 20000})
+
+    store = reopen(store)
+    assert store.all() == {"earbuds": {"brand": ["Boat"]}, "phone": {"budget": 20000}}
+
+
+def test_snapshot_keeps_readable_permissions(tmp_path):
+    store = JsonLogStore(str(tmp_path / "prefs.json"), compact_every=1)
+    store.set("earbuds", {})
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o644
+
+    os.chmod(store.path, 0o640)
+    store.set("laptop", {})
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o640
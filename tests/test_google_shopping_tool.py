@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from shop_agent.db.search_cache import SearchResponseCache
+from shop_agent.tools import custom_tool
+from shop_agent.tools.custom_tool import GoogleShoppingTool, fetch_shopping_results
+
+
+class FakeResponse:
+    def __init__(self, payload: dict):
+        self.text = json.dumps(payload)
+
+
+class StubEngine:
+    """Stands in for SerpAPI: canned products per query, recording every request"""
+
+    def __init__(self, products=None, fail=(), delay=0.0):
+        self.products = products or {}
+        self.fail = set(fail)
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, params: dict, timeout: float) -> dict:
+        with self._lock:
+            self.calls.append((params["q"], params["location"]))
+        if self.delay:
+            time.sleep(self.delay)
+        if params["q"] in self.fail:
+            return {"error": "Google hasn't returned any results for this query."}
+        return {"shopping_results": self.products.get(params["q"], [])}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A fan-out pool per test, drained before teardown (timed-out requests keep running)"""
+    pool = ThreadPoolExecutor(max_workers=custom_tool.MAX_SEARCH_REQUESTS, thread_name_prefix="serpapi-test")
+    monkeypatch.setattr(custom_tool, "_search_pool", pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path, pool):
+    cache = SearchResponseCache(str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(custom_tool, "search_cache", cache)
+    yield cache
+    pool.shutdown(wait=True)  # before the cache closes
+    cache.close()
+
+
+@pytest.fixture
+def engine(monkeypatch, cache):
+    monkeypatch.setenv("SERPAPI_API_KEY", "test-key")
+    engine = StubEngine({
+        "earbuds": [
+            {"title": "Boat Airdopes 141", "price": "₹1,299", "product_link": "https://x/1"},
+            {"title": "Realme Buds T110", "price": "₹1,499", "product_link": "https://x/2"},
+        ],
+        "wireless earbuds": [
+            {"title": "boat  airdopes 141", "price": "₹1,299", "product_link": "https://y/1"},
+            {"title": "JBL Wave Buds", "price": "₹2,999", "product_link": "https://x/3"},
+        ],
+    })
+    monkeypatch.setattr(custom_tool, "fetch_shopping_results", engine)
+    return engine
+
+
+def titles(output: str) -> list:
+    return [p["title"] for p in json.loads(output)]
+
+
+def test_fetch_sets_timeout_on_the_search_client(monkeypatch):
+    seen = {}
+
+    def get(url, params, timeout=None):
+        seen.update(params=params, timeout=timeout)
+        return FakeResponse({"shopping_results": [{"title": "Boat Airdopes 141"}]})
+
+    monkeypatch.setattr("serpapi.serp_api_client.requests.get", get)
+    results = fetch_shopping_results({"engine": "google_shopping", "q": "earbuds", "api_key": "k"}, 7.5)
+
+    assert results["shopping_results"] == [{"title": "Boat Airdopes 141"}]
+    assert seen["timeout"] == 7.5
+    assert seen["params"]["q"] == "earbuds"
+
+
+def test_variants_and_locations_fan_out_and_dedupe(engine):
+    tool = GoogleShoppingTool()
+    output = tool._run("earbuds", "India", query_variants=["wireless earbuds"], locations=["USA"])
+
+    assert sorted(engine.calls) == [
+        ("earbuds", "India"), ("earbuds", "USA"), ("wireless earbuds", "India"), ("wireless earbuds", "USA"),
+    ]
+    # Same title with different spacing/case, and repeats across locations, appear once
+    assert sorted(titles(output)) == ["Boat Airdopes 141", "JBL Wave Buds", "Realme Buds T110"]
+    assert tool.last_report["requests"] == 4
+    assert tool.last_report["failed"] == 0
+
+
+def test_repeat_search_is_served_from_cache(engine):
+    tool = GoogleShoppingTool()
+    first = tool._run("earbuds")
+    second = tool._run("  Earbuds ")
+
+    assert engine.calls == [("earbuds", "India")]
+    assert first == second
+    assert tool.last_report["cached"] == 1
+
+
+def test_failed_variant_does_not_drop_the_others(engine):
+    engine.fail = {"wireless earbuds"}
+    tool = GoogleShoppingTool()
+    output = tool._run("earbuds", query_variants=["wireless earbuds"])
+
+    assert sorted(titles(output)) == ["Boat Airdopes 141", "Realme Buds T110"]
+    assert tool.last_report["failed"] == 1
+
+    # Errors are not cached
+    engine.fail = set()
+    tool._run("wireless earbuds")
+    assert engine.calls.count(("wireless earbuds", "India")) == 2
+
+
+def test_all_searches_failing_reports_the_errors(engine):
+    engine.fail = {"earbuds"}
+    output = GoogleShoppingTool()._run("earbuds")
+
+    assert output.startswith("Error fetching results:")
+    assert "'earbuds' @ India" in output
+
+
+def test_slow_search_times_out(engine, pool, cache):
+    engine.delay = 0.5
+    tool = GoogleShoppingTool(request_timeout=0.05)
+    output = tool._run("earbuds")
+
+    assert "timed out" in output
+    assert tool.last_report["failed"] == 1
+
+    # The abandoned request still completes and fills the test's cache
+    pool.shutdown(wait=True)
+    assert cache.get(cache.make_key("earbuds", "India", "en", "in")) is not None
+
+
+def test_missing_api_key(engine, monkeypatch):
+    monkeypatch.delenv("SERPAPI_API_KEY")
+    assert GoogleShoppingTool()._run("earbuds").startswith("Error: SERPAPI_API_KEY")
+    assert engine.calls == []
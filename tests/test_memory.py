@@ -0,0 +1,56 @@
+import pytest
+
+from shop_agent.db.preference_store import FilePreferenceStore
+from shop_agent.memory import MemoryManager
+
+
+class FlakyStore:
+    """Primary backend stand-in: raises for the first `failures` lookups"""
+
+    name = "mongo"
+
+    def __init__(self, docs=None, failures=0):
+        self.docs = docs or {}
+        self.failures = failures
+        self.calls = 0
+
+    def get(self, item_name, user_id):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("server selection timed out")
+        return self.docs.get((user_id, item_name))
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = MemoryManager(backend="mongo")
+    manager._file_store = FilePreferenceStore(str(tmp_path / "prefs.json"))
+    yield manager
+    manager._file_store.close()
+
+
+def test_backend_error_is_not_cached_as_a_miss(manager):
+    prefs = {"brand": ["Boat"], "user_id": "alice"}
+    manager._store = FlakyStore({("alice", "earbuds"): prefs}, failures=1)
+
+    assert manager.get_user_preferences("earbuds", user_id="alice") is None  # fallback file is empty
+    assert manager.get_user_preferences("earbuds", user_id="alice") == prefs
+    assert manager.get_user_preferences("earbuds", user_id="alice") == prefs
+    assert manager._store.calls == 2
+
+
+def test_fallback_result_is_not_cached(manager):
+    manager.file_store.save("earbuds", {"brand": ["Noise"]}, "alice")
+    manager._store = FlakyStore({("alice", "earbuds"): {"brand": ["Boat"]}}, failures=1)
+
+    assert manager.get_user_preferences("earbuds", user_id="alice")["brand"] == ["Noise"]
+    assert manager.get_user_preferences("earbuds", user_id="alice")["brand"] == ["Boat"]
+
+
+def test_missing_preferences_are_cached(manager):
+    manager._store = FlakyStore()
+
+    assert manager.get_user_preferences("earbuds", user_id="alice") is None
+    assert manager.get_user_preferences("earbuds", user_id="alice") is None
+    assert manager._store.calls == 1
@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+from shop_agent.preference_parser import FEATURES, FAST_PATH_CONFIDENCE, extract_user_preference
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "preference_corpus.jsonl")
+FIELDS = ("brand", "preferred_colors", "budget", "features")
+
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def comparable(preference: dict) -> dict:
+    """Fields as compared against the labels: features only by canonical name"""
+    features = {f for f in preference.get("features") or [] if f in FEATURES}
+    return {
+        "brand": sorted(preference.get("brand") or []),
+        "preferred_colors": sorted(preference.get("preferred_colors") or []),
+        "budget": preference.get("budget"),
+        "features": sorted(features),
+    }
+
+
+def evaluate(case):
+    preference, confidence = extract_user_preference(case["item"], case["details"])
+    return comparable(preference.model_dump()), comparable(case["expected"]), confidence
+
+
+def test_field_accuracy():
+    cases = load_corpus()
+    correct = {field: 0 for field in FIELDS}
+    for case in cases:
+        got, expected, _ = evaluate(case)
+        for field in FIELDS:
+            correct[field] += got[field] == expected[field]
+    accuracy = {field: correct[field] / len(cases) for field in FIELDS}
+    assert all(value >= 0.95 for value in accuracy.values()), accuracy
+
+
+@pytest.mark.parametrize("case", load_corpus(), ids=lambda case: case["details"] or "<empty>")
+def test_fast_path_is_never_wrong(case):
+    """Whenever the LLM extraction would be skipped, the rule-based result must be right"""
+    got, expected, confidence = evaluate(case)
+    if confidence >= FAST_PATH_CONFIDENCE:
+        assert got == expected
+
+
+@pytest.mark.parametrize("details", ["", "Noise", "low noise, black"])
+def test_ambiguous_or_empty_details_use_the_llm(details):
+    _, confidence = extract_user_preference("earbuds", details)
+    assert confidence < FAST_PATH_CONFIDENCE
+
+
+def test_fast_path_rate():
+    cases = load_corpus()
+    fast = [case for case in cases if evaluate(case)[2] >= FAST_PATH_CONFIDENCE]
+    assert len(fast) / len(cases) >= 0.6
@@ -0,0 +1,67 @@
+import pytest
+
+from shop_agent.preference_parser import parse_user_details, parse_many
+
+
+def parsed(details: str) -> dict:
+    result = parse_user_details(details)
+    result.pop('raw_input')
+    return result
+
+
+@pytest.mark.parametrize("details", [
+    "noise cancellation",
+    "noise-canceling",
+    "noise-cancelling",
+    "noise canceller",
+    "active noise cancelling",
+    "Noise Cancelation",
+    "anc",
+])
+def test_noise_cancellation_phrasings(details):
+    assert parsed(details) == {'features': ['noise_cancellation']}
+
+
+def test_noise_cancellation_is_not_the_noise_brand():
+    assert parsed("black, under 2,000, noise-canceling") == {
+        'color': 'black', 'budget': 2000, 'features': ['noise_cancellation'],
+    }
+
+
+@pytest.mark.parametrize("details, feature", [
+    ("wireless noise cancelling", 'noise_cancellation'),
+    ("waterproof wireless", 'wireless'),
+    ("bluetooth, waterproof noise-canceling", 'noise_cancellation'),
+])
+def test_feature_priority_matches_original_parser(details, feature):
+    # One feature per fragment: noise cancellation > wireless > waterproof
+    assert parsed(details)['features'][-1] == feature
+
+
+@pytest.mark.parametrize("details, brand", [
+    ("Noise", ['Noise']),
+    ("noise", ['Noise']),
+    ("brand noise", ['Noise']),
+    ("from Noise", ['Noise']),
+    ("boat", ['boAt']),
+])
+def test_brand_when_written_as_one(details, brand):
+    assert parsed(details)['brand'] == brand
+
+
+@pytest.mark.parametrize("details", ["low noise", "beats per minute tracking"])
+def test_everyday_words_are_not_brands(details):
+    assert parsed(details) == {'features': [details]}
+
+
+def test_same_structure_as_original_parser():
+    assert parse_user_details("black, budget around 150, wireless, good battery life") == {
+        'color': 'black',
+        'budget': 150,
+        'features': ['wireless', 'good battery life'],
+        'raw_input': "black, budget around 150, wireless, good battery life",
+    }
+
+
+def test_parse_many():
+    assert [p['color'] for p in parse_many(["red", "blue, wireless"])] == ['red', 'blue']
@@ -0,0 +1,42 @@
+import pytest
+
+from shop_agent.db.preference_store import GLOBAL_USER_ID, FilePreferenceStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FilePreferenceStore(str(tmp_path / "prefs.json"))
+    store.save("earbuds", {"brand": ["Boat"]}, GLOBAL_USER_ID)
+    store.save("earbuds", {"brand": ["JBL"]}, "alice")
+    store.save("laptop", {"budget": 60000}, "alice")
+    store.save("earbuds", {"brand": ["Sony"]}, "bob")
+    yield store
+    store.close()
+
+
+def owners(store) -> list:
+    return sorted((d["user_id"], d["item_name"]) for d in store.iter())
+
+
+def test_delete_item_for_one_user(store):
+    assert store.delete("earbuds", "alice") == 1
+    assert owners(store) == [("alice", "laptop"), ("bob", "earbuds"), (GLOBAL_USER_ID, "earbuds")]
+
+
+def test_delete_item_without_user_removes_it_for_all_users(store):
+    assert store.delete("earbuds") == 3
+    assert owners(store) == [("alice", "laptop")]
+
+
+def test_delete_all_of_a_users_documents(store):
+    assert store.delete(user_id="alice") == 2
+    assert owners(store) == [("bob", "earbuds"), (GLOBAL_USER_ID, "earbuds")]
+
+
+def test_find_returns_only_the_users_documents(store):
+    assert store.find(GLOBAL_USER_ID) == [
+        {"brand": ["Boat"], "timestamp": store.get("earbuds", GLOBAL_USER_ID)["timestamp"],
+         "user_id": GLOBAL_USER_ID, "item_name": "earbuds"},
+    ]
+    assert sorted(d["item_name"] for d in store.find("alice")) == ["earbuds", "laptop"]
+    assert store.find("nobody") == []
@@ -0,0 +1,81 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from shop_agent.ranking import (
+    compare_products, parse_count, parse_delivery_days, parse_price, rank_products,
+)
+
+DATA = Path(__file__).parent / "data"
+
+
+@pytest.fixture(scope="module")
+def products():
+    return json.loads((DATA / "shopping_results_earbuds.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("value, expected", [
+    (412345, 412345.0),
+    ("1,234", 1234.0),
+    ("(412K)", 412000.0),
+    ("3.2K", 3200.0),
+    ("1.1M reviews", 1100000.0),
+    ("2.5k ratings", 2500.0),
+    ("", None),
+    (None, None),
+])
+def test_parse_count(value, expected):
+    assert parse_count(value) == expected
+
+
+@pytest.mark.parametrize("price, expected", [
+    ("₹1,099.00", 1099.0),
+    ("$129.00", 129.0),
+    ("1.299,00 €", 1299.0),
+    ("Rs. 2,499", 2499.0),
+    ("", None),
+])
+def test_parse_price(price, expected):
+    assert parse_price({"price": price}) == expected
+
+
+def test_parse_delivery_days():
+    today = date(2026, 10, 18)  # a Sunday
+    assert parse_delivery_days("Free delivery tomorrow", today) == 1.0
+    assert parse_delivery_days("Delivery in 3-5 days", today) == 4.0
+    assert parse_delivery_days("Delivery by 20 Oct", today) == 2.0
+    assert parse_delivery_days("Free delivery by Tue", today) == 2.0
+    assert parse_delivery_days("In stock", today) is None
+
+
+def test_suffixed_review_counts_weigh_like_plain_ones():
+    plain = {"title": "Earbuds A", "price": "₹999", "rating": 4.2, "reviews": 3200}
+    suffixed = {"title": "Earbuds B", "price": "₹999", "rating": 4.2, "reviews": "3.2K"}
+    few = {"title": "Earbuds C", "price": "₹999", "rating": 4.2, "reviews": 4}
+
+    top = compare_products([few, plain, suffixed], "earbuds")["top"]
+    assert [p["reviews"] for p in top] == [3200, 3200, 4]
+
+
+def test_foreign_currency_ranks_below_in_budget_items():
+    local = {"title": "Wireless Earbuds", "price": "₹1,499", "rating": 4.3, "reviews": 1000}
+    unpriced = {"title": "Wireless Earbuds", "rating": 4.3, "reviews": 1000}
+    foreign = {"title": "Wireless Earbuds", "price": "$19.99", "rating": 4.3, "reviews": 1000}
+    others = [{"title": "Wireless Earbuds", "price": f"₹{p}", "rating": 4.3, "reviews": 1000} for p in (1799, 1999)]
+
+    ranked = rank_products([foreign, unpriced, *others, local], "wireless earbuds", {"budget": 2000})
+    assert ranked[0] is local
+    assert ranked[-1] is foreign
+
+
+def test_recorded_results_prefer_in_budget_items(products):
+    comparison = compare_products(products, "wireless earbuds", {"budget": {"min": None, "max": 2000}},
+                                  today=date(2026, 10, 18))
+
+    assert comparison["currency"] == "INR"
+    assert all(parse_price(p) <= 2000 for p in comparison["top"])
+    assert "Apple AirPods (2nd generation)" not in [p["title"] for p in comparison["top"]]
+    picks = [comparison[k] for k in ("best_value", "fastest_delivery", "top_rated")]
+    assert all(0 <= i < len(comparison["top"]) for i in picks)
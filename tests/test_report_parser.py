@@ -0,0 +1,69 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from shop_agent.ranking import compare_products, comparison_markdown
+from shop_agent.report_parser import parse_compare_report, parse_shopping_results
+
+DATA = Path(__file__).parent / "data"
+REPORTS = DATA / "reports"
+EXPECTED = json.loads((REPORTS / "expected.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture(scope="module")
+def products():
+    return json.loads((DATA / "shopping_results_earbuds.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_recorded_reports(name, products):
+    report = (REPORTS / name).read_text(encoding="utf-8")
+    assert parse_compare_report(report, products) == EXPECTED[name]
+
+
+@pytest.mark.parametrize("preferences", [
+    None,
+    {"budget": {"min": None, "max": 2000}, "brand": ["Noise"]},
+    {"budget": 5000, "features": ["noise_cancellation"]},
+])
+def test_comparison_markdown_round_trip(products, preferences):
+    comparison = compare_products(products, "wireless earbuds", preferences, today=date(2026, 10, 18))
+    parsed = parse_compare_report(comparison_markdown(comparison), products)
+
+    assert parsed == [
+        {"title": p["title"], "link": p["link"], "price": p["price"], "source": p["source"]}
+        for p in comparison["top"]
+    ]
+
+
+def test_round_trip_without_links_uses_bold_titles(products):
+    comparison = compare_products(products, "earbuds", limit=3)
+    for p in comparison["top"]:
+        p["link"] = None
+    parsed = parse_compare_report(comparison_markdown(comparison), products)
+
+    assert [p["title"] for p in parsed] == [p["title"] for p in comparison["top"]]
+    # Links are recovered from the matching search results
+    assert all(p["link"] for p in parsed)
+
+
+def test_narrative_after_the_list_is_ignored(products):
+    report = (REPORTS / "tool_output_with_narrative.md").read_text(encoding="utf-8")
+    report += "\n\n1. **Sony WF-C510 Wireless Earbuds** also came close.\n"
+    assert len(parse_compare_report(report, products)) == 5
+
+
+def test_unparseable_report():
+    assert parse_compare_report("I could not find any products matching your request.") == []
+    assert parse_compare_report(None) == []
+
+
+def test_parse_shopping_results(products):
+    text = json.dumps(products)
+    assert parse_shopping_results(text) == products
+    assert parse_shopping_results(f"Here are the results:\n```json\n{text}\n```") == products
+    assert parse_shopping_results(products + ["stray"]) == products
+    assert parse_shopping_results("[{\"title\": \"x\"") == []
+    assert parse_shopping_results("") == []
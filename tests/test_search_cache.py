@@ -0,0 +1,131 @@
+import pytest
+
+from shop_agent.db import search_cache as search_cache_module
+from shop_agent.db.search_cache import SearchResponseCache
+from shop_agent.tools import custom_tool
+from shop_agent.tools.custom_tool import GoogleShoppingTool
+
+
+class Clock:
+    """Controllable stand-in for time.time()"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search_cache_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = SearchResponseCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=3)
+    yield cache
+    cache.close()
+
+
+class StubEngine:
+    """Stands in for SerpAPI behind GoogleShoppingTool, recording every request that reaches it"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, params: dict, timeout: float) -> dict:
+        self.calls.append((params["q"], params["location"], params.get("gl")))
+        return {"shopping_results": [{"title": f"result for {params['q']}", "product_link": params["q"]}]}
+
+
+@pytest.fixture
+def engine(monkeypatch, cache):
+    monkeypatch.setenv("SERPAPI_API_KEY", "test-key")
+    monkeypatch.setattr(custom_tool, "search_cache", cache)
+    engine = StubEngine()
+    monkeypatch.setattr(custom_tool, "fetch_shopping_results", engine)
+    return engine
+
+
+def test_key_normalizes_case_and_whitespace():
+    assert (SearchResponseCache.make_key("  Wireless   Earbuds ", "India", "EN", None)
+            == SearchResponseCache.make_key("wireless earbuds", "india", "en", ""))
+    assert SearchResponseCache.make_key("earbuds", "India") != SearchResponseCache.make_key("earbuds", "USA")
+
+
+def test_repeat_queries_are_served_from_cache(engine, cache):
+    tool = GoogleShoppingTool()
+    first = tool._run("wireless earbuds")
+    assert tool.last_report["cached"] == 0
+    second = tool._run("Wireless  EARBUDS")
+
+    assert first == second
+    assert engine.calls == [("wireless earbuds", "India", "in")]
+    assert tool.last_report["cached"] == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(engine, cache, clock):
+    tool = GoogleShoppingTool()
+    tool._run("earbuds")
+    clock.now += 59
+    tool._run("earbuds")
+    assert tool.last_report["cached"] == 1
+    clock.now += 2  # 61s after the first request
+    tool._run("earbuds")
+
+    assert tool.last_report["cached"] == 0
+    assert [q for q, _, _ in engine.calls] == ["earbuds", "earbuds"]
+    assert cache.stats()["size"] == 1
+
+
+def test_different_params_are_cached_separately(engine):
+    tool = GoogleShoppingTool()
+    tool._run("earbuds", "India")
+    tool._run("earbuds", "USA")  # another location (and gl)
+    tool._run("earbuds", "Mumbai, India")  # same gl, another location
+    tool._run("earbuds case", "India")
+    tool._run("earbuds", "USA")
+
+    assert engine.calls == [
+        ("earbuds", "India", "in"), ("earbuds", "USA", "us"),
+        ("earbuds", "Mumbai, India", "in"), ("earbuds case", "India", "in"),
+    ]
+    assert tool.last_report["cached"] == 1
+
+
+def test_purge_expired(cache, clock):
+    cache.set(cache.make_key("old"), [])
+    clock.now += 30
+    cache.set(cache.make_key("new"), [])
+    clock.now += 40
+    assert cache.purge_expired() == 1
+    assert cache.get(cache.make_key("new")) == []
+
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    for q in ("a", "b", "c"):
+        cache.set(cache.make_key(q), [q])
+        clock.now += 1
+    cache.get(cache.make_key("a"))  # "b" is now the least recently used
+    clock.now += 1
+    cache.set(cache.make_key("d"), ["d"])
+
+    assert cache.get(cache.make_key("b")) is None
+    assert [cache.get(cache.make_key(q)) for q in ("a", "c", "d")] == [["a"], ["c"], ["d"]]
+    assert cache.stats()["size"] == 3
+
+
+def test_survives_restart(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    first = SearchResponseCache(path, ttl=60)
+    first.set(first.make_key("earbuds"), [{"title": "x"}])
+    first.close()
+
+    second = SearchResponseCache(path, ttl=60)
+    assert second.get(second.make_key("earbuds")) == [{"title": "x"}]
+    second.close()
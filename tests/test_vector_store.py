@@ -0,0 +1,180 @@
+import math
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+
+qdrant_client = pytest.importorskip("qdrant_client")
+from qdrant_client import QdrantClient, models  # noqa: E402
+
+from shop_agent.db import vector_store  # noqa: E402
+from shop_agent.db.vector_store import TracedQdrantClient, search_episodes, upsert_episodes  # noqa: E402
+
+DIM = 64
+
+
+def embed(text: str) -> list:
+    """Stand-in for the sentence encoder: normalized bag of hashed words"""
+    vector = [0.0] * DIM
+    for word in text.lower().split():
+        vector[zlib.crc32(word.encode()) % DIM] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeEncoder:
+    def encode(self, text):
+        return embed(text)
+
+    def encode_many(self, texts):
+        return [embed(t) for t in texts]
+
+
+@pytest.fixture
+def qdrant(monkeypatch):
+    """An in-memory Qdrant behind the shared client, with the fake encoder"""
+    client = TracedQdrantClient(QdrantClient(":memory:"))
+    monkeypatch.setattr(vector_store, "VECTOR_DIM", DIM)
+    monkeypatch.setattr(vector_store, "QUANTIZATION", "none")
+    monkeypatch.setattr(vector_store, "_sparse_enabled", False)
+    monkeypatch.setattr(vector_store, "_client", client)
+    monkeypatch.setattr(vector_store, "embedding_service", FakeEncoder())
+    vector_store.episode_search_cache.clear()
+    yield client
+    vector_store.episode_search_cache.clear()
+    client.close()
+
+
+def episode(user_id, query, days_ago=0, final_items=(), item_details=""):
+    return {
+        "user_id": user_id,
+        "query": query,
+        "item_details": item_details,
+        "final_items": list(final_items),
+        "timestamp": (datetime.now() - timedelta(days=days_ago)).isoformat(),
+        "description": f"Shopping episode for {query}",
+    }
+
+
+def write(*episodes):
+    return upsert_episodes(list(episodes), [embed(e["query"]) for e in episodes])
+
+
+def queries(hits) -> list:
+    return [h["query"] for h in hits]
+
+
+@pytest.mark.parametrize("mode", ["dense", "hybrid"])
+def test_upsert_and_search(qdrant, mode):
+    vector_store.ensure_collection(qdrant)
+    write(
+        episode("alice", "wireless earbuds", final_items=["boAt Airdopes 141"]),
+        episode("alice", "gaming laptop"),
+        episode("bob", "wireless earbuds"),
+    )
+
+    hits, = search_episodes(["wireless earbuds"], user_id="alice", mode=mode)
+    assert queries(hits)[0] == "wireless earbuds"
+    assert hits[0]["final_items"] == ["boAt Airdopes 141"]
+    assert {h["user_id"] for h in hits} == {"alice"}
+
+
+def test_hybrid_scores_are_rank_fusion_not_similarity(qdrant):
+    vector_store.ensure_collection(qdrant)
+    write(*(episode("alice", q) for q in ("wireless earbuds", "wireless mouse", "gaming laptop")))
+
+    dense, = search_episodes(["wireless earbuds"], user_id="alice", mode="dense")
+    hybrid, = search_episodes(["wireless earbuds"], user_id="alice", mode="hybrid")
+    similarity = {h["query"]: h["score"] for h in dense}
+    fused = {h["query"]: h["score"] for h in hybrid}
+    assert similarity["gaming laptop"] == pytest.approx(0.0)
+    assert fused["gaming laptop"] > 0.0  # ranked last, but fusion scores every candidate
+
+    # score_threshold only cuts the dense candidates; keyword matches still come through
+    dense, = search_episodes(["wireless earbuds"], user_id="alice", mode="dense", score_threshold=0.75)
+    hybrid, = search_episodes(["wireless earbuds"], user_id="alice", mode="hybrid", score_threshold=0.75)
+    assert queries(dense) == ["wireless earbuds"]
+    assert queries(hybrid) == ["wireless earbuds", "wireless mouse"]
+    assert hybrid[1]["score"] < 0.75
+
+
+def test_dense_only_collection_keeps_working(qdrant):
+    # A collection created before hybrid search: one unnamed dense vector
+    qdrant.create_collection(
+        vector_store.COLLECTION_NAME,
+        vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE),
+    )
+    qdrant.upsert(vector_store.COLLECTION_NAME, points=[models.PointStruct(
+        id=vector_store.episode_point_id("alice", "running shoes"),
+        vector=embed("running shoes"),
+        payload={"user_id": "alice", "query": "running shoes"},
+    )])
+
+    # Qdrant can't add a sparse vector to an existing collection: stay dense-only
+    vector_store.ensure_collection(qdrant)
+    assert not vector_store._sparse_enabled
+
+    write(episode("alice", "wireless earbuds"), episode("alice", "Running Shoes", final_items=["Nike Revolution 7"]))
+    hits, = search_episodes(["running shoes"], user_id="alice", mode="hybrid")
+    assert queries(hits)[0] == "Running Shoes"
+    assert hits[0]["final_items"] == ["Nike Revolution 7"]
+    assert hits[0]["score"] == pytest.approx(1.0)  # dense similarity
+    assert qdrant.count(vector_store.COLLECTION_NAME).count == 2
+
+
+def test_hybrid_falls_back_to_dense_when_sparse_is_disabled(qdrant, monkeypatch):
+    vector_store.ensure_collection(qdrant)
+    write(episode("alice", "wireless earbuds"))
+    monkeypatch.setattr(vector_store, "_sparse_enabled", False)
+
+    hits, = search_episodes(["wireless earbuds"], user_id="alice", mode="hybrid")
+    assert hits[0]["score"] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("mode", ["dense", "hybrid"])
+def test_since_days_filter(qdrant, mode):
+    vector_store.ensure_collection(qdrant)
+    write(
+        episode("alice", "wireless earbuds", days_ago=2),
+        episode("alice", "wireless earbuds case", days_ago=120),
+    )
+
+    recent, = search_episodes(["wireless earbuds"], user_id="alice", mode=mode, since_days=30)
+    everything, = search_episodes(["wireless earbuds"], user_id="alice", mode=mode)
+    assert queries(recent) == ["wireless earbuds"]
+    assert sorted(queries(everything)) == ["wireless earbuds", "wireless earbuds case"]
+
+
+def test_repeat_search_merges_into_one_episode(qdrant):
+    vector_store.ensure_collection(qdrant)
+    write(episode("alice", "Wireless Earbuds", days_ago=3, final_items=["boAt Airdopes 141"]))
+    write(episode("alice", "wireless  earbuds", final_items=["Noise Buds VS104", "boAt Airdopes 141"]))
+    # Same words in another order: a near-duplicate by embedding
+    write(episode("alice", "earbuds wireless", days_ago=1, final_items=["JBL Wave Buds"]))
+    write(episode("bob", "wireless earbuds"))
+
+    points, _ = qdrant.scroll(vector_store.COLLECTION_NAME, limit=10, with_payload=True)
+    by_user = {}
+    for p in points:
+        by_user.setdefault(p.payload["user_id"], []).append(p.payload)
+    assert len(by_user["alice"]) == 1 and len(by_user["bob"]) == 1
+
+    merged = by_user["alice"][0]
+    assert merged["occurrences"] == 3
+    assert merged["query"] == "wireless  earbuds"  # the most recent search wins
+    assert merged["final_items"] == ["Noise Buds VS104", "boAt Airdopes 141", "JBL Wave Buds"]
+    assert merged["first_timestamp"] < merged["timestamp"]
+
+
+def test_repeats_inside_one_batch_collapse(qdrant):
+    vector_store.ensure_collection(qdrant)
+    assert write(episode("alice", "gaming laptop"), episode("alice", "Gaming Laptop")) == 1
+    assert qdrant.count(vector_store.COLLECTION_NAME).count == 1
+
+
+def test_writes_invalidate_cached_searches(qdrant):
+    vector_store.ensure_collection(qdrant)
+    assert search_episodes(["gaming laptop"], user_id="alice", mode="dense") == [[]]
+    write(episode("alice", "gaming laptop"))
+    hits, = search_episodes(["gaming laptop"], user_id="alice", mode="dense")
+    assert queries(hits) == ["gaming laptop"]